@@ -0,0 +1,66 @@
+import random
+from dataclasses import dataclass
+from typing import Iterator
+
+
+@dataclass
+class StudyShape:
+    """Represents the shape of a synthetic study.
+
+    :ivar int models:
+        The number of simulation models, i.e., the size of the study. Every model has its own references,
+        assumptions, requirements, experiment, simulation data and analysis.
+    :ivar int depth:
+        The number of versions of every file, i.e., the depth of the version chains.
+    :ivar int fan_out:
+        The number of references, assumptions and requirements per model and of simulation data files per
+        experiment run.
+    :ivar int agents:
+        The number of distinct simulator versions the experiments are executed with.
+    :ivar int seed:
+        The seed of the generator.
+    """
+    models: int = 10
+    depth: int = 4
+    fan_out: int = 3
+    agents: int = 2
+    seed: int = 0
+
+    @property
+    def event_count(self) -> int:
+        return self.models * self.depth * (3 * self.fan_out + 4)
+
+
+def generate_events(shape: StudyShape) -> Iterator[dict]:
+    """Generates the events of a synthetic study for the rules in ``benchmarks/rules.py``.
+
+    :param StudyShape shape: The shape of the study.
+    :rtype: Iterator[dict]
+    """
+    generator = random.Random(shape.seed)
+    for model in range(shape.models):
+        directory = f"/study/model-{model}"
+        references = [f"{directory}/references/reference-{index}.bib" for index in range(shape.fan_out)]
+        assumptions = [f"{directory}/assumptions/assumption-{index}.md" for index in range(shape.fan_out)]
+        requirements = [f"{directory}/requirements/requirement-{index}.md" for index in range(shape.fan_out)]
+        (model_path, experiment_path) = (f"{directory}/model.mlrj", f"{directory}/experiment.py")
+        for version in range(shape.depth):
+            newly_specified = version == 0
+            for reference in references:
+                yield {"type": "Reference Specified", "filePath": reference, "newlySpecified": newly_specified}
+            for (event_type, paths) in (("Assumption Specified", assumptions),
+                                        ("Requirement Specified", requirements)):
+                for path in paths:
+                    yield {"type": event_type, "filePath": path, "newlySpecified": newly_specified,
+                           "references": generator.sample(references, generator.randint(0, len(references)))}
+            yield {"type": "Model Specified", "filePath": model_path, "newlySpecified": newly_specified,
+                   "assumptions": assumptions, "requirements": requirements}
+            yield {"type": "Experiment Specified", "filePath": experiment_path, "newlySpecified": newly_specified,
+                   "model": model_path, "requirements": generator.sample(requirements, 1)}
+            outputs = [f"{directory}/data/run-{version}/output-{index}.csv" for index in range(shape.fan_out)]
+            yield {"type": "Experiment Executed", "experiment": experiment_path, "outputs": outputs,
+                   "simulator": {"formalism": "ML-Rules", "version": f"1.{generator.randrange(shape.agents)}"},
+                   "python": "3.11"}
+            yield {"type": "Data Analyzed", "filePath": f"{directory}/results/analysis.json",
+                   "newlySpecified": newly_specified, "data": outputs, "python": "3.11",
+                   "script": {"hash": f"script-{model}-{version}", "filePath": f"{directory}/analysis.py"}}
@@ -0,0 +1,80 @@
+from simprov import *
+
+# Synthetic rules for the benchmark studies. They follow the activities of tests/resources/real-specs.yaml, and the
+# events list the files an activity used, so the studies have configurable fan-out and agents.
+
+
+def _entity(name, file_path):
+    entity = Entity(name)
+    entity.attributes["File Path"] = file_path
+    return entity
+
+
+def _specifying(event, activity_name, entity_name, used_entities):
+    activity = Activity(activity_name)
+    activity.generated_entities = [_entity(entity_name, event["filePath"])]
+    activity.used_entities = used_entities
+    if not event["newlySpecified"]:
+        activity.used_entities.append(_entity(entity_name, event["filePath"]))
+    return activity
+
+
+@rule("Reference Specified")
+def process_reference_specified_event(event):
+    return _specifying(event, "Specifying Reference", "Reference", [])
+
+
+@rule("Assumption Specified")
+def process_assumption_specified_event(event):
+    references = [_entity("Reference", path) for path in event["references"]]
+    return _specifying(event, "Specifying Assumption", "Assumption", references)
+
+
+@rule("Requirement Specified")
+def process_requirement_specified_event(event):
+    references = [_entity("Reference", path) for path in event["references"]]
+    return _specifying(event, "Specifying Requirement", "Requirement", references)
+
+
+@rule("Model Specified")
+def process_model_specified_event(event):
+    used_entities = [_entity("Assumption", path) for path in event["assumptions"]]
+    used_entities += [_entity("Requirement", path) for path in event["requirements"]]
+    return _specifying(event, "Specifying Simulation Model", "Simulation Model", used_entities)
+
+
+@rule("Experiment Specified")
+def process_experiment_specified_event(event):
+    used_entities = [_entity("Simulation Model", event["model"])]
+    used_entities += [_entity("Requirement", path) for path in event["requirements"]]
+    return _specifying(event, "Specifying Simulation Experiment", "Simulation Experiment", used_entities)
+
+
+@rule("Experiment Executed")
+def process_experiment_executed_event(event):
+    activity = Activity("Executing Simulation Experiment")
+    activity.used_entities = [_entity("Simulation Experiment", event["experiment"])]
+    activity.generated_entities = [_entity("Simulation Data", path) for path in event["outputs"]]
+    simulator = Agent("Simulator")
+    simulator.attributes["Formalism"] = event["simulator"]["formalism"]
+    simulator.attributes["Version"] = event["simulator"]["version"]
+    environment = Agent("Python Environment")
+    environment.attributes["Version"] = event["python"]
+    activity.associated_agents = [environment, simulator]
+    return activity
+
+
+@rule("Data Analyzed")
+def process_data_analyzed_event(event):
+    activity = Activity("Analyzing Simulation Data")
+    script = Entity("Script")
+    script.attributes["Hash"] = event["script"]["hash"]
+    script.attributes["File Path"] = event["script"]["filePath"]
+    activity.used_entities = [_entity("Simulation Data", path) for path in event["data"]] + [script]
+    if not event["newlySpecified"]:
+        activity.used_entities.append(_entity("Analysis Result", event["filePath"]))
+    activity.generated_entities = [_entity("Analysis Result", event["filePath"])]
+    environment = Agent("Python Environment")
+    environment.attributes["Version"] = event["python"]
+    activity.associated_agents = [environment]
+    return activity
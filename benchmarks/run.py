@@ -0,0 +1,230 @@
+"""Benchmarks the ingestion, reduction and export of synthetic studies.
+
+Run from the repository root, e.g.::
+
+    python -m benchmarks.run --models 50 --depth 5 --fan-out 3 --agents 2 --output results.json
+    python -m benchmarks.run --baseline results.json --tolerance 0.2
+
+The results are written as JSON. With ``--baseline`` the durations and throughputs are compared against a stored
+result and the run fails if any of them regressed by more than the tolerance.
+"""
+import argparse
+import io
+import json
+import platform
+import resource
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from itertools import product
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from benchmarks.generator import StudyShape, generate_events
+
+BENCHMARK_DIRECTORY = Path(__file__).parent
+RULES_PATH = BENCHMARK_DIRECTORY / "rules.py"
+SPECIFICATIONS_PATH = BENCHMARK_DIRECTORY.parent / "tests" / "resources" / "real-specs.yaml"
+RESULT_SCHEMA = 1
+
+
+def _peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _best_of(repeat: int, function, setup=None) -> float:
+    # The setup, e.g., copying the input, runs before every run and is not measured. Its result is passed on.
+    durations = []
+    for _ in range(repeat):
+        arguments = () if setup is None else (setup(),)
+        start = time.perf_counter()
+        function(*arguments)
+        durations.append(time.perf_counter() - start)
+    return min(durations)
+
+
+def benchmark_ingestion(shape: StudyShape):
+    """Processes the events of a synthetic study and measures the throughput.
+
+    :param StudyShape shape: The shape of the study.
+    :return: The headless SimProv instance and the results.
+    """
+    from simprov.core import SimProv
+    from simprov.provenance import reset_id_generator
+    reset_id_generator()
+    simprov = SimProv(str(RULES_PATH), str(SPECIFICATIONS_PATH), None, start_api=False, headless=True)
+    events = list(generate_events(shape))
+    start = time.perf_counter()
+    for event in events:
+        simprov.process_event(event, save_study_state=False)
+    seconds = time.perf_counter() - start
+    graph = simprov.provenance_graph.graph
+    return (simprov, {"events": len(events), "seconds": seconds, "events_per_second": len(events) / seconds,
+                      "stage_seconds": {stage: histogram.sum
+                                        for (stage, histogram) in simprov.metrics.stage_seconds.items()},
+                      "nodes": graph.number_of_nodes(), "edges": graph.number_of_edges(),
+                      "peak_rss_bytes": _peak_rss_bytes()})
+
+
+def benchmark_deduplication(shape: StudyShape, window: float = 60.0) -> Dict[str, float]:
+    """Measures the throughput of a study whose capturer sends every event twice, e.g., editor saves without changes.
+
+    :param StudyShape shape: The shape of the study.
+    :param float window: The deduplication window in seconds.
+    :rtype: Dict[str,float]
+    :return: The throughputs without and with the deduplication of repeated events, and the skipped events.
+    """
+    from simprov.core import SimProv
+    from simprov.provenance import reset_id_generator
+    events = [event for event in generate_events(shape) for _ in range(2)]
+    results = {"events": len(events)}
+    for (name, deduplication_window) in (("plain", None), ("deduplicated", window)):
+        reset_id_generator()
+        simprov = SimProv(str(RULES_PATH), str(SPECIFICATIONS_PATH), None, start_api=False, headless=True,
+                          deduplication_window=deduplication_window)
+        start = time.perf_counter()
+        for event in events:
+            simprov.process_event(dict(event), save_study_state=False)
+        results[f"{name}_events_per_second"] = len(events) / (time.perf_counter() - start)
+        results["skipped"] = simprov.metrics.events_skipped
+    return results
+
+
+def benchmark_reduction(simprov, repeat: int) -> Dict[str, float]:
+    """Measures the reduction of the provenance graph for every combination of the reduction options.
+
+    Every run reduces a fresh copy of the provenance graph, so the runs neither see the changes of the previous ones
+    nor change the graph the exports are measured on.
+
+    :param SimProv simprov: The instance holding the provenance graph.
+    :param int repeat: The number of runs per combination, the fastest counts.
+    :rtype: Dict[str,float]
+    :return: The seconds per combination, e.g., ``transitive=1,hide=0,split=1``.
+    """
+    from simprov.reducer import GraphReducer
+    results = {}
+    for (reduce_transitives, hide_nodes, split_agents) in product((False, True), repeat=3):
+        key = f"transitive={int(reduce_transitives)},hide={int(hide_nodes)},split={int(split_agents)}"
+        results[key] = _best_of(repeat, lambda graph: GraphReducer(graph).reduce(
+            reduce_transitives, hide_nodes, split_agents), simprov.provenance_graph.copy)
+    return results
+
+
+def benchmark_export(simprov, repeat: int) -> Dict[str, float]:
+    """Measures the export of the provenance graph in every format.
+
+    The columnar formats are only measured if pyarrow is installed.
+
+    :param SimProv simprov: The instance holding the provenance graph.
+    :param int repeat: The number of runs per format, the fastest counts.
+    :rtype: Dict[str,float]
+    :return: The seconds per format.
+    """
+    from simprov.export import COLUMNAR_FORMATS, write_columnar, write_dot, write_prov_json
+    graph = simprov.provenance_graph
+    results = {"prov_json": _best_of(repeat, lambda: write_prov_json(graph, io.StringIO())),
+               "dot": _best_of(repeat, lambda: write_dot(graph, io.StringIO()))}
+    try:
+        import pyarrow
+    except ImportError:
+        return results
+    with tempfile.TemporaryDirectory() as directory:
+        for file_format in COLUMNAR_FORMATS:
+            results[file_format] = _best_of(repeat, lambda: write_columnar(graph, directory, file_format))
+    return results
+
+
+def run(shape: StudyShape, repeat: int = 3) -> Dict:
+    """Runs all benchmarks for a synthetic study.
+
+    :param StudyShape shape: The shape of the study.
+    :param int repeat: The number of runs of every reduction and export, the fastest counts.
+    :rtype: Dict
+    :return: The results, ready to be written as JSON.
+    """
+    (simprov, ingestion) = benchmark_ingestion(shape)
+    deduplication = benchmark_deduplication(shape)
+    reduction = benchmark_reduction(simprov, repeat)
+    export = benchmark_export(simprov, repeat)
+    return {"schema": RESULT_SCHEMA,
+            "meta": {"python": platform.python_version(), "platform": platform.platform(),
+                     "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "shape": asdict(shape), "repeat": repeat},
+            "ingestion": ingestion, "deduplication": deduplication, "reduction_seconds": reduction, "export_seconds": export,
+            "peak_rss_bytes": _peak_rss_bytes()}
+
+
+def _flatten(results: Dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for (key, value) in results.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[Tuple[str, float, float]]:
+    """Compares the durations and throughputs of a run with a baseline.
+
+    Durations (``seconds``) regress when they grow, throughputs (``per_second``) when they shrink, both by more than
+    the tolerance. Memory and graph sizes are not compared.
+
+    :param Dict results: The results of the run.
+    :param Dict baseline: The results of the baseline run.
+    :param float tolerance: The allowed relative change, e.g., ``0.2`` for 20 %.
+    :rtype: List[Tuple[str,float,float]]
+    :return: The regressed metrics with their baseline and current values.
+    """
+    (current, previous) = (_flatten(results), _flatten(baseline))
+    regressions = []
+    for (metric, value) in current.items():
+        if metric not in previous or previous[metric] <= 0:
+            continue
+        ratio = value / previous[metric]
+        if metric.endswith("per_second"):
+            regressed = ratio < 1 - tolerance
+        elif "seconds" in metric:
+            regressed = ratio > 1 + tolerance
+        else:
+            continue
+        if regressed:
+            regressions.append((metric, previous[metric], value))
+    return regressions
+
+
+parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.split("\n\n")[0])
+parser.add_argument("--models", type=int, default=StudyShape.models, help="The number of models, i.e., study size.")
+parser.add_argument("--depth", type=int, default=StudyShape.depth, help="The number of versions of every file.")
+parser.add_argument("--fan-out", type=int, default=StudyShape.fan_out,
+                    help="The number of inputs per specification and of outputs per experiment run.")
+parser.add_argument("--agents", type=int, default=StudyShape.agents, help="The number of simulator versions.")
+parser.add_argument("--seed", type=int, default=StudyShape.seed, help="The seed of the event generator.")
+parser.add_argument("--repeat", type=int, default=3, help="The runs of every reduction and export.")
+parser.add_argument("--output", metavar="FILE", default=None, help="Write the results into the file.")
+parser.add_argument("--baseline", metavar="FILE", default=None, help="Compare the results with a stored result.")
+parser.add_argument("--tolerance", type=float, default=0.2,
+                    help="The allowed relative regression compared with the baseline.")
+
+
+def main():
+    args = parser.parse_args()
+    shape = StudyShape(args.models, args.depth, args.fan_out, args.agents, args.seed)
+    results = run(shape, args.repeat)
+    document = json.dumps(results, indent=2)
+    if args.output is None:
+        print(document)
+    else:
+        Path(args.output).write_text(document + "\n")
+    if args.baseline is not None:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        for (metric, previous, value) in regressions:
+            print(f"REGRESSION {metric}: {previous:.6g} -> {value:.6g}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
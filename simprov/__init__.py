@@ -1,4 +1,18 @@
-from .provenance import Activity, Entity,Agent
-from .rule_engine import rule
+__all__ = ["rule", "Entity", "Activity", "Agent"]
 
-__all__ = ["rule", "Entity", "Activity","Agent"]
+# The exports are imported on first access, so importing a submodule, e.g., for the command line, stays cheap.
+_LAZY_EXPORTS = {"rule": "simprov.rule_engine", "Entity": "simprov.provenance", "Activity": "simprov.provenance",
+                 "Agent": "simprov.provenance"}
+
+
+def __getattr__(name):
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module 'simprov' has no attribute '{name}'")
+    from importlib import import_module
+    value = getattr(import_module(_LAZY_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,145 @@
+import json
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Set, Tuple
+from uuid import UUID
+
+
+def _value_key(value):
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+class AttributeIndex:
+    """Represents the value indexes of a provenance graph.
+
+    All nodes are indexed by their type, i.e., "Entity", "Agent" or "Activity", and by their name. The attributes
+    marked as indexed in the specifications are additionally indexed in a hash index for equality queries and, if
+    their values are strings, in a sorted index for prefix queries. Attribute values that are not strings are compared
+    by their JSON representation, e.g., ``3`` equals ``"3"``. ``None`` values are not indexed.
+
+    :ivar Dict[str,Set[str]] indexed_attributes:
+        The indexed attributes by entity and agent name.
+    :ivar Dict[str,Dict[UUID,None]] types:
+        The ids of the nodes by type, in the order they were indexed.
+    :ivar Dict[str,Dict[UUID,None]] names:
+        The ids of the nodes by name, in the order they were indexed.
+    :ivar Dict[str,Dict[object,Dict[UUID,None]]] values:
+        The ids of the nodes by attribute and value.
+    :ivar Dict[str,List[Tuple[str,UUID]]] sorted_values:
+        The sorted pairs of string values and node ids by attribute.
+    """
+
+    def __init__(self, indexed_attributes: Dict[str, Iterable[str]] = None) -> None:
+        self.indexed_attributes: Dict[str, Set[str]] = {name: set(attributes) for (name, attributes)
+                                                        in (indexed_attributes or {}).items()}
+        self.types: Dict[str, Dict[UUID, None]] = {}
+        self.names: Dict[str, Dict[UUID, None]] = {}
+        self.values: Dict[str, Dict[object, Dict[UUID, None]]] = {}
+        self.sorted_values: Dict[str, List[Tuple[str, UUID]]] = {}
+
+    def copy(self) -> 'AttributeIndex':
+        """Returns a copy that is not affected by later changes of this index.
+
+        :rtype: AttributeIndex
+        """
+        index_copy = AttributeIndex()
+        index_copy.indexed_attributes = self.indexed_attributes
+        index_copy.types = {node_type: dict(node_ids) for (node_type, node_ids) in self.types.items()}
+        index_copy.names = {name: dict(node_ids) for (name, node_ids) in self.names.items()}
+        index_copy.values = {attribute: {value: dict(node_ids) for (value, node_ids) in values.items()}
+                             for (attribute, values) in self.values.items()}
+        index_copy.sorted_values = {attribute: list(sorted_values)
+                                    for (attribute, sorted_values) in self.sorted_values.items()}
+        return index_copy
+
+    @property
+    def attributes(self) -> Set[str]:
+        """The names of all indexed attributes."""
+        return set().union(*self.indexed_attributes.values())
+
+    def add_node(self, node_id: UUID, node_type: str, name: str, attributes: Dict = None):
+        """Indexes a node.
+
+        :param UUID node_id: The id of the node.
+        :param str node_type: The type of the node.
+        :param str name: The name of the node.
+        :param Dict, optional attributes: The attributes of the node.
+        """
+        self.types.setdefault(node_type, {})[node_id] = None
+        self.names.setdefault(name, {})[node_id] = None
+        for attribute in self.indexed_attributes.get(name, ()):
+            self.add_value(node_id, attribute, (attributes or {}).get(attribute, None))
+
+    def add_value(self, node_id: UUID, attribute: str, value):
+        """Indexes an attribute value of a node.
+
+        :param UUID node_id: The id of the node.
+        :param str attribute: The attribute name.
+        :param value: The value.
+        """
+        if value is None:
+            return
+        self.values.setdefault(attribute, {}).setdefault(_value_key(value), {})[node_id] = None
+        if isinstance(value, str):
+            insort(self.sorted_values.setdefault(attribute, []), (value, node_id))
+
+    def remove_value(self, node_id: UUID, attribute: str, value):
+        """Removes an attribute value of a node from the index.
+
+        :param UUID node_id: The id of the node.
+        :param str attribute: The attribute name.
+        :param value: The value.
+        """
+        if value is None:
+            return
+        self.values.get(attribute, {}).get(_value_key(value), {}).pop(node_id, None)
+        if isinstance(value, str):
+            sorted_values = self.sorted_values.get(attribute, [])
+            position = bisect_left(sorted_values, (value, node_id))
+            if position < len(sorted_values) and sorted_values[position] == (value, node_id):
+                del sorted_values[position]
+
+    def is_indexed(self, name: str, attribute: str) -> bool:
+        """Checks whether an attribute of an entity or agent is indexed.
+
+        :param str name: The entity or agent name.
+        :param str attribute: The attribute name.
+        :rtype: bool
+        """
+        return attribute in self.indexed_attributes.get(name, ())
+
+    def equal(self, attribute: str, value) -> Dict[UUID, None]:
+        """Returns the nodes whose attribute equals a value.
+
+        :param str attribute: The attribute name.
+        :param value: The value.
+        :rtype: Dict[UUID,None]
+        :return: The node ids as keys.
+        :raises KeyError: If the attribute is not indexed.
+        """
+        self._check_attribute(attribute)
+        return self.values.get(attribute, {}).get(_value_key(value), {})
+
+    def prefixed(self, attribute: str, prefix: str) -> Dict[UUID, None]:
+        """Returns the nodes whose attribute is a string that starts with a prefix, e.g., a directory.
+
+        :param str attribute: The attribute name.
+        :param str prefix: The prefix.
+        :rtype: Dict[UUID,None]
+        :return: The node ids as keys.
+        :raises KeyError: If the attribute is not indexed.
+        """
+        self._check_attribute(attribute)
+        sorted_values = self.sorted_values.get(attribute, [])
+        result = {}
+        for position in range(bisect_left(sorted_values, (prefix,)), len(sorted_values)):
+            (value, node_id) = sorted_values[position]
+            if not value.startswith(prefix):
+                break
+            result[node_id] = None
+        return result
+
+    def _check_attribute(self, attribute: str):
+        if attribute not in self.attributes:
+            raise KeyError(f"Attribute \"{attribute}\" is not indexed.")
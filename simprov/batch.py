@@ -0,0 +1,170 @@
+import json
+import random
+import time
+from dataclasses import dataclass
+from itertools import chain
+from pathlib import Path
+from typing import Iterator, TextIO, Union
+
+from simprov.core import SimProv
+from simprov.provenance import use_id_generator
+
+READ_CHUNK_SIZE = 1 << 16
+
+
+@dataclass
+class BuildReport:
+    """Represents the outcome of building a provenance graph from an event file.
+
+    :ivar int events:
+        The number of processed events.
+    :ivar int failed_events:
+        The number of events that could not be processed and were skipped.
+    :ivar int nodes:
+        The number of nodes of the provenance graph.
+    :ivar int edges:
+        The number of edges of the provenance graph.
+    :ivar float processing_seconds:
+        The time spent reading and processing the events.
+    :ivar float export_seconds:
+        The time spent writing the provenance graph.
+    """
+    events: int = 0
+    failed_events: int = 0
+    nodes: int = 0
+    edges: int = 0
+    processing_seconds: float = 0.0
+    export_seconds: float = 0.0
+
+    @property
+    def events_per_second(self) -> float:
+        return self.events / self.processing_seconds if self.processing_seconds > 0 else 0.0
+
+    def __str__(self) -> str:
+        return (f"Processed {self.events} events ({self.failed_events} failed) in {self.processing_seconds:.2f} s, "
+                f"{self.events_per_second:.1f} events/s. Wrote {self.nodes} nodes and {self.edges} edges in "
+                f"{self.export_seconds:.2f} s.")
+
+
+def _iter_json_array(stream: TextIO, first_chunk: str) -> Iterator[dict]:
+    decoder = json.JSONDecoder()
+    buffer = first_chunk[first_chunk.index("[") + 1:]
+    while True:
+        buffer = buffer.lstrip(" \t\r\n,")
+        if buffer.startswith("]"):
+            return
+        try:
+            (value, end) = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = stream.read(READ_CHUNK_SIZE)
+            if not chunk:
+                raise
+            buffer += chunk
+            continue
+        yield value
+        buffer = buffer[end:]
+
+
+def iter_events(source: Union[str, Path, TextIO]) -> Iterator[dict]:
+    """Reads events one by one from a file without loading the whole file.
+
+    The file is either a JSON array, e.g., an event log written by :py:meth:`.SimProv.save_event_log`, or a JSON
+    document per line, e.g., an event journal (see :py:class:`.EventJournal`), whose header is skipped.
+
+    :param Union[str, Path, TextIO] source: The path of the file or an opened text stream.
+    :rtype: Iterator[dict]
+    """
+    if isinstance(source, (str, Path)):
+        with open(source, "r", encoding="utf-8") as stream:
+            yield from iter_events(stream)
+        return
+    first_chunk = source.read(READ_CHUNK_SIZE)
+    if first_chunk.lstrip().startswith("["):
+        yield from _iter_json_array(source, first_chunk)
+        return
+    # The first chunk is completed to whole lines before the remaining lines are read from the stream.
+    for line in chain((first_chunk + source.readline()).splitlines(), source):
+        if line.strip():
+            event = json.loads(line)
+            if "journal" not in event or "type" in event:
+                yield event
+
+
+def write_graph(provenance_graph, out_path: Union[str, Path]):
+    """Writes a provenance graph in the format given by the extension of the path.
+
+    ``.dot`` and ``.gv`` are written as DOT, ``.parquet`` and ``.arrow`` as directory of columnar tables (see
+    :py:func:`.write_columnar`), everything else as PROV-JSON.
+
+    :param ProvenanceGraph provenance_graph:
+    :param Union[str, Path] out_path: The path of the written file or directory.
+    """
+    from simprov.export import COLUMNAR_FORMATS, write_columnar, write_dot, write_prov_json
+    suffix = Path(out_path).suffix
+    columnar_formats = {extension: file_format for (file_format, extension) in COLUMNAR_FORMATS.items()}
+    if suffix in columnar_formats:
+        write_columnar(provenance_graph, out_path, columnar_formats[suffix])
+        return
+    with open(out_path, "w", encoding="utf-8") as out_file:
+        if suffix in (".dot", ".gv"):
+            write_dot(provenance_graph, out_file)
+        else:
+            write_prov_json(provenance_graph, out_file)
+
+
+def load_study(rule_path: str, specifications_path: str, state_file_path: str,
+               base_graph_path: str = None) -> SimProv:
+    """Loads a study from its state file without starting the REST API and without writing the state file.
+
+    The events are replayed with a generator of node ids of their own, so the nodes get the same ids as in the
+    server that wrote the state file.
+
+    :param str rule_path: The path of the rules.
+    :param str specifications_path: The path of the specifications.
+    :param str state_file_path: The path of the state file.
+    :param str, optional base_graph_path: The PROV-JSON document the provenance graph of the study starts from.
+    :rtype: SimProv
+    :return: A headless instance without a state file.
+    """
+    with use_id_generator(random.Random("simprov")):
+        simprov = SimProv(rule_path, specifications_path, None, start_api=False, base_graph_path=base_graph_path,
+                          headless=True)
+        simprov.load_study_state(state_file_path)
+    return simprov
+
+
+def build(events_path: Union[str, Path], rule_path: str, specifications_path: str, out_path: Union[str, Path],
+          keep_going: bool = False, base_graph_path: str = None) -> BuildReport:
+    """Builds the provenance graph of an event file and writes it, without starting the REST API.
+
+    The events are streamed from the file and processed by a headless :py:class:`.SimProv` instance without a state
+    file.
+
+    :param Union[str, Path] events_path: The event file, see :py:func:`iter_events`.
+    :param str rule_path: The path of the rules.
+    :param str specifications_path: The path of the specifications.
+    :param Union[str, Path] out_path: The output path, see :py:func:`write_graph`.
+    :param bool keep_going: If true events that can not be processed are skipped, otherwise the build stops.
+    :param str, optional base_graph_path: The PROV-JSON document the provenance graph starts from.
+    :rtype: BuildReport
+    :raises Exception: The exception of the first failing event unless `keep_going` is true.
+    """
+    report = BuildReport()
+    start = time.perf_counter()
+    simprov = SimProv(rule_path, specifications_path, None, start_api=False, base_graph_path=base_graph_path,
+                      headless=True)
+    for event in iter_events(events_path):
+        try:
+            simprov.process_event(event, save_study_state=False, deduplicate=False)
+            report.events += 1
+        except Exception:
+            if not keep_going:
+                raise
+            report.failed_events += 1
+    report.processing_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    write_graph(simprov.provenance_graph, out_path)
+    report.export_seconds = time.perf_counter() - start
+    report.nodes = simprov.provenance_graph.graph.number_of_nodes()
+    report.edges = simprov.provenance_graph.graph.number_of_edges()
+    return report
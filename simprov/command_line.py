@@ -1,19 +1,228 @@
 import argparse
+import logging
+import sys
 
-from simprov.core import SimProv
+from simprov.export import COLUMNAR_FORMATS
+from simprov.interface.options import ASYNC_MODES, ServerOptions
+
+study_arguments = argparse.ArgumentParser(add_help=False)
+study_arguments.add_argument("pattern_specification", help="The path to the pattern specification file (YAML)")
+study_arguments.add_argument("rule_specification", help="The path to the rule specification file (PYTHON).")
+study_arguments.add_argument("--state-file", default="./study-state.pickle",
+                             help="The path to the file storing the provenance information. "
+                                  "Will be written using pickle.")
+study_arguments.add_argument("--dedup-window", type=float, default=None,
+                             help="Skip capturer events that repeat within this many seconds without changing "
+                                  "the graph.")
+study_arguments.add_argument("--watch", action="store_true",
+                             help="Reload the rules and specifications whenever their files are modified.")
+study_arguments.add_argument("--base-graph", metavar="PROV_JSON", default=None,
+                             help="Start from the provenance graph in the PROV-JSON file instead of an empty graph.")
+study_arguments.add_argument("--reachability-index", action="store_true",
+                             help="Maintain an index answering whether a node was derived from another one in "
+                                  "constant time.")
+study_arguments.add_argument("--journal", metavar="FILE", default=None,
+                             help="Write the processed events into the journal file read replicas follow.")
+study_arguments.add_argument("--trace-file", metavar="FILE", default=None,
+                             help="Append the trace of every processed event to the file in the OTLP JSON format.")
 
 parser = argparse.ArgumentParser(
     prog='simprov',
-    description='Starts the SimProv provenance builder.')
-parser.add_argument("pattern_specification", help="The path to the pattern specification file (YAML)")
-parser.add_argument("rule_specification", help="The path to the rule specification file (PYTHON).")
-parser.add_argument("--state-file", default="./study-state.pickle",
-                    help="The path to the file storing the provenance information. Will be written using pickle.")
+    description='Starts the SimProv provenance builder. Use "simprov serve" to run it in production and '
+                '"simprov host" to serve many studies. "simprov build" builds a graph offline and "simprov diff" '
+                'compares two studies.',
+    parents=[study_arguments])
+parser.add_argument("--export-columnar", metavar="DIRECTORY", default=None,
+                    help="Export the node, edge and attribute tables of the study into the directory and exit.")
+parser.add_argument("--columnar-format", choices=list(COLUMNAR_FORMATS), default="parquet",
+                    help="The format of the columnar export.")
+parser.add_argument("--incremental", action="store_true",
+                    help="Append only the nodes added since the last columnar export.")
+
+serve_parser = argparse.ArgumentParser(
+    prog='simprov serve',
+    description='Runs SimProv in production, i.e., without debug mode and per-request logs, on an asynchronous '
+                'server that offloads long requests to a worker pool.',
+    parents=[study_arguments])
+serve_parser.add_argument("--host", default="0.0.0.0", help="The host the server listens on.")
+serve_parser.add_argument("--port", type=int, default=5000, help="The port the server listens on.")
+serve_parser.add_argument("--async-mode", choices=list(ASYNC_MODES), default=None,
+                          help="The server the REST API runs on. gevent and waitress, which serves the threading "
+                               "mode, have to be installed separately. Defaults to eventlet, and to threading for "
+                               "read replicas and --watch.")
+serve_parser.add_argument("--workers", type=int, default=8,
+                          help="The number of threads long requests, e.g., reductions and exports, are offloaded to. "
+                               "In threading mode, the number of server threads.")
+serve_parser.add_argument("--log-level", choices=["debug", "info", "warning", "error"], default="warning",
+                          help="The level of the log messages.")
+serve_parser.add_argument("--log-requests", action="store_true",
+                          help="Log every request and websocket frame.")
+serve_parser.add_argument("--replica-of", metavar="JOURNAL", default=None,
+                          help="Run as read replica that follows the journal of a writer instead of using a state "
+                               "file. Requires --writer-url.")
+serve_parser.add_argument("--writer-url", metavar="URL", default=None,
+                          help="The base URL of the writer, e.g., http://localhost:5000. User edits and capturer "
+                               "events sent to a read replica are forwarded to it.")
+
+host_parser = argparse.ArgumentParser(
+    prog='simprov host',
+    description='Serves many studies from one server under /studies/<study id>. The studies are loaded on demand and '
+                'unloaded when the memory budget is exceeded.')
+host_parser.add_argument("config", help="The YAML file listing the studies with their rules, specifications and "
+                                        "state files.")
+host_parser.add_argument("--host", default="0.0.0.0", help="The host the server listens on.")
+host_parser.add_argument("--port", type=int, default=5000,
+                         help="The port of the first worker process. Worker i listens on port + i.")
+host_parser.add_argument("--processes", type=int, default=1,
+                         help="The number of worker processes the studies are pinned to.")
+host_parser.add_argument("--memory-budget", type=int, default=0, metavar="MB",
+                         help="The estimated memory in megabytes all loaded studies may use. 0 disables unloading.")
+host_parser.add_argument("--log-level", choices=["debug", "info", "warning", "error"], default="warning",
+                         help="The level of the log messages.")
+
+build_parser = argparse.ArgumentParser(
+    prog='simprov build',
+    description='Builds the provenance graph of an event file and writes it without starting the web server, e.g., '
+                'for CI, nightly rebuilds and archiving.')
+build_parser.add_argument("events", help="The event file, either a JSON array like the downloaded event log or one "
+                                         "event per line like an event journal.")
+build_parser.add_argument("--rules", required=True, help="The path to the rule specification file (PYTHON or YAML).")
+build_parser.add_argument("--specs", required=True, help="The path to the pattern specification file (YAML).")
+build_parser.add_argument("--out", required=True,
+                          help="The output path. .dot and .gv are written as DOT, .parquet and .arrow as directory of "
+                               "columnar tables, everything else as PROV-JSON.")
+build_parser.add_argument("--keep-going", action="store_true",
+                          help="Skip events that can not be processed instead of stopping.")
+build_parser.add_argument("--base-graph", metavar="PROV_JSON", default=None,
+                          help="Start from the provenance graph in the PROV-JSON file instead of an empty graph.")
+
+diff_parser = argparse.ArgumentParser(
+    prog='simprov diff',
+    description='Prints the differences between two studies as JSON lines. A study is either a state file (.pickle) '
+                'or a PROV-JSON file. The files are only read.')
+diff_parser.add_argument("old", help="The older study.")
+diff_parser.add_argument("new", help="The newer study.")
+diff_parser.add_argument("--specs", required=True, help="The path to the pattern specification file (YAML).")
+diff_parser.add_argument("--rules", default=None,
+                         help="The path to the rule specification file (PYTHON or YAML). Required for state files.")
+diff_parser.add_argument("--output", metavar="FILE", default=None,
+                         help="Write the differences into the file instead of printing them.")
+
+
+def _load_study_graph(args, path):
+    if path.endswith(".pickle"):
+        from simprov.batch import load_study
+        return load_study(args.rules, args.specs, path).provenance_graph
+    from simprov.importer import load_prov_json
+    from simprov.specifications import SpecificationManager
+    return load_prov_json(path, SpecificationManager(args.specs))
+
+
+def serve(args):
+    """Runs SimProv with the production options until it is stopped.
+
+    :param argparse.Namespace args: The arguments parsed by the serve parser.
+    """
+    if args.replica_of is not None and args.writer_url is None:
+        serve_parser.error("--writer-url is required for read replicas")
+    from simprov.core import SimProv
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    # Replicas and --watch change the graph in a background thread, which requires real threads for the websocket
+    # notifications.
+    async_mode = args.async_mode or ("eventlet" if args.replica_of is None and not args.watch else "threading")
+    options = ServerOptions.production(args.host, args.port, async_mode, args.workers, args.log_requests)
+    instance = SimProv(args.rule_specification, args.pattern_specification, args.state_file, start_api=False,
+                       deduplication_window=args.dedup_window,
+                       watch_files=args.watch, base_graph_path=args.base_graph,
+                       reachability_index=args.reachability_index, server_options=options,
+                       journal_path=args.journal, replica_of=args.replica_of, writer_url=args.writer_url,
+                       trace_path=args.trace_file)
+    logging.getLogger(__name__).warning("Serving SimProv on %s:%d with %s", args.host, args.port, async_mode)
+    instance.rest_api.serve()
+
+
+def host(args):
+    """Runs the study host in one or more worker processes until it is stopped.
+
+    :param argparse.Namespace args: The arguments parsed by the host parser.
+    """
+    import multiprocessing
+    from simprov.interface.host import run_host_worker
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    processes = max(args.processes, 1)
+    ports = [args.port + index for index in range(processes)]
+    memory_budget = args.memory_budget * 1024 * 1024 // processes
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=run_host_worker, args=(args.config, args.host, ports, index, memory_budget),
+                               name=f"simprov-host-{index}", daemon=True)
+               for index in range(1, processes)]
+    for worker in workers:
+        worker.start()
+    logging.getLogger(__name__).warning("Hosting the studies of %s on %s:%s", args.config, args.host,
+                                        ",".join(map(str, ports)))
+    try:
+        run_host_worker(args.config, args.host, ports, 0, memory_budget)
+    finally:
+        for worker in workers:
+            worker.terminate()
+
+
+def build(args):
+    """Builds the provenance graph of an event file and prints the throughput.
+
+    :param argparse.Namespace args: The arguments parsed by the build parser.
+    """
+    from simprov.batch import build as build_graph
+    report = build_graph(args.events, args.rules, args.specs, args.out, args.keep_going, args.base_graph)
+    print(report)
+
+
+def diff(args):
+    """Prints the differences between two studies or writes them into a file.
+
+    :param argparse.Namespace args: The arguments parsed by the diff parser.
+    """
+    from simprov.diff import write_diff
+    if args.rules is None and any(path.endswith(".pickle") for path in (args.old, args.new)):
+        diff_parser.error("--rules is required to load state files")
+    (old_graph, new_graph) = [_load_study_graph(args, path) for path in (args.old, args.new)]
+    if args.output is None:
+        write_diff(old_graph, new_graph, sys.stdout)
+    else:
+        with open(args.output, "w", encoding="utf-8") as diff_file:
+            count = write_diff(old_graph, new_graph, diff_file)
+        print(f"Wrote {count} differences to {args.output}")
 
 
 def main():
+    if sys.argv[1:2] == ["serve"]:
+        serve(serve_parser.parse_args(sys.argv[2:]))
+        return
+    if sys.argv[1:2] == ["host"]:
+        host(host_parser.parse_args(sys.argv[2:]))
+        return
+    if sys.argv[1:2] == ["build"]:
+        build(build_parser.parse_args(sys.argv[2:]))
+        return
+    if sys.argv[1:2] == ["diff"]:
+        diff(diff_parser.parse_args(sys.argv[2:]))
+        return
     print("SIMPROV")
     args = parser.parse_args()
     print(args)
-    instance = SimProv(args.rule_specification, args.pattern_specification, args.state_file)
+    # Imported after parsing, so --help does not pay for loading the graph and server libraries.
+    from simprov.core import SimProv
+    from simprov.export import write_columnar
+    if args.export_columnar is not None:
+        from simprov.batch import load_study
+        instance = load_study(args.rule_specification, args.pattern_specification, args.state_file, args.base_graph)
+        count = write_columnar(instance.provenance_graph, args.export_columnar, args.columnar_format,
+                               args.incremental)
+        print(f"Exported {count} nodes to {args.export_columnar}")
+        return
+    instance = SimProv(args.rule_specification, args.pattern_specification, args.state_file,
+                       deduplication_window=args.dedup_window,
+                       watch_files=args.watch, base_graph_path=args.base_graph,
+                       reachability_index=args.reachability_index, journal_path=args.journal,
+                       trace_path=args.trace_file)
     # instance.load_study_state()
@@ -1,15 +1,32 @@
 import json
 import pickle
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, List
-from uuid import UUID
+from threading import RLock
+from time import perf_counter, sleep
+from typing import Callable, Dict, Iterator, List, Tuple, TYPE_CHECKING
+from uuid import UUID, uuid4
 
 from simprov import Activity
-from simprov.interface.restapi import RestAPI
-from simprov.provenance import ProvenanceGraph
+from simprov.deduplication import EventDeduplicator, fingerprint_event
+from simprov.exceptions import ReadOnlyReplicaException
+from simprov.importer import load_prov_json
+from simprov.interface.options import ServerOptions
+from simprov.journal import EventJournal, JournalFollower, forward_event
+from simprov.metrics import PipelineMetrics
+from simprov.provenance import ProvenanceGraph, id_generator_state, reset_id_generator, set_id_generator_state
 from simprov.reducer import GraphReducer
+from simprov.reload import ReloadChanges, ReloadWatcher, diff_reload
 from simprov.rule_engine import RuleEngine
 from simprov.specifications import SpecificationManager
+from simprov.tracing import OTLPFileExporter, Span, Tracer
+
+if TYPE_CHECKING:
+    from simprov.interface.restapi import RestAPI
+
+USER_EVENT_TYPES = ("Update Dependencies", "Update Entity", "Hide Node")
+# The number of times a read snapshot is copied without the write lock before the last published one is used.
+SNAPSHOT_ATTEMPTS = 4
 
 
 class SimProv:
@@ -20,12 +37,45 @@ class SimProv:
 
     During initialization the rules and specifications are automatically loaded.
 
+    All changes are made by a single writer at a time, serialized by the write lock. Readers, e.g., the browser API,
+    work on an immutable copy of the provenance graph, see :py:meth:`read_snapshot`, so heavy reads never block the
+    processing of events and never see half-processed events. The copy is taken without the write lock.
+
     :param str rule_path:
         The path where the rules are located.
     :param str specifications_path:
         The path where the specifications are located.
     :param str state_file_path:
-        The path to the file in which the state of SimProv should be stored.
+        The path to the file in which the state of SimProv should be stored. The state is not stored if ``None``.
+    :param float, optional deduplication_window:
+        When provided, a capturer event that repeats within this many seconds without any change of the latest
+        entities it touches is skipped, unless its rule opts out with ``memoize=False``.
+    :param bool watch_files:
+        If true the rules and specifications are reloaded whenever their files are modified.
+    :param str, optional base_graph_path:
+        The path of a PROV-JSON document, e.g., an archived study. It is loaded as the provenance graph before the
+        events of the state file are processed, without replaying the events that built it. The ids of new nodes are
+        drawn from a seed derived from the imported node ids, so they do not repeat them.
+    :param bool reachability_index:
+        If true a :py:class:`.ReachabilityIndex` is maintained for the provenance graph.
+    :param ServerOptions, optional server_options:
+        The options of the server running the REST API. The development options if ``None``.
+    :param str, optional journal_path:
+        The path of the event journal read replicas follow. No journal is written if ``None``.
+    :param str, optional replica_of:
+        The path of the event journal of a writer. If given, this instance is a read replica: it neither loads nor
+        stores a state file and builds its provenance graph from the journal.
+    :param str, optional writer_url:
+        The base URL of the writer. If given, events submitted to this instance, e.g., user edits, are forwarded to it.
+        Read replicas without it reject submitted events.
+    :param bool share_modules:
+        If true the rule and specification files are loaded only once per content and process and shared with the
+        other instances, e.g., the studies of a :py:class:`.StudyHost`.
+    :param str, optional trace_path:
+        The path of the file the traces of the processed events are exported to in the OTLP JSON format. The traces
+        are only kept in memory if ``None``.
+    :param bool headless:
+        If true no REST API is created, so Flask and Socket.IO are never imported, e.g., for ``simprov build``.
     :ivar RuleEngine rule_engine:
         The rule engine.
     :ivar bool start_api:
@@ -35,42 +85,347 @@ class SimProv:
     :ivar ProvenanceGraph provenance_graph:
         The provenance graph.
     :ivar RestAPI rest_api:
-        The REST API.
+        The REST API. ``None`` if the instance is headless.
     :ivar str state_file_path:
         The path to the state file.
     :ivar list event_log:
         A list of all processed events.
+    :ivar EventDeduplicator deduplicator:
+        The deduplicator for repeated capturer events. ``None`` if deduplication is disabled.
+    :ivar Dict[int,UUID] event_activities:
+        A mapping from the indices of the capturer events in the event log to the ids of their activities.
+    :ivar RLock write_lock:
+        The lock serializing all changes of the provenance graph, the rules and the specifications.
+    :ivar int write_count:
+        A counter that is increased when a change starts and when it ends, i.e., it is odd while a change is made.
+    :ivar Tuple[int,ProvenanceGraph] published_snapshot:
+        The graph version and the copy of the provenance graph that was last handed out to readers.
+    :ivar int graph_version:
+        A counter that is increased whenever the provenance graph or the event log changes.
+    :ivar str instance_token:
+        A random token identifying this instance. Together with the graph version it identifies a graph state.
+    :ivar str base_graph_path:
+        The path of the PROV-JSON document the provenance graph starts from. ``None`` if it starts empty.
+    :ivar bool use_reachability_index:
+        If true the provenance graph maintains a reachability index.
+    :ivar EventJournal journal:
+        The event journal for read replicas. ``None`` if no journal is written.
+    :ivar JournalFollower journal_follower:
+        The follower of the writer's journal. ``None`` if this instance is not a read replica.
+    :ivar str writer_url:
+        The base URL of the writer submitted events are forwarded to. ``None`` if they are processed locally.
+    :ivar bool share_modules:
+        If true the rule and specification files are shared with the other instances.
+    :ivar PipelineMetrics metrics:
+        The latencies and counters of the event processing, exposed at ``/debug/metrics``.
+    :ivar Tracer tracer:
+        The tracer recording a trace for every processed event, exposed at ``/debug/traces``.
     """
 
     def __init__(self, rule_path: str, specifications_path: str,
-                 state_file_path: str = "./study-state.pickle", start_api: bool = True):
+                 state_file_path: str = "./study-state.pickle", start_api: bool = True,
+                 deduplication_window: float = None, watch_files: bool = False, base_graph_path: str = None,
+                 reachability_index: bool = False, server_options: ServerOptions = None, journal_path: str = None,
+                 replica_of: str = None, writer_url: str = None, share_modules: bool = False,
+                 trace_path: str = None, headless: bool = False):
         super().__init__()
         self.rule_engine: RuleEngine = RuleEngine()
         self.specification_manager: SpecificationManager = SpecificationManager()
         self.provenance_graph: ProvenanceGraph = ProvenanceGraph()
-        self.rest_api: RestAPI = RestAPI(self)
+        self.rest_api: 'RestAPI' = None
+        if not headless:
+            from simprov.interface.restapi import RestAPI
+            self.rest_api = RestAPI(self, server_options)
         self.state_file_path: str = state_file_path
         self.event_log = []
+        self.event_activities: Dict[int, UUID] = {}
         self.error_log: List[Exception] = []
+        self.write_lock: RLock = RLock()
+        self.write_count: int = 0
+        self._write_depth: int = 0
+        self.published_snapshot: Tuple[int, ProvenanceGraph] = None
+        self.rule_path: str = rule_path
+        self.specifications_path: str = specifications_path
+        self.reload_watcher: ReloadWatcher = None
+        self.graph_version: int = 0
+        self.instance_token: str = uuid4().hex[:8]
+        self.base_graph_path: str = base_graph_path
+        self.use_reachability_index: bool = reachability_index
+        self.journal: EventJournal = None
+        self.journal_follower: JournalFollower = None
+        self.writer_url: str = writer_url
+        self.share_modules: bool = share_modules
+        self.metrics: PipelineMetrics = PipelineMetrics()
+        self.tracer: Tracer = Tracer(exporter=None if trace_path is None else OTLPFileExporter(trace_path))
         self.reduced_graph = None
+        self.deduplicator: EventDeduplicator = None
+        if deduplication_window is not None:
+            self.deduplicator = EventDeduplicator(deduplication_window)
 
         self.load_rules_and_specifications(rule_path, specifications_path)
-        self.load_study_state(self.state_file_path)
-        if start_api:
+        self.provenance_graph = self._new_provenance_graph()
+        if replica_of is None:
+            self.load_study_state(self.state_file_path)
+        else:
+            self.state_file_path = None
+            self.journal_follower = JournalFollower(self, replica_of)
+            self.journal_follower.poll()
+            self.journal_follower.start()
+        if journal_path is not None:
+            self.journal = EventJournal(journal_path)
+            self.journal.rewrite(self.event_log)
+        if watch_files:
+            self.reload_watcher = ReloadWatcher(self)
+            self.reload_watcher.start()
+        if start_api and self.rest_api is not None:
             self.rest_api.start()
 
     def load_rules_and_specifications(self, rule_path: str, specifications_path: str):
         """Loads the rules and specifications.
 
         :param str rule_path:
-            The path where the rules are located.
+            The path where the rules are located. Either a Python file or a YAML file with declarative rules.
         :param str specifications_path:
             The path where the specifications are located.
         """
-        self.specification_manager.load_specification_file(specifications_path)
-        self.rule_engine.load_rules(rule_path)
+        self.specification_manager.load_specification_file(specifications_path, self.share_modules)
+        self.rule_engine.load_rules(rule_path, self.specification_manager, self.share_modules)
+        self.rule_path = rule_path
+        self.specifications_path = specifications_path
+
+    def reload_rules_and_specifications(self, rule_path: str = None, specifications_path: str = None) -> ReloadChanges:
+        """Reloads the rules and specifications without restarting SimProv.
+
+        The new rules and specifications are loaded aside and swapped in at once, so a broken file leaves the
+        current ones untouched. Afterwards only the changes are applied:
+
+        - Changed styles are patched into the existing nodes.
+        - Changed indexed attributes only rebuild the attribute index.
+        - If no processed event is affected by a changed rule or specification, nothing is reprocessed.
+        - Otherwise the whole provenance graph is rebuilt from the event log, not only from the first affected event.
+          The node ids are the same as after a restart. If the rebuild fails, the previous rules, specifications and
+          provenance graph are restored and no styles are patched.
+
+        :param str, optional rule_path:
+            The path where the rules are located. If ``None`` the currently loaded path is used.
+        :param str, optional specifications_path:
+            The path where the specifications are located. If ``None`` the currently loaded path is used.
+        :rtype: ReloadChanges
+        :return: The detected changes.
+        """
+        rule_path = self.rule_path if rule_path is None else rule_path
+        specifications_path = self.specifications_path if specifications_path is None else specifications_path
+        new_specification_manager = SpecificationManager(specifications_path, self.share_modules)
+        new_rule_engine = RuleEngine(rule_path, new_specification_manager, self.share_modules)
+        with self._writing():
+            changes = diff_reload(self.rule_engine, self.specification_manager, new_rule_engine,
+                                  new_specification_manager)
+            old_state = (self.rule_engine, self.specification_manager, self.rule_path, self.specifications_path)
+            self.rule_engine, self.specification_manager = new_rule_engine, new_specification_manager
+            self.rule_path, self.specifications_path = rule_path, specifications_path
+            if changes.requires_reprocessing and self._has_affected_event(changes):
+                try:
+                    self._rebuild_from_event_log()
+                except Exception:
+                    (self.rule_engine, self.specification_manager, self.rule_path, self.specifications_path) = old_state
+                    raise
+            self._restyle_nodes(changes)
+            self.provenance_graph.configure_attribute_index(self.specification_manager.indexed_attributes())
+            if not changes.is_empty:
+                self.graph_version += 1
+        return changes
+
+    def close(self):
+        """Stops the background threads of this instance and closes its journal.
+
+        The REST API is not stopped. Used, e.g., when a :py:class:`.StudyHost` unloads a study.
+        """
+        if self.reload_watcher is not None:
+            self.reload_watcher.stop()
+        if self.journal_follower is not None:
+            self.journal_follower.stop()
+        if self.journal is not None:
+            self.journal.close()
+
+    @contextmanager
+    def _writing(self) -> Iterator[None]:
+        with self.write_lock:
+            self._write_depth += 1
+            if self._write_depth == 1:
+                self.write_count += 1
+            try:
+                yield
+            finally:
+                if self._write_depth == 1:
+                    self.write_count += 1
+                self._write_depth -= 1
+
+    def read_snapshot(self) -> ProvenanceGraph:
+        """Returns an immutable snapshot of the provenance graph for readers, see :py:meth:`read_versioned_snapshot`.
+
+        :rtype: ProvenanceGraph
+        :return: The snapshot of the latest processed event, or of a recent one while events are processed.
+        """
+        return self.read_versioned_snapshot()[1]
+
+    def read_versioned_snapshot(self) -> Tuple[int, ProvenanceGraph]:
+        """Returns an immutable snapshot of the provenance graph together with the graph version it shows.
 
-    def process_event(self, event: dict, save_study_state: bool = True):
+        The snapshot is copied at most once per graph version, between two events. Readers must not modify it.
+        The copy is taken without the write lock and discarded if a change was made meanwhile, see
+        :py:attr:`write_count`. If the writer keeps changing the graph, the last published snapshot is returned instead,
+        and only the very first snapshot is copied under the write lock. Responses derived from the snapshot, e.g.,
+        their ETags, have to use the returned version, which may be older than :py:attr:`graph_version`.
+
+        :rtype: Tuple[int,ProvenanceGraph]
+        :return: The graph version and the snapshot.
+        """
+        published_snapshot = self.published_snapshot
+        if published_snapshot is not None and published_snapshot[0] == self.graph_version:
+            return published_snapshot
+        versioned_snapshot = self._read_consistently(lambda: (self.graph_version, self.provenance_graph.copy()))
+        if versioned_snapshot is not None:
+            return self._publish_snapshot(*versioned_snapshot)
+        if published_snapshot is not None:
+            return self.published_snapshot
+        with self.write_lock:
+            return self._publish_snapshot(self.graph_version, self.provenance_graph.copy())
+
+    def read_event_log(self) -> Tuple[int, List[dict]]:
+        """Returns a copy of the event log together with the graph version it belongs to.
+
+        Like :py:meth:`read_versioned_snapshot`, the event log is read without the write lock unless the writer keeps
+        changing it.
+
+        :rtype: Tuple[int,List[dict]]
+        :return: The graph version and the processed events.
+        """
+        versioned_log = self._read_consistently(lambda: (self.graph_version, self.event_log, len(self.event_log)))
+        if versioned_log is None:
+            with self.write_lock:
+                versioned_log = (self.graph_version, self.event_log, len(self.event_log))
+        # The event log is only appended to until a rebuild replaces it, so its first events do not change.
+        (graph_version, event_log, length) = versioned_log
+        return (graph_version, event_log[:length])
+
+    def _read_consistently(self, read: Callable[[], tuple]) -> tuple | None:
+        for _ in range(SNAPSHOT_ATTEMPTS):
+            write_count = self.write_count
+            if write_count % 2 == 0:
+                try:
+                    result = read()
+                except Exception:
+                    # The writer changed the graph while it was read, e.g., a dictionary changed its size.
+                    result = None
+                if result is not None and self.write_count == write_count:
+                    return result
+            sleep(0)
+        return None
+
+    def _publish_snapshot(self, graph_version: int, snapshot: ProvenanceGraph) -> Tuple[int, ProvenanceGraph]:
+        published_snapshot = self.published_snapshot
+        if published_snapshot is not None and published_snapshot[0] >= graph_version:
+            return published_snapshot
+        self.published_snapshot = (graph_version, snapshot)
+        return self.published_snapshot
+
+    def _has_affected_event(self, changes: ReloadChanges) -> bool:
+        for (index, event) in enumerate(self.event_log):
+            if event["type"] in USER_EVENT_TYPES:
+                continue
+            if event["type"] in changes.changed_event_types:
+                return True
+            activity = self.provenance_graph.node_map.get(self.event_activities.get(index, None), None)
+            if activity is None:
+                return True
+            if activity.name in changes.changed_activity_names \
+                    or any(entity.name in changes.changed_entity_names for entity in activity.entities) \
+                    or any(agent.name in changes.changed_agent_names for agent in activity.associated_agents):
+                return True
+        return False
+
+    def _restyle_nodes(self, changes: ReloadChanges):
+        if not (changes.restyled_entity_names or changes.restyled_agent_names):
+            return
+        for (node_id, node) in self.provenance_graph.node_map.items():
+            if isinstance(node, Activity):
+                continue
+            if node.name in changes.restyled_entity_names:
+                spec = self.specification_manager.get_entity_specification(node.name)
+            elif node.name in changes.restyled_agent_names:
+                spec = self.specification_manager.get_agent_specification(node.name)
+            else:
+                continue
+            node.meta_information = spec.style_info
+            self.provenance_graph.graph.nodes[node_id]["meta_information"] = dict(spec.style_info)
+
+    def _new_provenance_graph(self) -> ProvenanceGraph:
+        if self.base_graph_path is None:
+            provenance_graph = ProvenanceGraph()
+        else:
+            provenance_graph = load_prov_json(self.base_graph_path, self.specification_manager)
+            reset_id_generator(provenance_graph.node_map)
+        if self.use_reachability_index:
+            provenance_graph.enable_reachability_index()
+        provenance_graph.configure_attribute_index(self.specification_manager.indexed_attributes())
+        return provenance_graph
+
+    def _clear_provenance_graph(self):
+        reset_id_generator()
+        self.provenance_graph = self._new_provenance_graph()
+        self.event_log = []
+        self.event_activities = {}
+        self.reduced_graph = None
+        if self.deduplicator is not None:
+            self.deduplicator.clear()
+
+    def _rebuild_from_event_log(self):
+        old_state = (self.provenance_graph, self.event_log, self.event_activities, self.reduced_graph)
+        old_id_generator_state = id_generator_state()
+        events = self.event_log
+        self._clear_provenance_graph()
+        try:
+            self._reprocess_events(events)
+        except Exception:
+            (self.provenance_graph, self.event_log, self.event_activities, self.reduced_graph) = old_state
+            set_id_generator_state(old_id_generator_state)
+            raise
+        if self.journal is not None:
+            self.journal.rewrite(self.event_log)
+
+    def apply_journal_events(self, events: List[dict], reset: bool = False):
+        """Applies the events read from the journal of a writer, see :py:class:`.JournalFollower`.
+
+        The node ids are generated deterministically, so they equal the ones of the writer.
+
+        :param List[dict] events:
+            The events appended to the journal.
+        :param bool reset:
+            If true the provenance graph is rebuilt, i.e., the events are the whole journal.
+        """
+        with self._writing():
+            if reset:
+                self._clear_provenance_graph()
+                self.graph_version += 1
+            for event in events:
+                self.process_event(event, False, deduplicate=False)
+
+    def submit_event(self, event: dict):
+        """Processes an event, or forwards it to the writer if this instance is a read replica.
+
+        :param dict event:
+            The event, e.g., a user edit.
+        :raises ReadOnlyReplicaException:
+            If this instance is a read replica without writer URL. Its graph would drift from the writer's journal.
+        """
+        if self.writer_url is not None:
+            forward_event(self.writer_url, event)
+        elif self.journal_follower is not None:
+            raise ReadOnlyReplicaException("This read replica has no writer URL, events have to be sent to the writer.")
+        else:
+            self.process_event(event)
+
+    def process_event(self, event: dict, save_study_state: bool = True, deduplicate: bool = True):
         """ Processes an incoming event.
 
         The process consists of the following steps:
@@ -79,14 +434,36 @@ class SimProv:
         2. Normalizing and validating the activity using the specification manager
         3. On success, the activity is chained with the provenance graph, the event is added to the event log and the REST-API emits an event signaling that the provenance graph has been updated.
 
+        If deduplication is enabled, a capturer event that repeats a recently processed event is skipped before the
+        first step. Skipped events neither change the provenance graph nor the event log.
+
         :param dict event:
             The event.
         :param bool save_study_state:
             True if the study state should be saved after processing the event
+        :param bool deduplicate:
+            False if the event shall be processed even if it repeats a recently processed event, e.g., during replay
         :return:
             The extracted provenance activity.
         :rtype: Activity
         """
+        with self._writing():
+            start = perf_counter()
+            with self.tracer.span("process_event", {"simprov.event.type": str(event.get("type")),
+                                                    "simprov.event.sequence": len(self.event_log)}, root=True):
+                self._process_event(event, save_study_state, deduplicate)
+            self.metrics.event_seconds.observe(perf_counter() - start)
+
+    @contextmanager
+    def _stage(self, stage: str) -> Iterator[Span | None]:
+        with self.metrics.time(stage), self.tracer.span(stage) as span:
+            yield span
+
+    def _process_event(self, event: dict, save_study_state: bool, deduplicate: bool):
+        self.provenance_graph.event_sequence = len(self.event_log)
+        # A failed event is neither logged nor journaled, so the ids its rule drew are given back. Otherwise the ids
+        # of the following events would differ from the ones of a rebuild or a read replica.
+        id_state = id_generator_state()
         try:
             if event["type"] == "Update Dependencies":
                 self._update_dependencies(event)
@@ -95,21 +472,47 @@ class SimProv:
             elif event["type"] == "Hide Node":
                 self.provenance_graph.propagate_visibility_information(UUID(event["node_id"]), event["change"])
             else:
-                self._process_capturer_event(event)
+                fingerprint = None
+                processing_rule = self.rule_engine.rule_table.get(event["type"], None)
+                if self.deduplicator is not None and (processing_rule is None or processing_rule.memoize):
+                    fingerprint = fingerprint_event(event)
+                    if deduplicate and self.deduplicator.is_duplicate(fingerprint, self.provenance_graph):
+                        self.metrics.events_skipped += 1
+                        return
+                activity = self._process_capturer_event(event, fingerprint)
+                self.event_activities[len(self.event_log)] = activity.id
         except Exception as ex:
+            set_id_generator_state(id_state)
             print(f"Errorlog: {self.error_log}")
             self.error_log.append(ex)
+            self.metrics.count_error(ex)
             raise ex
         self.event_log.append(event)
-        self.rest_api.socketio.emit("graph-update-event")
+        if self.journal is not None:
+            with self._stage("journal"):
+                self.journal.append(event)
+        self.graph_version += 1
+        self.metrics.events_processed += 1
+        if self.rest_api is not None:
+            with self._stage("notify"):
+                self.rest_api.socketio.emit("graph-update-event")
         if save_study_state:
-            self.write_study_state()
-
-    def _process_capturer_event(self, event: dict) -> Activity:
-        extracted_activity = self.rule_engine.execute_rule(event)
-        normalized_activity = self.specification_manager.normalize_activity(extracted_activity)
-        self.specification_manager.validate_activity(normalized_activity)
-        self.provenance_graph.chain_provenance_activity(normalized_activity)
+            with self._stage("persist"):
+                self.write_study_state()
+
+    def _process_capturer_event(self, event: dict, fingerprint: str = None) -> Activity:
+        with self._stage("rule") as span:
+            if span is not None and event["type"] in self.rule_engine.rule_table:
+                span.attributes["simprov.rule"] = self.rule_engine.rule_table[event["type"]].func.__qualname__
+            extracted_activity = self.rule_engine.execute_rule(event)
+        with self._stage("normalize"):
+            normalized_activity = self.specification_manager.normalize_activity(extracted_activity)
+        with self._stage("validate"):
+            self.specification_manager.validate_activity(normalized_activity)
+        with self._stage("chain"):
+            self.provenance_graph.chain_provenance_activity(normalized_activity)
+        if fingerprint is not None:
+            self.deduplicator.remember(fingerprint, normalized_activity, self.provenance_graph)
         return normalized_activity
 
     def save_event_log(self, target_path: str):
@@ -149,6 +552,8 @@ class SimProv:
         file_path = study_state_file_path
         if file_path is None:
             file_path = self.state_file_path
+        if file_path is None:
+            return
         with open(file_path, "wb") as pickle_file:
             pickle.dump(self.get_study_state(), pickle_file)
 
@@ -163,7 +568,7 @@ class SimProv:
         file_path = study_state_file_path
         if file_path is None:
             file_path = self.state_file_path
-        if not Path(file_path).exists():
+        if file_path is None or not Path(file_path).exists():
             return
         with open(file_path, "rb") as pickle_file:
             events = pickle.load(pickle_file)
@@ -178,6 +583,8 @@ class SimProv:
         file_path = study_state_file_path
         if file_path is None:
             file_path = self.state_file_path
+        if file_path is None:
+            return
         path = Path(file_path)
         if path.exists():
             path.unlink()
@@ -205,15 +612,17 @@ class SimProv:
         """
         return self.provenance_graph.are_dependencies_are_forming_a_cycle(dependencies)
 
-    def _get_activity_node_data(self, base_data, node_id):
+    def _get_activity_node_data(self, base_data, node_id, provenance_graph: ProvenanceGraph = None):
+        if provenance_graph is None:
+            provenance_graph = self.provenance_graph
         user_generated_edges = []
-        for edge in self.provenance_graph.user_generated_dependencies:
+        for edge in provenance_graph.user_generated_dependencies:
             if edge[0] == node_id:
                 user_generated_edges.append(edge[1])
             elif edge[1] == node_id:
                 user_generated_edges.append(edge[0])
         base_data["user_generated_edges"] = user_generated_edges
-        base_data["hidden"] = True if node_id in self.provenance_graph.hidden_nodes else False
+        base_data["hidden"] = True if node_id in provenance_graph.hidden_nodes else False
 
     def _get_entity_node_data(self, node_data):
         new_attributes = []
@@ -233,12 +642,16 @@ class SimProv:
             new_attributes.append(attribute_data)
         node_data["attributes"] = new_attributes
 
-    def _update_reduced_graph(self, reduce_transitives=False, hide_nodes=False, split_agents=False):
-        graph_reducer = GraphReducer(self.provenance_graph)
+    def _update_reduced_graph(self, reduce_transitives=False, hide_nodes=False, split_agents=False,
+                              provenance_graph: ProvenanceGraph = None):
+        start = perf_counter()
+        graph_reducer = GraphReducer(self.provenance_graph if provenance_graph is None else provenance_graph)
         reduced_graph = graph_reducer.reduce(reduce_transitives, hide_nodes, split_agents)
+        self.metrics.reduction_seconds.observe(perf_counter() - start)
         self.reduced_graph = reduced_graph
+        return reduced_graph
 
     def _reprocess_events(self, events):
         for event in events:
-            self.process_event(event, False)
+            self.process_event(event, False, deduplicate=False)
         self.write_study_state()
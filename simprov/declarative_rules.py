@@ -0,0 +1,200 @@
+from pathlib import Path
+from typing import Callable, Dict, List, Union
+
+from simprov.exceptions import InvalidRuleSpecificationException, ActivitySpecificationNotFoundException, \
+    EntitySpecificationNotFoundException, AgentSpecificationNotFoundException
+from simprov.provenance import Activity, Entity, Agent
+from simprov.rule_engine import Rule
+from simprov.specifications import SpecificationManager, OccurenceModifier, _read_yaml_file
+
+_SECTIONS = {
+    "usage": ("entity", "Entity", "used_entities"),
+    "generation": ("entity", "Entity", "generated_entities"),
+    "association": ("agent", "Agent", "associated_agents"),
+}
+_RULE_KEYS = {"activity", "memoize"} | _SECTIONS.keys()
+_NODE_KEYS = {"entity", "agent", "attributes", "when", "unless"}
+
+
+def _field_accessor(event_type: str, field_path) -> str:
+    if isinstance(field_path, str):
+        keys = field_path.split(".")
+    elif isinstance(field_path, list) and all(isinstance(key, str) for key in field_path):
+        keys = field_path
+    else:
+        raise InvalidRuleSpecificationException(
+            f"Invalid event field \"{field_path}\" in rule for event type \"{event_type}\".")
+    return "event" + "".join(f"[{key!r}]" for key in keys)
+
+
+def _constant_expression(constants: List, value) -> str:
+    # Constants are passed to the rule function instead of being written into its source, because the repr of some
+    # YAML values, e.g., dates or .inf, is no Python expression.
+    constants.append(value)
+    return f"constants[{len(constants) - 1}]"
+
+
+def _value_expression(event_type: str, value, constants: List) -> str:
+    if isinstance(value, dict):
+        if value.keys() != {"value"}:
+            raise InvalidRuleSpecificationException(
+                f"Invalid attribute value \"{value}\" in rule for event type \"{event_type}\". Use a field path or \"value\".")
+        return _constant_expression(constants, value["value"])
+    return _field_accessor(event_type, value)
+
+
+def _node_source(event_type: str, section: str, node_definition: Dict, constants: List) -> List[str]:
+    name_key, class_name, target = _SECTIONS[section]
+    if not isinstance(node_definition, dict) or name_key not in node_definition:
+        raise InvalidRuleSpecificationException(
+            f"Every \"{section}\" entry of the rule for event type \"{event_type}\" needs an \"{name_key}\".")
+    unknown_keys = node_definition.keys() - _NODE_KEYS
+    if unknown_keys:
+        raise InvalidRuleSpecificationException(
+            f"Unknown keys {unknown_keys} in rule for event type \"{event_type}\".")
+    if "when" in node_definition and "unless" in node_definition:
+        raise InvalidRuleSpecificationException(
+            f"A \"{section}\" entry of the rule for event type \"{event_type}\" has both \"when\" and \"unless\".")
+    if not isinstance(node_definition.get("attributes", {}), dict):
+        raise InvalidRuleSpecificationException(
+            f"The attributes of a \"{section}\" entry of the rule for event type \"{event_type}\" are no mapping.")
+    lines = []
+    indent = "    "
+    if "when" in node_definition:
+        lines.append(f"{indent}if {_field_accessor(event_type, node_definition['when'])}:")
+        indent += "    "
+    elif "unless" in node_definition:
+        lines.append(f"{indent}if not {_field_accessor(event_type, node_definition['unless'])}:")
+        indent += "    "
+    attributes = ", ".join(f"{_constant_expression(constants, attribute)}: "
+                           f"{_value_expression(event_type, value, constants)}"
+                           for (attribute, value) in node_definition.get("attributes", {}).items())
+    name = _constant_expression(constants, node_definition[name_key])
+    lines.append(f"{indent}node = {class_name}({name}, attributes={{{attributes}}})")
+    lines.append(f"{indent}activity.{target}.append(node)")
+    return lines
+
+
+def compile_rule(event_type: str, rule_definition: Dict) -> Rule:
+    """Compiles a declarative rule into a rule function.
+
+    The rule definition is translated into the source of a plain Python function once, so executing the rule costs
+    the same as executing a hand-written rule.
+
+    :param str event_type:
+        The name of the event for which the rule should be executed.
+    :param Dict rule_definition:
+        The declarative rule definition.
+    :rtype: Rule
+    :return: The compiled rule.
+    :raises InvalidRuleSpecificationException:
+        If the rule definition is malformed.
+    """
+    if not isinstance(rule_definition, dict) or "activity" not in rule_definition:
+        raise InvalidRuleSpecificationException(f"The rule for event type \"{event_type}\" lacks an \"activity\".")
+    unknown_keys = rule_definition.keys() - _RULE_KEYS
+    if unknown_keys:
+        raise InvalidRuleSpecificationException(f"Unknown keys {unknown_keys} in rule for event type \"{event_type}\".")
+    constants = [rule_definition["activity"]]
+    lines = ["def rule_function(event):", "    activity = Activity(constants[0])"]
+    for (section, node_definitions) in rule_definition.items():
+        if section not in _SECTIONS:
+            continue
+        for node_definition in node_definitions or []:
+            lines += _node_source(event_type, section, node_definition, constants)
+    lines.append("    return activity")
+    source = "\n".join(lines)
+    namespace = {"Activity": Activity, "Entity": Entity, "Agent": Agent, "constants": constants}
+    exec(compile(source, f"<rule \"{event_type}\">", "exec"), namespace)
+    rule_function: Callable = namespace["rule_function"]
+    rule_function.__name__ = rule_function.__qualname__ = f"rule_{event_type}"
+    rule_function.source = source
+    return Rule(event_type, rule_function, rule_definition.get("memoize", True))
+
+
+def validate_rule(event_type: str, rule_definition: Dict, specification_manager: SpecificationManager):
+    """Validates a declarative rule against the loaded specifications.
+
+    :param str event_type:
+        The name of the event for which the rule should be executed.
+    :param Dict rule_definition:
+        The declarative rule definition.
+    :param SpecificationManager specification_manager:
+        The specification manager.
+    :raises InvalidRuleSpecificationException:
+        If the rule creates an activity, entity or agent that contradicts the specifications.
+    """
+    try:
+        activity_spec = specification_manager.get_activity_specification(rule_definition["activity"])
+    except ActivitySpecificationNotFoundException as ex:
+        raise InvalidRuleSpecificationException(f"Rule for event type \"{event_type}\": {ex}")
+    for (section, (name_key, _, _)) in _SECTIONS.items():
+        allowed = {"usage": activity_spec.used_entities, "generation": activity_spec.generated_entities,
+                   "association": activity_spec.associated_agents}[section]
+        unconditional_counts = {}
+        for node_definition in rule_definition.get(section, None) or []:
+            name = node_definition[name_key]
+            if name not in allowed:
+                raise InvalidRuleSpecificationException(
+                    f"Rule for event type \"{event_type}\": \"{activity_spec.name}\" has no {section} of \"{name}\".")
+            try:
+                if name_key == "entity":
+                    node_spec = specification_manager.get_entity_specification(name)
+                else:
+                    node_spec = specification_manager.get_agent_specification(name)
+            except (EntitySpecificationNotFoundException, AgentSpecificationNotFoundException) as ex:
+                raise InvalidRuleSpecificationException(f"Rule for event type \"{event_type}\": {ex}")
+            attributes = node_definition.get("attributes", {})
+            unknown_attributes = attributes.keys() - set(node_spec.attributes)
+            if unknown_attributes:
+                raise InvalidRuleSpecificationException(
+                    f"Rule for event type \"{event_type}\": \"{name}\" has no attributes {unknown_attributes}.")
+            missing_primary_key_attributes = set(node_spec.primary_key_attributes) - attributes.keys()
+            if missing_primary_key_attributes:
+                raise InvalidRuleSpecificationException(
+                    f"Rule for event type \"{event_type}\": \"{name}\" misses primary key attributes {missing_primary_key_attributes}.")
+            if "when" not in node_definition and "unless" not in node_definition:
+                unconditional_counts[name] = unconditional_counts.get(name, 0) + 1
+        for (name, count) in unconditional_counts.items():
+            if count > 1 and allowed[name] in (OccurenceModifier.SINGLE, OccurenceModifier.ZERO_OR_ONE):
+                raise InvalidRuleSpecificationException(
+                    f"Rule for event type \"{event_type}\": \"{activity_spec.name}\" allows at most one {section} of \"{name}\".")
+
+
+def load_declarative_rules(file_path: Union[str, Path],
+                           specification_manager: SpecificationManager = None) -> List[Rule]:
+    """Loads and compiles all declarative rules from a YAML file.
+
+    Every top-level key is an event type mapped to a rule definition:
+
+    .. code-block:: yaml
+
+        Model Specified:
+          activity: Specifying Simulation Model
+          generation:
+            - entity: Simulation Model
+              attributes:
+                File Path: filePath
+          usage:
+            - entity: Simulation Model
+              unless: newlySpecified
+              attributes:
+                File Path: filePath
+
+    :param Union[str, Path] file_path:
+        The file path.
+    :param SpecificationManager, optional specification_manager:
+        When provided the rules are validated against the specifications.
+    :rtype: List[Rule]
+    :return: The compiled rules.
+    :raises InvalidRuleSpecificationException:
+        If a rule is malformed or contradicts the specifications.
+    """
+    yaml_content = _read_yaml_file(file_path) or {}
+    rules = []
+    for (event_type, rule_definition) in yaml_content.items():
+        compiled_rule = compile_rule(event_type, rule_definition)
+        if specification_manager is not None:
+            validate_rule(event_type, rule_definition, specification_manager)
+        rules.append(compiled_rule)
+    return rules
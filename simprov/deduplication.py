@@ -0,0 +1,97 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from simprov.provenance import Activity, ProvenanceGraph
+
+
+def fingerprint_event(event: Dict) -> str:
+    """Computes a content hash of an event.
+
+    Two events with the same keys and values have the same fingerprint regardless of the key order.
+
+    :param Dict event:
+        The event.
+    :rtype: str
+    :return: The hex digest of the event content.
+    """
+    payload = json.dumps(event, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+@dataclass
+class _SeenEvent:
+    timestamp: float
+    primary_keys: Tuple
+    state: Tuple
+
+
+class EventDeduplicator:
+    """Recognizes capturer events that repeat without any effect on the provenance graph.
+
+    An event is a duplicate if an event with the same fingerprint was processed within the last ``window`` seconds
+    and the latest entities and agents for all primary keys touched by that event are still the ones it produced.
+
+    :param float window:
+        The time window in seconds in which a repeated event is considered a duplicate.
+    :param int max_size:
+        The maximum number of remembered events. The oldest events are dropped first.
+    """
+
+    def __init__(self, window: float, max_size: int = 1024) -> None:
+        super().__init__()
+        self.window: float = window
+        self.max_size: int = max_size
+        self.seen_events: OrderedDict[str, _SeenEvent] = OrderedDict()
+
+    def is_duplicate(self, fingerprint: str, provenance_graph: ProvenanceGraph) -> bool:
+        """Checks whether an event is a duplicate of a recently processed event.
+
+        :param str fingerprint:
+            The fingerprint of the event.
+        :param ProvenanceGraph provenance_graph:
+            The provenance graph the event would be chained with.
+        :rtype: bool
+        :return: `True` if the event can be skipped, `False` otherwise
+        """
+        seen_event = self.seen_events.get(fingerprint, None)
+        if seen_event is None:
+            return False
+        if time.monotonic() - seen_event.timestamp > self.window:
+            del self.seen_events[fingerprint]
+            return False
+        return self._latest_state(seen_event.primary_keys, provenance_graph) == seen_event.state
+
+    def remember(self, fingerprint: str, activity: Activity, provenance_graph: ProvenanceGraph):
+        """Remembers a processed event together with the latest state it left behind.
+
+        :param str fingerprint:
+            The fingerprint of the event.
+        :param Activity activity:
+            The activity that was chained with the provenance graph for the event.
+        :param ProvenanceGraph provenance_graph:
+            The provenance graph.
+        """
+        primary_keys = tuple(("Entity", entity.primary_key) for entity in activity.entities) + \
+                       tuple(("Agent", agent.primary_key) for agent in activity.associated_agents)
+        state = self._latest_state(primary_keys, provenance_graph)
+        self.seen_events[fingerprint] = _SeenEvent(time.monotonic(), primary_keys, state)
+        self.seen_events.move_to_end(fingerprint)
+        while len(self.seen_events) > self.max_size:
+            self.seen_events.popitem(last=False)
+
+    def clear(self):
+        """Forgets all remembered events."""
+        self.seen_events.clear()
+
+    @staticmethod
+    def _latest_state(primary_keys: Tuple, provenance_graph: ProvenanceGraph) -> Tuple:
+        state = []
+        for (kind, primary_key) in primary_keys:
+            lookup = provenance_graph.last_entities_map if kind == "Entity" else provenance_graph.last_agents_map
+            latest: Optional[object] = lookup.get(primary_key, None)
+            state.append(None if latest is None else latest.id)
+        return tuple(state)
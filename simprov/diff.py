@@ -0,0 +1,136 @@
+import hashlib
+import json
+from typing import Dict, Iterator, TextIO, Tuple
+from uuid import UUID
+
+from simprov.provenance import ProvenanceGraph
+
+
+def _digest(value) -> str:
+    return hashlib.blake2b(json.dumps(value, sort_keys=True, default=str).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _node_attributes(provenance_graph: ProvenanceGraph, node_id: UUID) -> Dict:
+    node_data = provenance_graph.graph.nodes[node_id]
+    attributes = dict(node_data.get("attributes") or {})
+    # Edited attribute values are stored directly in the node data.
+    for attribute in attributes:
+        if attribute in node_data:
+            attributes[attribute] = node_data[attribute]
+    return attributes
+
+
+def match_keys(provenance_graph: ProvenanceGraph) -> Dict[UUID, Tuple]:
+    """Computes keys that identify the nodes of a provenance graph independently of their ids.
+
+    Entities and agents are identified by their name, their primary key and their version, i.e., how many nodes
+    with the same name and primary key were added before them. Activities are identified by their name and a hash of
+    their structural context, i.e., the keys of the nodes they used, generated and are associated with. Activities
+    with the same context are distinguished by their order.
+
+    :param ProvenanceGraph provenance_graph:
+    :rtype: Dict[UUID,Tuple]
+    :return: The key of every node.
+    """
+    graph = provenance_graph.graph
+    keys = {}
+    occurrences = {}
+    activity_ids = []
+    for (node_id, node_data) in graph.nodes(data=True):
+        if node_data.get("type") == "Activity":
+            activity_ids.append(node_id)
+            continue
+        base_key = (node_data.get("type"), node_data.get("name"), _digest(node_data.get("primary_key")))
+        occurrences[base_key] = occurrences.get(base_key, -1) + 1
+        keys[node_id] = base_key + (occurrences[base_key],)
+    for activity_id in activity_ids:
+        context = [sorted(str(keys.get(node_id, node_id)) for node_id in graph.successors(activity_id)),
+                   sorted(str(keys.get(node_id, node_id)) for node_id in graph.predecessors(activity_id))]
+        base_key = ("Activity", graph.nodes[activity_id].get("name"), _digest(context))
+        occurrences[base_key] = occurrences.get(base_key, -1) + 1
+        keys[activity_id] = base_key + (occurrences[base_key],)
+    return keys
+
+
+def _describe(key: Tuple) -> Dict:
+    (node_type, name, digest, occurrence) = key
+    description = {"type": node_type, "name": name, "version" if node_type != "Activity" else "occurrence": occurrence}
+    if node_type == "Activity":
+        description["context"] = digest
+    return description
+
+
+def iter_diff(old_graph: ProvenanceGraph, new_graph: ProvenanceGraph) -> Iterator[Dict]:
+    """Generates the differences between two provenance graphs record by record.
+
+    The nodes are matched by the keys of :py:func:`match_keys`, so graphs of different studies can be compared.
+    Every record has an ``op`` (`added`, `removed` or `changed`) and a ``kind`` (`node` or `edge`). Node records
+    describe the node and hold its ids in the old and new graph. Changed node records hold the changed attributes as
+    ``[old value, new value]`` pairs. First all node records are generated, then all edge records.
+
+    :param ProvenanceGraph old_graph:
+    :param ProvenanceGraph new_graph:
+    :rtype: Iterator[Dict]
+    :return: The difference records.
+    """
+    old_keys = match_keys(old_graph)
+    new_keys = match_keys(new_graph)
+    new_ids = {key: node_id for (node_id, key) in new_keys.items()}
+    old_ids = {key: node_id for (node_id, key) in old_keys.items()}
+    for (old_id, key) in old_keys.items():
+        new_id = new_ids.get(key, None)
+        if new_id is None:
+            yield {"op": "removed", "kind": "node", **_describe(key), "old_id": str(old_id)}
+            continue
+        old_attributes = _node_attributes(old_graph, old_id)
+        new_attributes = _node_attributes(new_graph, new_id)
+        if old_attributes == new_attributes:
+            continue
+        changes = {attribute: [old_attributes.get(attribute, None), new_attributes.get(attribute, None)]
+                   for attribute in old_attributes.keys() | new_attributes.keys()
+                   if old_attributes.get(attribute, None) != new_attributes.get(attribute, None)}
+        yield {"op": "changed", "kind": "node", **_describe(key), "old_id": str(old_id), "new_id": str(new_id),
+               "attributes": changes}
+    for (new_id, key) in new_keys.items():
+        if key not in old_ids:
+            yield {"op": "added", "kind": "node", **_describe(key), "new_id": str(new_id)}
+    old_edges = {(old_keys[source_id], old_keys[target_id]): (source_id, target_id)
+                 for (source_id, target_id) in old_graph.graph.edges}
+    new_edges = {(new_keys[source_id], new_keys[target_id]): (source_id, target_id)
+                 for (source_id, target_id) in new_graph.graph.edges}
+    for (edge_key, (source_id, target_id)) in old_edges.items():
+        if edge_key not in new_edges:
+            yield {"op": "removed", "kind": "edge", "old_source": str(source_id), "old_target": str(target_id)}
+    for (edge_key, (source_id, target_id)) in new_edges.items():
+        if edge_key not in old_edges:
+            yield {"op": "added", "kind": "edge", "new_source": str(source_id), "new_target": str(target_id)}
+
+
+def iter_diff_lines(old_graph: ProvenanceGraph, new_graph: ProvenanceGraph) -> Iterator[str]:
+    """Generates the differences between two provenance graphs as JSON lines.
+
+    See :py:func:`iter_diff`.
+
+    :param ProvenanceGraph old_graph:
+    :param ProvenanceGraph new_graph:
+    :rtype: Iterator[str]
+    :return: One JSON document per line and record.
+    """
+    for record in iter_diff(old_graph, new_graph):
+        yield json.dumps(record, default=str) + "\n"
+
+
+def write_diff(old_graph: ProvenanceGraph, new_graph: ProvenanceGraph, stream: TextIO) -> int:
+    """Writes the differences between two provenance graphs as JSON lines into a text stream.
+
+    :param ProvenanceGraph old_graph:
+    :param ProvenanceGraph new_graph:
+    :param TextIO stream: The stream, e.g., an opened file.
+    :rtype: int
+    :return: The number of difference records.
+    """
+    count = 0
+    for line in iter_diff_lines(old_graph, new_graph):
+        stream.write(line)
+        count += 1
+    return count
@@ -48,3 +48,11 @@ class EntityAlreadyDefinedException(Exception):
 
 class InvalidSpecificationException(Exception):
     """The specification is neither an entity nor an activity specification."""
+
+
+class ProfilerBusyException(Exception):
+    """Another profile is already running."""
+
+
+class ReadOnlyReplicaException(Exception):
+    """The instance is a read replica that does not know a writer to forward events to."""
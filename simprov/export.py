@@ -1,46 +1,87 @@
+import json
 from io import StringIO
+from pathlib import Path
+from typing import Iterator, TextIO, TYPE_CHECKING, Union
+from uuid import UUID
 
-from prov.model import ProvDocument
-from prov.serializers.provjson import ProvJSONSerializer
-from pygraphviz import AGraph
-
-from simprov import Entity
-from simprov.provenance import ProvenanceGraph
-
-
-def _to_dot_graph(provenance_graph: ProvenanceGraph) -> AGraph:
-    def _node_attributes(entity: Entity):
-        node_name = f"{provenance_entity.name}"
-        attributes = {'node_label': node_name, "style": "rounded"}
-        if "background-color" in provenance_entity.meta_information:
-            attributes["style"] = "filled,rounded"
-            attributes["fillcolor"] = f"{provenance_entity.meta_information['background-color']}"
-        if "border-width" in provenance_entity.meta_information:
-            attributes["penwidth"] = provenance_entity.meta_information["border-width"]
-        if "border-color" in provenance_entity.meta_information:
-            attributes["color"] = f"{provenance_entity.meta_information['border-color']}"
-        return attributes
-
-    dot_graph = AGraph(directed=True, name="G")
-    dot_graph.graph_attr["rankdir"] = "RL"
-    # Acitvities
-    dot_graph.node_attr["shape"] = "box"
-    for provenance_activity in provenance_graph.activities:
-        node_names = f"{provenance_activity.name}"
-        dot_graph.add_node(str(provenance_activity.id), label=node_names)
-    # Entities
-    dot_graph.node_attr["shape"] = "box"
-    for provenance_activity in provenance_graph.activities:
-        for provenance_entity in provenance_activity.used_entities:
-            dot_graph.add_node(str(provenance_entity.id), **_node_attributes(provenance_entity))
-            dot_graph.add_edge(str(provenance_activity.id), str(provenance_entity.id))
-        for provenance_entity in provenance_activity.generated_entities:
-            dot_graph.add_node(str(provenance_entity.id), **_node_attributes(provenance_entity))
-            dot_graph.add_edge(str(provenance_entity.id), str(provenance_activity.id))
-    return dot_graph
-
-
-def to_dot(provenance_graph: ProvenanceGraph) -> str:
+if TYPE_CHECKING:
+    from prov.model import ProvDocument
+    from pygraphviz import AGraph
+
+    from simprov.provenance import Entity, ProvenanceGraph
+
+PROV_JSON_DEFAULT_NAMESPACE = "http://example.org/"
+_PROV_JSON_KNOWN_PREFIXES = ("prov", "xsd")
+
+
+def _dot_id(value) -> str:
+    escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return f'"{escaped}"'
+
+
+def _dot_attributes(attributes: dict) -> str:
+    return ", ".join(f"{key}={_dot_id(value)}" for (key, value) in attributes.items())
+
+
+def _dot_entity_attributes(entity: 'Entity') -> dict:
+    attributes = {"node_label": entity.name, "style": "rounded"}
+    if "background-color" in entity.meta_information:
+        attributes["style"] = "filled,rounded"
+        attributes["fillcolor"] = entity.meta_information["background-color"]
+    if "border-width" in entity.meta_information:
+        attributes["penwidth"] = entity.meta_information["border-width"]
+    if "border-color" in entity.meta_information:
+        attributes["color"] = entity.meta_information["border-color"]
+    return attributes
+
+
+def iter_dot(provenance_graph: 'ProvenanceGraph') -> Iterator[str]:
+    """
+    Generates the provenance graph in the DOT format statement by statement.
+
+    The statements are emitted directly from the provenance graph, so neither pygraphviz nor graphviz are needed.
+    Entities are styled according to their meta information.
+
+    :param ProvenanceGraph provenance_graph:
+    :return: The lines of the DOT graph
+    :rtype: Iterator[str]
+    """
+    yield "strict digraph G {\n"
+    yield "\tgraph [rankdir=RL];\n"
+    yield "\tnode [shape=box];\n"
+    activities = provenance_graph.activities
+    for provenance_activity in activities:
+        yield f"\t{_dot_id(provenance_activity.id)}\t[label={_dot_id(provenance_activity.name)}];\n"
+    emitted_entities = set()
+    for provenance_activity in activities:
+        activity_id = _dot_id(provenance_activity.id)
+        for (provenance_entity, is_generated) in [(entity, False) for entity in provenance_activity.used_entities] + \
+                                                  [(entity, True) for entity in provenance_activity.generated_entities]:
+            entity_id = _dot_id(provenance_entity.id)
+            if provenance_entity.id not in emitted_entities:
+                emitted_entities.add(provenance_entity.id)
+                yield f"\t{entity_id}\t[{_dot_attributes(_dot_entity_attributes(provenance_entity))}];\n"
+            if is_generated:
+                yield f"\t{entity_id} -> {activity_id};\n"
+            else:
+                yield f"\t{activity_id} -> {entity_id};\n"
+    yield "}\n"
+
+
+def write_dot(provenance_graph: 'ProvenanceGraph', stream: TextIO):
+    """
+    Writes the provenance graph in the DOT format into a text stream.
+
+    See :py:func:`iter_dot`.
+
+    :param ProvenanceGraph provenance_graph:
+    :param TextIO stream: The stream, e.g., an opened file.
+    """
+    for line in iter_dot(provenance_graph):
+        stream.write(line)
+
+
+def to_dot(provenance_graph: 'ProvenanceGraph') -> str:
     """
     Returns the provenance graph in the DOT format.
 
@@ -48,27 +89,39 @@ def to_dot(provenance_graph: ProvenanceGraph) -> str:
     :return: The provenance graph in DOT format
     :rtype: str
     """
-    return _to_dot_graph(provenance_graph).to_string()
+    return "".join(iter_dot(provenance_graph))
 
 
-def to_prov_json(provenance_graph: ProvenanceGraph) -> str:
+def to_agraph(provenance_graph: 'ProvenanceGraph') -> 'AGraph':
     """
-    Returns the provenance graph in the PROV-JSON format.
+    Returns the provenance graph as pygraphviz graph, e.g., for computing a layout or rendering an image.
+
+    Requires the optional dependency pygraphviz.
 
     :param ProvenanceGraph provenance_graph:
-    :return: The provenance graph in PROV-JSON format
-    :rtype: str
+    :return: The provenance graph as pygraphviz graph
+    :rtype: AGraph
+    """
+    from pygraphviz import AGraph
+    return AGraph(string=to_dot(provenance_graph))
+
+
+def to_prov_document(provenance_graph: 'ProvenanceGraph') -> 'ProvDocument':
+    """
+    Returns the provenance graph as a document of the prov package.
+
+    It can be used to serialize the provenance graph into the other formats supported by prov, e.g., PROV-N or PROV-XML.
+
+    :param ProvenanceGraph provenance_graph:
+    :return: The provenance graph as prov document
+    :rtype: ProvDocument
     """
+    from prov.model import ProvDocument
     prov_document = ProvDocument()
-    prov_document.set_default_namespace("http://example.org/")
+    prov_document.set_default_namespace(PROV_JSON_DEFAULT_NAMESPACE)
     entity_table = {}
     for entity in provenance_graph.entities:
-        entity_attributes = {}
-        for (attribute, value) in entity.attributes.items():
-            prov_attribute = str(attribute).replace(" ", "_")
-            entity_attributes[prov_attribute] = str(value)
-        entity_attributes["prov:node_label"] = entity.name
-        provenance_entity = prov_document.entity(str(entity.id), entity_attributes)
+        provenance_entity = prov_document.entity(str(entity.id), _prov_entity_attributes(entity))
         entity_table[entity.id] = provenance_entity
     for activity in provenance_graph.activities:
         prov_activity = prov_document.activity(str(activity.id), other_attributes={'prov:node_label': activity.name})
@@ -76,9 +129,232 @@ def to_prov_json(provenance_graph: ProvenanceGraph) -> str:
             prov_document.wasGeneratedBy(entity_table[generated_entity.id], prov_activity)
         for used_entity in activity.used_entities:
             prov_document.usage(prov_activity, entity_table[used_entity.id])
-    prov_json_serializer = ProvJSONSerializer(prov_document)
+    return prov_document
+
+
+def to_prov_json(provenance_graph: 'ProvenanceGraph') -> str:
+    """
+    Returns the provenance graph in the PROV-JSON format.
+
+    :param ProvenanceGraph provenance_graph:
+    :return: The provenance graph in PROV-JSON format
+    :rtype: str
+    """
     stream = StringIO()
-    prov_json_serializer.serialize(stream)
+    write_prov_json(provenance_graph, stream)
     result = stream.getvalue()
     stream.close()
     return result
+
+
+def write_prov_json(provenance_graph: 'ProvenanceGraph', stream: TextIO):
+    """
+    Writes the provenance graph in the PROV-JSON format into a text stream.
+
+    See :py:func:`iter_prov_json`.
+
+    :param ProvenanceGraph provenance_graph:
+    :param TextIO stream: The stream, e.g., an opened file.
+    """
+    for chunk in iter_prov_json(provenance_graph):
+        stream.write(chunk)
+
+
+def iter_prov_json(provenance_graph: 'ProvenanceGraph') -> Iterator[str]:
+    """
+    Generates the provenance graph in the PROV-JSON format chunk by chunk.
+
+    The records are encoded directly from the provenance graph, one record per chunk, without building a
+    :py:class:`prov.model.ProvDocument`. The concatenated chunks are identical to the output of the prov serializer
+    for the document returned by :py:func:`to_prov_document`.
+
+    :param ProvenanceGraph provenance_graph:
+    :return: The chunks of the PROV-JSON document
+    :rtype: Iterator[str]
+    """
+    yield '{"prefix": ' + json.dumps({"default": PROV_JSON_DEFAULT_NAMESPACE})
+    entities = provenance_graph.entities
+    activities = provenance_graph.activities
+    if entities:
+        yield from _iter_prov_json_group("entity", ((str(entity.id), _prov_entity_attributes(entity))
+                                                    for entity in entities))
+    if activities:
+        yield from _iter_prov_json_group("activity", ((str(activity.id), {"prov:node_label": activity.name})
+                                                      for activity in activities))
+    relation_labels = []
+    for activity in activities:
+        if activity.generated_entities and "wasGeneratedBy" not in relation_labels:
+            relation_labels.append("wasGeneratedBy")
+        if activity.used_entities and "used" not in relation_labels:
+            relation_labels.append("used")
+        if len(relation_labels) == 2:
+            break
+    for relation_label in relation_labels:
+        yield from _iter_prov_json_group(relation_label, _iter_prov_json_relations(activities, relation_label))
+    yield "}"
+
+
+def _prov_attribute_name(attribute) -> str:
+    prov_attribute = str(attribute).replace(" ", "_")
+    if ":" in prov_attribute:
+        prefix, _, local_part = prov_attribute.partition(":")
+        if prefix not in _PROV_JSON_KNOWN_PREFIXES or ":" in local_part:
+            raise ValueError(f"Invalid Qualified Name: {prov_attribute}")
+    return prov_attribute
+
+
+def _prov_entity_attributes(entity: 'Entity') -> dict:
+    entity_attributes = {}
+    for (attribute, value) in entity.attributes.items():
+        entity_attributes[_prov_attribute_name(attribute)] = str(value)
+    entity_attributes["prov:node_label"] = entity.name
+    return entity_attributes
+
+
+def _iter_prov_json_group(label: str, records) -> Iterator[str]:
+    separator = ", " + json.dumps(label) + ": {"
+    for (identifier, record) in records:
+        yield separator + json.dumps(identifier) + ": " + json.dumps(record)
+        separator = ", "
+    yield "}"
+
+
+def _iter_prov_json_relations(activities, relation_label: str):
+    # Relations are anonymous records numbered in the order prov creates them: per activity, first the generations
+    # and afterwards the usages.
+    anonymous_id = 0
+    for activity in activities:
+        for generated_entity in activity.generated_entities:
+            anonymous_id += 1
+            if relation_label == "wasGeneratedBy":
+                yield (f"_:id{anonymous_id}",
+                       {"prov:entity": str(generated_entity.id), "prov:activity": str(activity.id)})
+        for used_entity in activity.used_entities:
+            anonymous_id += 1
+            if relation_label == "used":
+                yield (f"_:id{anonymous_id}",
+                       {"prov:activity": str(activity.id), "prov:entity": str(used_entity.id)})
+
+
+COLUMNAR_FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+_COLUMNAR_TABLES = ("nodes", "edges", "attributes")
+_COLUMNAR_MANIFEST = "simprov-export.json"
+
+
+def write_columnar(provenance_graph: 'ProvenanceGraph', directory: Union[str, Path], file_format: str = "parquet",
+                   incremental: bool = False) -> int:
+    """
+    Writes the provenance graph as node, edge and attribute tables in a columnar format for analytics.
+
+    Every table is a directory of part files, e.g., ``nodes/part-00000.parquet``, that can be read as one dataset by
+    pandas, DuckDB or pyarrow. The node names, node types and attribute names are dictionary encoded.
+    Requires the optional dependency pyarrow.
+
+    - ``nodes``: ``id``, ``type``, ``name``, ``primary_key`` (JSON)
+    - ``edges``: ``source``, ``target``, ``user_generated``
+    - ``attributes``: ``node_id``, ``attribute``, ``value``
+
+    In incremental mode only a new part with the nodes added since the last export is appended, together with their
+    edges and attributes and the user generated edges added since then. Changes of already exported nodes, e.g.,
+    edited attributes or removed edges, are only contained in a full export. If the exported nodes do not match the
+    provenance graph anymore, e.g., because it was rebuilt, a full export is written instead.
+
+    :param ProvenanceGraph provenance_graph:
+    :param Union[str, Path] directory: The directory containing the tables.
+    :param str file_format: Either ``parquet`` or ``arrow`` (Arrow IPC file format).
+    :param bool incremental: `True` to append only the nodes added since the last export.
+    :return: The number of written nodes
+    :rtype: int
+    """
+    if file_format not in COLUMNAR_FORMATS:
+        raise ValueError(f"Unknown columnar format \"{file_format}\". Use one of {list(COLUMNAR_FORMATS)}.")
+    directory = Path(directory)
+    manifest_path = directory / _COLUMNAR_MANIFEST
+    node_ids = list(provenance_graph.graph.nodes)
+    manifest = None
+    if incremental and manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text())
+        exported_count = manifest["node_count"]
+        if manifest["format"] != file_format or exported_count > len(node_ids) \
+                or (exported_count > 0 and str(node_ids[exported_count - 1]) != manifest["last_node_id"]):
+            manifest = None
+    if manifest is None:
+        manifest = {"format": file_format, "node_count": 0, "last_node_id": None, "parts": 0,
+                    "user_generated_edges": []}
+        for table_name in _COLUMNAR_TABLES:
+            for part in (directory / table_name).glob(f"part-*{COLUMNAR_FORMATS[file_format]}"):
+                part.unlink()
+
+    new_node_ids = node_ids[manifest["node_count"]:]
+    exported_user_edges = {tuple(edge) for edge in manifest["user_generated_edges"]}
+    user_edges = {(str(source), str(target)) for (source, target) in provenance_graph.user_generated_dependencies}
+    if manifest["node_count"] == 0:
+        edges = list(provenance_graph.graph.edges)
+    else:
+        new_nodes = set(new_node_ids)
+        edges = [edge for node_id in new_node_ids for edge in provenance_graph.graph.out_edges(node_id)]
+        edges += [edge for node_id in new_node_ids for edge in provenance_graph.graph.in_edges(node_id)
+                  if edge[0] not in new_nodes]
+        edges += [(UUID(source), UUID(target)) for (source, target) in user_edges - exported_user_edges
+                  if UUID(source) not in new_nodes and UUID(target) not in new_nodes
+                  and provenance_graph.graph.has_edge(UUID(source), UUID(target))]
+
+    tables = _columnar_tables(provenance_graph, new_node_ids, edges)
+    part_name = f"part-{manifest['parts']:05d}{COLUMNAR_FORMATS[file_format]}"
+    for (table_name, table) in zip(_COLUMNAR_TABLES, tables):
+        (directory / table_name).mkdir(parents=True, exist_ok=True)
+        _write_columnar_table(table, directory / table_name / part_name, file_format)
+
+    manifest["node_count"] = len(node_ids)
+    manifest["last_node_id"] = str(node_ids[-1]) if node_ids else None
+    manifest["parts"] += 1
+    manifest["user_generated_edges"] = sorted(user_edges)
+    manifest_path.write_text(json.dumps(manifest))
+    return len(new_node_ids)
+
+
+def _columnar_tables(provenance_graph: 'ProvenanceGraph', node_ids: list, edges: list):
+    import pyarrow
+
+    node_columns = {"id": [], "type": [], "name": [], "primary_key": []}
+    attribute_columns = {"node_id": [], "attribute": [], "value": []}
+    for node_id in node_ids:
+        node = provenance_graph.node_map[node_id]
+        node_columns["id"].append(str(node_id))
+        node_columns["type"].append(provenance_graph.graph.nodes[node_id]["type"])
+        node_columns["name"].append(node.name)
+        primary_key = getattr(node, "primary_key", None)
+        node_columns["primary_key"].append(None if primary_key is None else json.dumps(list(primary_key), default=str))
+        for (attribute, value) in getattr(node, "attributes", {}).items():
+            attribute_columns["node_id"].append(str(node_id))
+            attribute_columns["attribute"].append(str(attribute))
+            attribute_columns["value"].append(None if value is None else str(value))
+
+    def _dictionary(values):
+        return pyarrow.array(values, type=pyarrow.string()).dictionary_encode()
+
+    def _strings(values):
+        return pyarrow.array(values, type=pyarrow.string())
+
+    nodes = pyarrow.table({"id": _strings(node_columns["id"]), "type": _dictionary(node_columns["type"]),
+                           "name": _dictionary(node_columns["name"]),
+                           "primary_key": _strings(node_columns["primary_key"])})
+    user_generated_dependencies = provenance_graph.user_generated_dependencies
+    edge_table = pyarrow.table({"source": _strings([str(source) for (source, _) in edges]),
+                                "target": _strings([str(target) for (_, target) in edges]),
+                                "user_generated": pyarrow.array([edge in user_generated_dependencies for edge in edges],
+                                                                type=pyarrow.bool_())})
+    attributes = pyarrow.table({"node_id": _strings(attribute_columns["node_id"]),
+                                "attribute": _dictionary(attribute_columns["attribute"]),
+                                "value": _strings(attribute_columns["value"])})
+    return nodes, edge_table, attributes
+
+
+def _write_columnar_table(table, path: Path, file_format: str):
+    if file_format == "parquet":
+        import pyarrow.parquet
+        pyarrow.parquet.write_table(table, path)
+    else:
+        import pyarrow.ipc
+        with pyarrow.ipc.new_file(path, table.schema) as writer:
+            writer.write_table(table)
@@ -0,0 +1,159 @@
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from threading import RLock
+from typing import Dict, List, Set, Tuple
+from uuid import UUID
+
+# The previous value of an attribute that did not exist before it was edited.
+MISSING = object()
+
+
+@dataclass
+class HistoryState:
+    """Represents the state of everything users can edit in a provenance graph at some point in time.
+
+    :ivar Dict[Tuple[UUID,str],object] attribute_values:
+        The values of all user-edited entity attributes. Attributes that did not exist yet are left out.
+    :ivar Dict[Tuple[UUID,UUID],bool] edges:
+        Whether the user-edited dependencies existed.
+    :ivar Set[UUID] hidden_nodes:
+        The hidden nodes.
+    """
+    attribute_values: Dict[Tuple[UUID, str], object] = field(default_factory=dict)
+    edges: Dict[Tuple[UUID, UUID], bool] = field(default_factory=dict)
+    hidden_nodes: Set[UUID] = field(default_factory=set)
+
+    def copy(self) -> 'HistoryState':
+        return HistoryState(dict(self.attribute_values), dict(self.edges), set(self.hidden_nodes))
+
+
+@dataclass
+class HistoryEntry:
+    """Represents a single user edit.
+
+    :ivar int sequence:
+        The sequence number of the event that caused the edit.
+    :ivar str kind:
+        `attribute`, `edge` or `hide`.
+    :ivar Tuple key:
+        The edited attribute as node id and attribute name, the edited edge, or ``None`` for hide changes.
+    :ivar old:
+        The previous attribute value or ``MISSING``, whether the edge existed, or the nodes that were hidden before but
+        not after.
+    :ivar new:
+        The new attribute value, whether the edge exists, or the nodes that are hidden after but not before.
+    """
+    sequence: int
+    kind: str
+    key: Tuple | None
+    old: object
+    new: object
+
+
+class GraphHistory:
+    """Records when the nodes and edges of a provenance graph were added and how users edited it.
+
+    Older states are reconstructed by undoing the user edits made after them, starting from the current state or from
+    the nearest later checkpoint. A checkpoint is taken every `checkpoint_interval` edits, so at most that many edits
+    are undone. The history is shared with the copies of the provenance graph, so recording and reconstructing are
+    serialized by a lock.
+
+    :param int checkpoint_interval:
+        The number of user edits between two checkpoints.
+    :ivar Dict[UUID,int] node_sequences:
+        The sequence number of the event that added each node.
+    :ivar Dict[Tuple[UUID,UUID],int] edge_sequences:
+        The sequence number of the event that first added each edge.
+    :ivar List[HistoryEntry] entries:
+        The user edits in the order they were made.
+    :ivar List[int] entry_sequences:
+        The sequence numbers of the user edits.
+    :ivar HistoryState state:
+        The current state of the user-editable parts.
+    :ivar List[Tuple[int,HistoryState]] checkpoints:
+        The number of entries and the state after them, for every checkpoint.
+    :ivar List[int] checkpoint_entry_counts:
+        The number of entries of every checkpoint.
+    :ivar RLock lock:
+        The lock serializing recording and reconstructing.
+    """
+
+    def __init__(self, checkpoint_interval: int = 256) -> None:
+        self.checkpoint_interval: int = checkpoint_interval
+        self.node_sequences: Dict[UUID, int] = {}
+        self.edge_sequences: Dict[Tuple[UUID, UUID], int] = {}
+        self.entries: List[HistoryEntry] = []
+        self.entry_sequences: List[int] = []
+        self.state: HistoryState = HistoryState()
+        self.checkpoints: List[Tuple[int, HistoryState]] = []
+        self.checkpoint_entry_counts: List[int] = []
+        self.lock: RLock = RLock()
+
+    def node_added(self, node_id: UUID, sequence: int):
+        """Records the sequence number of the event that added a node."""
+        self.node_sequences.setdefault(node_id, sequence)
+
+    def edge_added(self, edge: Tuple[UUID, UUID], sequence: int):
+        """Records the sequence number of the event that added an edge, unless it existed before."""
+        self.edge_sequences.setdefault(edge, sequence)
+
+    def record(self, sequence: int, kind: str, key, old, new):
+        """Records a user edit and updates the current state.
+
+        :param int sequence: The sequence number of the event that caused the edit.
+        :param str kind: `attribute`, `edge` or `hide`.
+        :param key: See :py:class:`HistoryEntry`.
+        :param old: See :py:class:`HistoryEntry`.
+        :param new: See :py:class:`HistoryEntry`.
+        """
+        entry = HistoryEntry(sequence, kind, key, old, new)
+        with self.lock:
+            self._apply(self.state, entry, undo=False)
+            self.entries.append(entry)
+            self.entry_sequences.append(sequence)
+            if len(self.entries) % self.checkpoint_interval == 0:
+                self.checkpoints.append((len(self.entries), self.state.copy()))
+                self.checkpoint_entry_counts.append(len(self.entries))
+
+    @staticmethod
+    def _apply(state: HistoryState, entry: HistoryEntry, undo: bool):
+        (removed, added) = (entry.new, entry.old) if undo else (entry.old, entry.new)
+        if entry.kind == "attribute":
+            if added is MISSING:
+                state.attribute_values.pop(entry.key, None)
+            else:
+                state.attribute_values[entry.key] = added
+        elif entry.kind == "edge":
+            state.edges[entry.key] = added
+        else:
+            state.hidden_nodes.difference_update(removed)
+            state.hidden_nodes.update(added)
+
+    def edited_attributes(self) -> Set[Tuple[UUID, str]]:
+        """Returns the attributes users have edited so far.
+
+        :rtype: Set[Tuple[UUID,str]]
+        :return: The node ids and attribute names.
+        """
+        with self.lock:
+            return set(self.state.attribute_values)
+
+    def state_at(self, sequence: int) -> HistoryState:
+        """Reconstructs the state of the user-editable parts after an event was processed.
+
+        :param int sequence: The sequence number of the event.
+        :rtype: HistoryState
+        :return: The state.
+        """
+        with self.lock:
+            entry_count = bisect_right(self.entry_sequences, sequence)
+            checkpoint_position = bisect_left(self.checkpoint_entry_counts, entry_count)
+            if checkpoint_position < len(self.checkpoints):
+                (undo_from, state) = self.checkpoints[checkpoint_position]
+                state = state.copy()
+            else:
+                (undo_from, state) = (len(self.entries), self.state.copy())
+            entries = self.entries[entry_count:undo_from]
+        for entry in reversed(entries):
+            self._apply(state, entry, undo=True)
+        return state
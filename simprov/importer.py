@@ -0,0 +1,187 @@
+import json
+from pathlib import Path
+from typing import Dict, Iterator, TextIO, Tuple, Union
+from uuid import UUID, uuid5, NAMESPACE_URL
+
+from simprov.exceptions import EntitySpecificationNotFoundException, AgentSpecificationNotFoundException
+from simprov.provenance import Activity, Entity, Agent, ProvenanceGraph
+from simprov.specifications import SpecificationManager
+
+_CHUNK_SIZE = 1 << 16
+_WHITESPACE = " \t\n\r"
+
+
+class _JSONStream:
+    """A minimal pull parser that decodes a JSON document from a text stream in bounded chunks."""
+
+    def __init__(self, stream: TextIO) -> None:
+        self.stream = stream
+        self.buffer = ""
+        self.position = 0
+        self.exhausted = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        if self.exhausted:
+            return False
+        chunk = self.stream.read(_CHUNK_SIZE)
+        if not chunk:
+            self.exhausted = True
+            return False
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in _WHITESPACE:
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._fill():
+                raise ValueError("Unexpected end of the PROV-JSON document.")
+
+    def expect(self, character: str):
+        if self.peek() != character:
+            raise ValueError(f"Expected \"{character}\" at \"{self.buffer[self.position:self.position + 20]}\".")
+        self.position += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                (value, end) = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number at the end of the buffer might be truncated.
+            if end == len(self.buffer) and not isinstance(value, (dict, list, str)) and self._fill():
+                continue
+            self.position = end
+            return value
+
+    def members(self) -> Iterator[str]:
+        self.expect("{")
+        if self.peek() == "}":
+            self.position += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            if self.peek() == ",":
+                self.position += 1
+                continue
+            self.expect("}")
+            return
+
+
+def iter_prov_json_records(stream: TextIO) -> Iterator[Tuple[str, str, Dict]]:
+    """Generates the records of a PROV-JSON document without loading the whole document.
+
+    Only one record is decoded at a time, so the memory usage does not depend on the size of the document.
+
+    :param TextIO stream: The stream containing the PROV-JSON document.
+    :return: Tuples of the record type, e.g., ``entity`` or ``used``, the record identifier and its attributes
+    :rtype: Iterator[Tuple[str, str, Dict]]
+    """
+    json_stream = _JSONStream(stream)
+    for record_type in json_stream.members():
+        if record_type in ("prefix", "bundle"):
+            json_stream.value()
+            continue
+        for identifier in json_stream.members():
+            content = json_stream.value()
+            for record in (content if isinstance(content, list) else [content]):
+                yield record_type, identifier, record
+
+
+def _node_id(identifier: str) -> UUID:
+    local_part = identifier.rsplit(":", 1)[-1] if not identifier.startswith("_:") else identifier
+    try:
+        return UUID(local_part)
+    except ValueError:
+        return uuid5(NAMESPACE_URL, identifier)
+
+
+def _attribute_value(value):
+    if isinstance(value, dict) and "$" in value:
+        return value["$"]
+    if value == "None":
+        return None
+    return value
+
+
+def _build_node(node_class, identifier: str, record: Dict, specification_manager: SpecificationManager):
+    name = record.get("prov:node_label", record.get("prov:label", identifier))
+    node = node_class(name, id=_node_id(identifier))
+    try:
+        if specification_manager is None:
+            spec = None
+        elif node_class is Entity:
+            spec = specification_manager.get_entity_specification(name)
+        else:
+            spec = specification_manager.get_agent_specification(name)
+    except (EntitySpecificationNotFoundException, AgentSpecificationNotFoundException):
+        spec = None
+    # PROV-JSON replaces the spaces of attribute names with underscores.
+    attribute_names = {} if spec is None else {attribute.replace(" ", "_"): attribute for attribute in spec.attributes}
+    for (prov_attribute, value) in record.items():
+        if prov_attribute not in ("prov:node_label", "prov:label"):
+            node.attributes[attribute_names.get(prov_attribute, prov_attribute)] = _attribute_value(value)
+    if spec is None:
+        node.primary_key = (identifier,)
+    elif node_class is Entity:
+        specification_manager.normalize_entity(node)
+    else:
+        specification_manager.normalize_agent(node)
+    return node
+
+
+def load_prov_json(source: Union[str, Path, TextIO],
+                   specification_manager: SpecificationManager = None) -> ProvenanceGraph:
+    """Builds a provenance graph from a PROV-JSON document without replaying any events.
+
+    Documents as written by :py:func:`~simprov.export.to_prov_json` are restored with their node ids.
+    The original attribute names and the primary keys of entities and agents are reconstructed from the
+    specifications. Attribute values stay strings, except ``"None"`` which becomes ``None``.
+    The activities are added in the order of the document, so the latest entity of every primary key is the same as
+    in the exported graph.
+
+    :param Union[str, Path, TextIO] source: The path of the document or a stream containing it.
+    :param SpecificationManager, optional specification_manager:
+        The specifications of the entities and agents. Without them every node is its own primary key.
+    :rtype: ProvenanceGraph
+    :return: The provenance graph.
+    """
+    if isinstance(source, (str, Path)):
+        with open(source, "r", encoding="utf-8") as stream:
+            return load_prov_json(stream, specification_manager)
+    nodes: Dict[str, Union[Entity, Agent]] = {}
+    activities: Dict[str, Activity] = {}
+    for (record_type, identifier, record) in iter_prov_json_records(source):
+        if record_type == "entity":
+            nodes[identifier] = _build_node(Entity, identifier, record, specification_manager)
+        elif record_type == "agent":
+            nodes[identifier] = _build_node(Agent, identifier, record, specification_manager)
+        elif record_type == "activity":
+            activities[identifier] = Activity(record.get("prov:node_label", record.get("prov:label", identifier)),
+                                              id=_node_id(identifier))
+        elif record_type == "wasGeneratedBy":
+            activities[record["prov:activity"]].generated_entities.append(nodes[record["prov:entity"]])
+        elif record_type == "used":
+            activities[record["prov:activity"]].used_entities.append(nodes[record["prov:entity"]])
+        elif record_type == "wasAssociatedWith":
+            activities[record["prov:activity"]].associated_agents.append(nodes[record["prov:agent"]])
+    provenance_graph = ProvenanceGraph()
+    for activity in activities.values():
+        provenance_graph.add_activity(activity)
+    for node in nodes.values():
+        if node.id in provenance_graph.node_map:
+            continue
+        if isinstance(node, Agent):
+            provenance_graph.add_agent(node)
+        else:
+            provenance_graph.add_entity(node)
+    return provenance_graph
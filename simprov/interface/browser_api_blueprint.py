@@ -1,32 +1,71 @@
+import hashlib
+import io
 import json
+import zlib
 from copy import deepcopy
-from copy import deepcopy
-from tempfile import mkstemp
+from time import perf_counter
+from typing import Callable, Iterable, Iterator, Tuple
 from uuid import UUID
 
-from flask import Blueprint, jsonify, request, send_file
+from flask import Blueprint, current_app, jsonify, request, Response, stream_with_context
 
 from simprov import Activity
-from simprov.exceptions import InvalidActivityException
-from simprov.export import to_prov_json, _to_dot_graph, to_dot
+from simprov.diff import iter_diff_lines
+from simprov.exceptions import InvalidActivityException, ReadOnlyReplicaException
+from simprov.export import iter_prov_json, iter_dot
+from simprov.importer import load_prov_json
+from simprov.interface.encoding import JSON_MIMETYPE, COMPACT_JSON_MIMETYPE, MSGPACK_MIMETYPES, SLIM_NODE_FIELDS, \
+    msgpack_available, graph_page, compact_graph_data, encode_compact
 from simprov.interface.wrapper import BlueprintWrapper
+from simprov.provenance import ProvenanceGraph
+from simprov.reducer import GraphReducer
 
 
-class BrowserAPI(BlueprintWrapper):
+def _gzip_chunks(chunks: Iterable[str]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk.encode("utf-8"))
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def _iter_json_list(items: list) -> Iterator[str]:
+    count = len(items)
+    yield "["
+    for index in range(count):
+        yield (", " if index else "") + json.dumps(items[index])
+    yield "]"
 
-    def _get_provenance_graph_cytoscape_data(self, show_reduced_graph: bool = False, reduce_transitives: bool = False,
-                                             hide_nodes: bool = False, split_agents: bool = False):
 
-        graph = self._get_provenance_graph(show_reduced_graph, reduce_transitives, hide_nodes, split_agents)
-        graph.hidden_nodes = self.simprov.provenance_graph.hidden_nodes
-        return graph.cytoscape_data()
+def _bool_arg(name: str) -> bool:
+    return request.args.get(name, default=False, type=lambda v: v.lower() == 'true')
+
+
+class BrowserAPI(BlueprintWrapper):
 
     def _get_provenance_graph(self, show_reduced_graph: bool = False, reduce_transitives: bool = False,
-                              hide_nodes: bool = False, split_agents: bool = False):
-        graph = self.simprov.provenance_graph
-        if show_reduced_graph:
-            self.simprov._update_reduced_graph(reduce_transitives, hide_nodes, split_agents)
-            graph = self.simprov.reduced_graph
+                              hide_nodes: bool = False, split_agents: bool = False, as_of: int = None,
+                              versioned_graph: Tuple[int, ProvenanceGraph] = None):
+        (graph_version, graph) = self.simprov.read_versioned_snapshot() if versioned_graph is None else versioned_graph
+        reduction = f"{int(reduce_transitives)}{int(hide_nodes)}{int(split_agents)}"
+        if as_of is not None:
+            graph = self.simprov.rest_api.offload(lambda: graph.snapshot(as_of))
+            if show_reduced_graph:
+                start = perf_counter()
+                reduced_graph = self.simprov.rest_api.offload(
+                    lambda: GraphReducer(graph).reduce(reduce_transitives, hide_nodes, split_agents))
+                self.simprov.metrics.reduction_seconds.observe(perf_counter() - start)
+                reduced_graph.hidden_nodes = graph.hidden_nodes
+                reduced_graph.node_numbering = f"{graph.node_numbering}~{reduction}"
+                graph = reduced_graph
+        elif show_reduced_graph:
+            reduced_graph = self.simprov.rest_api.offload(
+                lambda: self.simprov._update_reduced_graph(reduce_transitives, hide_nodes, split_agents, graph))
+            reduced_graph.hidden_nodes = graph.hidden_nodes
+            # The reduced graph is built anew for every version, so are the positions of its nodes.
+            reduced_graph.node_numbering = f"{graph.node_numbering}~{reduction}~{graph_version}"
+            graph = reduced_graph
         return graph
 
     def _get_node_data(self, node_id: UUID, query_reduced_graph: bool = False) -> dict:
@@ -39,7 +78,8 @@ class BrowserAPI(BlueprintWrapper):
 
         :py:meth:`.ProvenanceGraph.node_data`
         """
-        graph = self.simprov.provenance_graph
+        snapshot = self.simprov.read_snapshot()
+        graph = snapshot
         if query_reduced_graph:
             # self.simprov._update_reduced_graph()
             graph = self.simprov.reduced_graph
@@ -49,7 +89,7 @@ class BrowserAPI(BlueprintWrapper):
         elif graph.is_agent(node_id):
             self.simprov._get_agent_node_data(node_data)
         else:
-            self.simprov._get_activity_node_data(node_data, node_id)
+            self.simprov._get_activity_node_data(node_data, node_id, snapshot)
         if node_data["name"] == "Simulation Model":
             for attribute in node_data["attributes"]:
                 if attribute["name"] == "Content":
@@ -57,15 +97,16 @@ class BrowserAPI(BlueprintWrapper):
         return node_data
 
     def _build_copy_activity_with_changes(self, request_json):
-        activity_node: Activity = self.simprov.provenance_graph.node_map[UUID(request_json["node"])]
+        node_map = self.simprov.read_snapshot().node_map
+        activity_node: Activity = node_map[UUID(request_json["node"])]
         copy_node: Activity = deepcopy(activity_node)
         for edge in request_json["changes"]:
             source_id = UUID(edge["source"])
             target_id = UUID(edge["target"])
             if source_id == copy_node.id:
-                copy_node.used_entities.append(self.simprov.provenance_graph.node_map[target_id])
+                copy_node.used_entities.append(node_map[target_id])
             elif target_id == copy_node.id:
-                copy_node.generated_entities.append(self.simprov.provenance_graph.node_map[source_id])
+                copy_node.generated_entities.append(node_map[source_id])
         return copy_node
 
     def _check_activity_validity_after_dependency_addition(self, request_json):
@@ -80,7 +121,67 @@ class BrowserAPI(BlueprintWrapper):
         node_id = UUID(request_json["id"])
         hidden = request_json["changes"]
         event = {"type": "Hide Node", "node_id": str(node_id), "change": hidden}
-        self.simprov.process_event(event)
+        self.simprov.submit_event(event)
+
+    def _graph_query_args(self):
+        return (_bool_arg("showReducedGraph"), _bool_arg("reduceTransitives"), _bool_arg("hideNodes"),
+                _bool_arg("splitAgents"), request.args.get("asOf", type=int))
+
+    def _stream_download(self, graph_version: int, build_chunks: Callable[[], Iterable[str]], download_name: str,
+                         mimetype: str):
+        """Streams a download that is generated from a graph state.
+
+        The ETag is derived from the graph version of the state and the request arguments, so a client that already has
+        the download of an unchanged graph gets a `304 Not Modified` without the download being generated. The chunks
+        have to be built from the state that was read together with the graph version, see
+        :py:meth:`.SimProv.read_versioned_snapshot`.
+        If the client accepts it, the download is compressed with gzip while it is streamed.
+        """
+        use_gzip = "gzip" in request.accept_encodings
+        etag_source = "\n".join([self.simprov.instance_token, str(graph_version), request.path,
+                                 request.query_string.decode("utf-8"), "gzip" if use_gzip else "identity"])
+        etag = hashlib.blake2b(etag_source.encode("utf-8"), digest_size=16).hexdigest()
+        headers = {"Content-Disposition": f"attachment; filename={download_name}", "Vary": "Accept-Encoding"}
+        if request.if_none_match.contains(etag):
+            response = Response(status=304, headers=headers)
+            response.set_etag(etag)
+            return response
+        chunks = build_chunks()
+        if use_gzip:
+            chunks = _gzip_chunks(chunks)
+            headers["Content-Encoding"] = "gzip"
+        response = Response(stream_with_context(self.simprov.rest_api.offload_chunks(chunks)), mimetype=mimetype,
+                            headers=headers)
+        response.set_etag(etag)
+        return response
+
+    def _graph_data_response(self, graph, node_ids=None):
+        """Builds the response of the graph data endpoints for the whole graph or the subgraph of the given nodes.
+
+        Handles the pagination, the slim mode and the negotiation of the encoding.
+        """
+        try:
+            (node_ids, edges, next_cursor) = graph_page(graph, request.args.get("cursor"),
+                                                        request.args.get("limit", type=int), node_ids)
+        except ValueError as ex:
+            return ({"error": str(ex)}, 400)
+        slim = _bool_arg("slim")
+        offered_mimetypes = [JSON_MIMETYPE, COMPACT_JSON_MIMETYPE]
+        if msgpack_available():
+            offered_mimetypes += MSGPACK_MIMETYPES
+        mimetype = request.accept_mimetypes.best_match(offered_mimetypes, default=JSON_MIMETYPE)
+        json_provider = current_app.json
+
+        def encode():
+            if mimetype == JSON_MIMETYPE:
+                return json_provider.dumps(graph.cytoscape_data(node_ids, edges, SLIM_NODE_FIELDS if slim else None))
+            return encode_compact(compact_graph_data(graph, node_ids, edges, slim), mimetype)
+
+        response = Response(self.simprov.rest_api.offload(encode), mimetype=mimetype)
+        response.vary.add("Accept")
+        if next_cursor is not None:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return response
 
     def _build_graph_style(self):
         entries = []
@@ -102,23 +203,143 @@ class BrowserAPI(BlueprintWrapper):
         def get_provenance_data():
             """ Gets the provenance graph data for the webinterface.
 
-            The data is returned in the JSON format for Cytoscape.
+            The data is returned in the JSON format for Cytoscape or, if the client accepts it, in the compact format
+            of :py:func:`.compact_graph_data` encoded as MessagePack or JSON.
 
             The following GET parameters are supported:
                 - `showReducedGraph`: `True` if the reduced graph shall be displayed in the web interface; `False` otherwise
                 - `reduceTransitive`: `True` if the transitive closure of the graph shall be computered; `False` otherwise
                 - `hideNodes`: `True` if nodes that are markd as hidden shall be removed from the graph; `False` otherwise
                 - `splitAgents`: True` if agents shall be split; `False` otherwise
+                - `slim`: `True` if only the fields needed to display the nodes shall be sent; `False` otherwise
+                - `limit`: The maximal number of nodes per page
+                - `cursor`: The cursor of the page, as returned in the `X-Next-Cursor` header of the previous page
+                - `root`: The id of a node. Only the node and its ancestors and/or descendants are returned.
+                - `direction`: `up` for the ancestors of the root, `down` for its descendants, or `both` (default)
+                - `depth`: The maximal number of edges between the root and the returned nodes
+                - `asOf`: The sequence number of an event. The graph is returned as it was after the event.
+            """
+            graph = self._get_provenance_graph(*self._graph_query_args())
+            node_ids = None
+            if "root" in request.args:
+                try:
+                    root_id = UUID(request.args["root"])
+                    if root_id not in graph.graph:
+                        return ({"error": f"Unknown node {root_id}."}, 404)
+                    node_ids = graph.neighborhood(root_id, request.args.get("direction", "both"),
+                                                  request.args.get("depth", type=int))
+                except ValueError as ex:
+                    return ({"error": str(ex)}, 400)
+            return self._graph_data_response(graph, node_ids)
+
+        @blueprint.get("/lineage/<node_id>")
+        def get_lineage(node_id):
+            """ Gets the lineage of a node, i.e., the node and its ancestors, in the format of `/provenance-data`.
+
+            The following GET parameters are supported in addition to the ones of `/provenance-data`:
+                - `since`: The id of an ancestor. Only the part of the lineage derived from it is returned.
+                - `depth`: The maximal number of edges between the node and its returned ancestors
+            """
+            graph = self._get_provenance_graph(*self._graph_query_args())
+            try:
+                node_id = UUID(node_id)
+                if node_id not in graph.graph:
+                    return ({"error": f"Unknown node {node_id}."}, 404)
+                since = UUID(request.args["since"]) if "since" in request.args else None
+                node_ids = graph.lineage(node_id, since, request.args.get("depth", type=int))
+            except ValueError as ex:
+                return ({"error": str(ex)}, 400)
+            return self._graph_data_response(graph, node_ids)
+
+        @blueprint.get("/derived-from")
+        def get_derived_from():
+            """ Checks whether a node was derived from another node, i.e., whether there is a path between them.
+
+            The following GET parameters are required:
+                - `id`: The id of the node
+                - `ancestor`: The id of the potential ancestor
+            """
+            try:
+                node_id = UUID(request.args["id"])
+                ancestor_id = UUID(request.args["ancestor"])
+            except (KeyError, ValueError) as ex:
+                return ({"error": f"Invalid node ids: {ex}"}, 400)
+            graph = self.simprov.read_snapshot()
+            for unknown_id in (node_id, ancestor_id):
+                if unknown_id not in graph.graph:
+                    return ({"error": f"Unknown node {unknown_id}."}, 404)
+            return {"result": graph.is_derived_from(node_id, ancestor_id)}
+
+        @blueprint.get("/versions/<node_id>")
+        def get_versions(node_id):
+            """ Gets all versions of an entity or agent, i.e., all nodes with the same primary key.
+
+            The following GET parameters are supported:
+                - `event`: The sequence number of an event. The version that was the latest after the event is
+                  returned as `at`.
+            """
+            graph = self.simprov.read_snapshot()
+            try:
+                node_id = UUID(node_id)
+                event_sequence = request.args.get("event", type=int)
+                version_index = graph.version_index(node_id)
+            except ValueError as ex:
+                return ({"error": str(ex)}, 400)
+            except KeyError:
+                return ({"error": f"Unknown entity or agent {node_id}."}, 404)
+            chain = version_index.chains[version_index.node_keys[node_id]]
+            result = {"versions": [{"id": version_id, "sequence": sequence}
+                                   for (version_id, sequence) in zip(chain.node_ids, chain.sequences)],
+                      "previous": version_index.previous_version(node_id),
+                      "next": version_index.next_version(node_id)}
+            if event_sequence is not None:
+                result["at"] = version_index.version_at(node_id, event_sequence)
+            return jsonify(result)
+
+        @blueprint.get("/query")
+        def query_nodes():
+            """ Finds the nodes matching all given filters using the attribute indexes.
+
+            The following GET parameters are supported:
+                - `type`: The node type, i.e., `Entity`, `Agent` or `Activity`
+                - `name`: The node name, e.g., `Simulation Model`
+                - `eq.<attribute>`: The value the indexed attribute has to equal
+                - `prefix.<attribute>`: The prefix the value of the indexed attribute has to start with
+            """
+            equals = {key[len("eq."):]: value for (key, value) in request.args.items() if key.startswith("eq.")}
+            prefixes = {key[len("prefix."):]: value for (key, value) in request.args.items()
+                        if key.startswith("prefix.")}
+            try:
+                result = self.simprov.read_snapshot().query(request.args.get("type"), request.args.get("name"),
+                                                            equals, prefixes)
+            except KeyError as ex:
+                return ({"error": ex.args[0]}, 400)
+            return jsonify({"result": result})
+
+        @blueprint.route("/diff", methods=["GET", "POST"])
+        def get_diff():
+            """ Streams the differences between two provenance graphs as JSON lines.
+
+            A GET request compares two states of this study:
+                - `from`: The sequence number of the event after which the old graph is taken
+                - `to`: The sequence number of the event after which the new graph is taken. The current graph if
+                  omitted.
+
+            A POST request compares the current graph with the graph of another study, sent as PROV-JSON body.
             """
-            show_reduced_graph = request.args.get("showReducedGraph", default=False, type=lambda v: v.lower() == 'true')
-            reduce_transitives = request.args.get("reduceTransitives", default=False,
-                                                  type=lambda v: v.lower() == 'true')
-            hide_nodes = request.args.get("hideNodes", default=False,
-                                          type=lambda v: v.lower() == 'true')
-            split_agents = request.args.get("splitAgents", default=False, type=lambda v: v.lower() == 'true')
-            data = self._get_provenance_graph_cytoscape_data(show_reduced_graph, reduce_transitives, hide_nodes,
-                                                             split_agents)
-            return jsonify(data)
+            graph = self.simprov.read_snapshot()
+            if request.method == "POST":
+                stream = io.TextIOWrapper(request.stream, encoding="utf-8")
+                (old_graph, new_graph) = (graph, load_prov_json(stream, self.simprov.specification_manager))
+            else:
+                from_sequence = request.args.get("from", type=int)
+                if from_sequence is None:
+                    return ({"error": "The parameter \"from\" is required."}, 400)
+                to_sequence = request.args.get("to", type=int)
+                old_graph = graph.snapshot(from_sequence)
+                new_graph = graph if to_sequence is None else graph.snapshot(to_sequence)
+            chunks = self.simprov.rest_api.offload_chunks(iter_diff_lines(old_graph, new_graph))
+            return Response(stream_with_context(chunks), mimetype="application/x-ndjson")
 
         @blueprint.get("/node-data")
         def get_node_data():
@@ -132,7 +353,10 @@ class BrowserAPI(BlueprintWrapper):
         def update_entity():
             request_json = request.json
             event = {"type": "Update Entity", "node_id": str(request_json["id"]), "changes": request_json["changes"]}
-            self.simprov.process_event(event)
+            try:
+                self.simprov.submit_event(event)
+            except ReadOnlyReplicaException as ex:
+                return ({"error": str(ex)}, 409)
             return ('', 204)
 
         @blueprint.post("/update-activity")
@@ -140,14 +364,17 @@ class BrowserAPI(BlueprintWrapper):
             request_json = request.json
             event = {"type": "Update Dependencies", "node_id": str(request_json["id"]),
                      "changes": request_json["changes"]}
-            self.simprov.process_event(event)
+            try:
+                self.simprov.submit_event(event)
+            except ReadOnlyReplicaException as ex:
+                return ({"error": str(ex)}, 409)
             return ('', 204)
 
         @blueprint.post("/check-dependency-froms-cycle")
         def check_dependencies():
             request_json = request.json
 
-            result = self.simprov.check_dependencies_forms_cycle(request_json)
+            result = self.simprov.read_snapshot().are_dependencies_are_forming_a_cycle(request_json)
             return {"result": result}
 
         @blueprint.post("/dependency-valid-activity")
@@ -171,7 +398,10 @@ class BrowserAPI(BlueprintWrapper):
         @blueprint.post("/hide-node")
         def hide_node():
             request_json = request.json
-            self._hide_node(request_json)
+            try:
+                self._hide_node(request_json)
+            except ReadOnlyReplicaException as ex:
+                return ({"error": str(ex)}, 409)
             return ('', 204)
 
         @blueprint.get("/graph-style")
@@ -181,46 +411,26 @@ class BrowserAPI(BlueprintWrapper):
 
         @blueprint.get("/graph-events")
         def get_graph_events():
-            event_log_json = json.dumps(self.simprov.event_log)
-            (handle, path) = mkstemp(text=True)
-            with open(path, "w") as of:
-                of.write(event_log_json)
-            res = send_file(path, download_name="events.json", mimetype="application/json",
-                            as_attachment=True)
-            return res
+            (graph_version, event_log) = self.simprov.read_event_log()
+            return self._stream_download(graph_version, lambda: _iter_json_list(event_log), "events.json",
+                                         "application/json")
 
         @blueprint.get("/graph-json")
         def get_graph_json():
-            show_reduced_graph = request.args.get("showReducedGraph", default=False, type=lambda v: v.lower() == 'true')
-            reduce_transitives = request.args.get("reduceTransitives", default=False,
-                                                  type=lambda v: v.lower() == 'true')
-            hide_nodes = request.args.get("hideNodes", default=False, type=lambda v: v.lower == 'true')
-            split_agents = request.args.get("splitAgents", default=False, type=lambda v: v.lower() == 'true')
-
-            graph = self._get_provenance_graph(show_reduced_graph, reduce_transitives, hide_nodes,split_agents)
-            graph = self._get_provenance_graph(show_reduced_graph, reduce_transitives, hide_nodes)
-            json_str = to_prov_json(graph)
-            (handle, path) = mkstemp(text=True)
-            with open(path, "w") as of:
-                of.write(json_str)
-            res = send_file(path, download_name="provenance_graph.json", mimetype="application/json",
-                            as_attachment=True)
-            return res
+            query_args = self._graph_query_args()
+            (graph_version, graph) = self.simprov.read_versioned_snapshot()
+            return self._stream_download(graph_version,
+                                         lambda: iter_prov_json(self._get_provenance_graph(
+                                             *query_args, versioned_graph=(graph_version, graph))),
+                                         "provenance_graph.json", "application/json")
 
         @blueprint.get("/graph-dot")
         def get_graph_dot():
-            show_reduced_graph = request.args.get("showReducedGraph", default=False, type=lambda v: v.lower() == 'true')
-            reduce_transitives = request.args.get("reduceTransitives", default=False,
-                                                  type=lambda v: v.lower() == 'true')
-            hide_nodes = request.args.get("hideNodes", default=False, type=lambda v: v.lower() == 'true')
-            split_agents = request.args.get("splitAgents", default=False, type=lambda v: v.lower() == 'true')
-
-            graph = self._get_provenance_graph(show_reduced_graph, reduce_transitives, hide_nodes,split_agents)
-            dot_graph_str = to_dot(graph)
-            (handle, path) = mkstemp(text=True)
-            with open(path, "w") as of:
-                of.write(dot_graph_str)
-            res = send_file(path, download_name="provenance_graph.dot", mimetype="application/text", as_attachment=True)
-            return res
+            query_args = self._graph_query_args()
+            (graph_version, graph) = self.simprov.read_versioned_snapshot()
+            return self._stream_download(graph_version,
+                                         lambda: iter_dot(self._get_provenance_graph(
+                                             *query_args, versioned_graph=(graph_version, graph))),
+                                         "provenance_graph.dot", "application/text")
 
         return blueprint
@@ -3,6 +3,7 @@ import traceback
 
 from flask import Blueprint, request
 
+from simprov.exceptions import ReadOnlyReplicaException
 from simprov.interface.wrapper import BlueprintWrapper
 
 
@@ -16,7 +17,9 @@ class CapturerAPI(BlueprintWrapper):
                 event_json = request.get_json()
                 if (isinstance(event_json, str)):
                     event_json = json.loads(event_json)
-                self.simprov.process_event(event_json)
+                self.simprov.submit_event(event_json)
+            except ReadOnlyReplicaException as ex:
+                return ({"error": str(ex)}, 409)
             except Exception as ex:
                 traceback.print_exc()
                 return ('', 404)
@@ -1,6 +1,8 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, Response, jsonify, request
 
+from simprov.exceptions import ProfilerBusyException
 from simprov.interface.wrapper import BlueprintWrapper
+from simprov.profiling import PROFILE_FORMATS, PROFILE_MODES, run_profile
 
 
 class DebugAPI(BlueprintWrapper):
@@ -18,6 +20,47 @@ class DebugAPI(BlueprintWrapper):
             self.simprov.write_study_state()
             return ('', 204)
 
+        @blueprint.get("/metrics")
+        def metrics():
+            return Response(self.simprov.metrics.render(self.simprov), mimetype="text/plain; version=0.0.4")
+
+        @blueprint.get("/traces")
+        def traces():
+            """Returns the traces of the most recently processed events.
+
+            The following GET parameters are supported:
+                - `limit`: The maximum number of traces, 100 by default
+                - `minDuration`: Only traces of events that took at least this many milliseconds
+            """
+            limit = request.args.get("limit", default=100, type=int)
+            min_duration = request.args.get("minDuration", default=0.0, type=float)
+            return jsonify(self.simprov.tracer.recent_traces(limit, min_duration))
+
+        @blueprint.get("/profile")
+        def profile():
+            """Profiles the running server and returns the profile as download.
+
+            The following GET parameters are supported:
+                - `seconds`: The duration of the profile, at most 60 seconds
+                - `mode`: `cpu` to sample the stacks of all threads or `alloc` to trace the memory allocations
+                - `format`: `collapsed` for flame graph tools or `speedscope`
+            """
+            seconds = request.args.get("seconds", default=10.0, type=float)
+            mode = request.args.get("mode", default="cpu")
+            output_format = request.args.get("format", default="collapsed")
+            if mode not in PROFILE_MODES or output_format not in PROFILE_FORMATS:
+                return ({"error": f"The mode must be one of {PROFILE_MODES} and the format one of "
+                                  f"{PROFILE_FORMATS}."}, 400)
+            try:
+                # The profile sleeps in real time, which must not block the hub of a green-thread server.
+                content = self.simprov.rest_api.offload_blocking(lambda: run_profile(mode, seconds, output_format))
+            except ProfilerBusyException as ex:
+                return ({"error": str(ex)}, 409)
+            (mimetype, extension) = (("application/json", "speedscope.json") if output_format == "speedscope"
+                                     else ("text/plain", "collapsed.txt"))
+            return Response(content, mimetype=mimetype,
+                            headers={"Content-Disposition": f"attachment; filename=profile-{mode}.{extension}"})
+
         @blueprint.get("/demo-event")
         def demo_event():
             self.simprov.rest_api.socketio.emit("my-event-a")
@@ -0,0 +1,136 @@
+import json
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from simprov.provenance import ProvenanceGraph
+
+JSON_MIMETYPE = "application/json"
+COMPACT_JSON_MIMETYPE = "application/vnd.simprov.compact+json"
+MSGPACK_MIMETYPES = ("application/msgpack", "application/x-msgpack")
+SLIM_NODE_FIELDS = ("id", "name", "type", "hidden")
+_NODE_REFERENCE_FIELDS = ("used_entities", "generated_entities", "associated_agents")
+
+
+def msgpack_available() -> bool:
+    """Checks whether the optional msgpack package is installed.
+
+    :rtype: bool
+    :return: `True` if graph data can be encoded in MessagePack, `False` otherwise
+    """
+    try:
+        import msgpack
+    except ImportError:
+        return False
+    return True
+
+
+def graph_page(provenance_graph: ProvenanceGraph, cursor: str = None, limit: int = None,
+               node_ids: List[UUID] = None) -> Tuple[List[UUID], List[Tuple[UUID, UUID]], Optional[str]]:
+    """Selects a page of nodes and edges of a provenance graph.
+
+    Nodes are paged in the order they were added, so pages stay valid while the graph grows. Every edge belongs to the
+    page of its later added node, i.e., an edge is sent once both of its nodes have been sent. The cursor names the
+    node numbering of the graph, so a cursor of a graph that has been rebuilt since, e.g., by a reload, is rejected.
+
+    :param ProvenanceGraph provenance_graph:
+    :param str, optional cursor: The cursor returned with the previous page. ``None`` for the first page.
+    :param int, optional limit: The maximal number of nodes of the page. All nodes if ``None``.
+    :param List[UUID], optional node_ids: The nodes of a subgraph in the order they shall be paged.
+        Only edges between these nodes are selected. The whole graph if ``None``.
+    :return: The node ids and the edges of the page as well as the cursor of the next page, ``None`` if it was the
+        last page
+    :rtype: Tuple[List[UUID], List[Tuple[UUID,UUID]], Optional[str]]
+    :raises ValueError: If the cursor or the limit is invalid, or the cursor belongs to another node numbering.
+    """
+    graph = provenance_graph.graph
+    if cursor is None and limit is None and node_ids is None:
+        return list(graph.nodes), list(graph.edges), None
+    start = _cursor_position(cursor, provenance_graph.node_numbering) if cursor is not None else 0
+    if start < 0 or (limit is not None and limit < 1):
+        raise ValueError(f"Invalid page {cursor} with limit {limit}.")
+    if node_ids is None:
+        # The node order is shared with the graph the snapshot was copied from, only its first nodes are in the graph.
+        (node_ids, positions, node_count) = (provenance_graph.node_order, provenance_graph.node_positions, len(graph))
+    else:
+        positions = {node_id: position for (position, node_id) in enumerate(node_ids)}
+        node_count = len(node_ids)
+    end = node_count if limit is None else min(start + limit, node_count)
+    page_node_ids = node_ids[start:end]
+    edges = []
+    for node_id in page_node_ids:
+        position = positions[node_id]
+        edges += [(node_id, target_id) for target_id in graph.successors(node_id)
+                  if positions.get(target_id, node_count) <= position]
+        edges += [(source_id, node_id) for source_id in graph.predecessors(node_id)
+                  if positions.get(source_id, node_count) < position]
+    next_cursor = f"{provenance_graph.node_numbering}:{end}" if end < node_count else None
+    return page_node_ids, edges, next_cursor
+
+
+def _cursor_position(cursor: str, node_numbering: str) -> int:
+    (cursor_numbering, _, position) = cursor.rpartition(":")
+    if cursor_numbering != node_numbering:
+        raise ValueError(f"The cursor {cursor} belongs to another version of the graph, start again without a cursor.")
+    return int(position)
+
+
+def compact_graph_data(provenance_graph: ProvenanceGraph, node_ids: List[UUID], edges: List[Tuple[UUID, UUID]],
+                       slim: bool = False) -> Dict:
+    """Returns the nodes and edges in a compact representation.
+
+    Ids, names and types are interned into a string table and referenced by their index.
+    A node is a list ``[id, name, type, hidden, details]``, where ``details`` holds the remaining node data and is
+    omitted in slim mode. The used, generated and associated nodes of an activity are sent as references instead of
+    copies of the nodes. An edge is a list ``[source, target, user-generated]``.
+
+    :param ProvenanceGraph provenance_graph:
+    :param List[UUID] node_ids: The ids of the nodes.
+    :param List[Tuple[UUID,UUID]] edges: The edges.
+    :param bool slim: If `True` only the fields needed to display the nodes are included.
+    :rtype: Dict
+    :return: The compact graph data.
+    """
+    strings = []
+    references = {}
+
+    def intern(value) -> int:
+        value = str(value)
+        reference = references.get(value)
+        if reference is None:
+            reference = references[value] = len(strings)
+            strings.append(value)
+        return reference
+
+    nodes = []
+    for node_id in node_ids:
+        node_data = provenance_graph.graph.nodes[node_id]
+        node = [intern(node_id), intern(node_data.get("name")), intern(node_data.get("type")),
+                node_id in provenance_graph.hidden_nodes]
+        if not slim:
+            details = {}
+            for (field, value) in node_data.items():
+                if field in SLIM_NODE_FIELDS:
+                    continue
+                if field in _NODE_REFERENCE_FIELDS:
+                    value = [intern(referenced_node["id"]) for referenced_node in value]
+                details[field] = value
+            node.append(details)
+        nodes.append(node)
+    compact_edges = [[intern(source_id), intern(target_id),
+                      (source_id, target_id) in provenance_graph.user_generated_dependencies]
+                     for (source_id, target_id) in edges]
+    return {"strings": strings, "nodes": nodes, "edges": compact_edges}
+
+
+def encode_compact(data: Dict, mimetype: str) -> bytes:
+    """Encodes compact graph data as MessagePack or JSON.
+
+    :param Dict data: The compact graph data.
+    :param str mimetype: One of the MessagePack mimetypes or the compact JSON mimetype.
+    :rtype: bytes
+    :return: The encoded data.
+    """
+    if mimetype in MSGPACK_MIMETYPES:
+        import msgpack
+        return msgpack.packb(data, default=str)
+    return json.dumps(data, default=str, separators=(",", ":")).encode("utf-8")
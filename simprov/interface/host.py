@@ -0,0 +1,271 @@
+import json
+import random
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Lock
+from typing import Dict, List
+from urllib.parse import quote, urlsplit
+
+from werkzeug.wsgi import ClosingIterator
+
+from simprov.core import SimProv
+from simprov.interface.options import ServerOptions
+from simprov.provenance import use_id_generator
+
+# Rough memory use of the parts of a loaded study, see StudyHost.estimate_memory.
+NODE_BYTES = 4096
+EDGE_BYTES = 512
+EVENT_BYTES = 1024
+
+
+@dataclass
+class StudyConfig:
+    """Represents a study hosted by a :py:class:`StudyHost`.
+
+    :ivar str study_id:
+        The id of the study used in the URLs, i.e., ``/studies/<study_id>/...``.
+    :ivar str rule_path:
+        The path of the rules.
+    :ivar str specifications_path:
+        The path of the specifications.
+    :ivar str state_file_path:
+        The path of the state file of the study.
+    :ivar int worker:
+        The index of the worker process the study is pinned to. Assigned by the hash of the id if ``None``.
+    """
+    study_id: str
+    rule_path: str
+    specifications_path: str
+    state_file_path: str
+    worker: int | None = None
+
+
+def load_host_config(path: str) -> List[StudyConfig]:
+    """Loads the studies of a host from a YAML file.
+
+    The file maps the study ids to their rules, specifications, state file and optionally worker::
+
+        studies:
+          study-a:
+            rules: rules.py
+            specifications: specs.yaml
+            state_file: study-a.pickle
+            worker: 0
+
+    Relative paths are resolved against the directory of the file. The state file defaults to ``<study id>.pickle``.
+
+    :param str path: The path of the YAML file.
+    :rtype: List[StudyConfig]
+    :raises ValueError: If a study misses its rules or specifications.
+    """
+    import yaml
+    directory = Path(path).parent
+    with open(path, "r") as config_file:
+        content = yaml.safe_load(config_file) or {}
+    studies = []
+    for (study_id, study) in (content.get("studies") or {}).items():
+        if "rules" not in study or "specifications" not in study:
+            raise ValueError(f"Study {study_id} needs rules and specifications")
+        studies.append(StudyConfig(str(study_id), str(directory / study["rules"]),
+                                   str(directory / study["specifications"]),
+                                   str(directory / study.get("state_file", f"{study_id}.pickle")),
+                                   study.get("worker", None)))
+    return studies
+
+
+class StudyHost:
+    """Serves many studies from one server, each with its own :py:class:`.SimProv` instance.
+
+    The REST API of a study is available under ``/studies/<study id>``, ``GET /studies`` lists the studies. Studies
+    are loaded on their first request and share identical rule and specification files. When the estimated memory of
+    the loaded studies exceeds the budget, the least recently used studies without running requests are unloaded.
+    Their state files are written on every event, so they are loaded again with the same provenance graph.
+
+    Every study is pinned to one of the worker processes. Requests for studies of other workers are redirected to
+    their port.
+
+    :param List[StudyConfig] studies:
+        The hosted studies.
+    :param int memory_budget:
+        The estimated number of bytes the loaded studies may use. ``0`` disables the unloading.
+    :param int worker_index:
+        The index of the worker process of this host.
+    :param List[int], optional worker_ports:
+        The ports of all worker processes. A single worker if ``None``.
+    :ivar Dict[str,StudyConfig] studies:
+        A mapping from the study ids to the studies.
+    :ivar OrderedDict[str,SimProv] loaded:
+        The loaded studies, the least recently used first.
+    :ivar Dict[str,int] active_requests:
+        The number of running requests of every loaded study.
+    """
+
+    def __init__(self, studies: List[StudyConfig], memory_budget: int = 0, worker_index: int = 0,
+                 worker_ports: List[int] = None) -> None:
+        self.studies: Dict[str, StudyConfig] = {study.study_id: study for study in studies}
+        self.memory_budget: int = memory_budget
+        self.worker_index: int = worker_index
+        self.worker_ports: List[int] = worker_ports
+        self.loaded: OrderedDict[str, SimProv] = OrderedDict()
+        self.active_requests: Dict[str, int] = {}
+        self.id_generators: Dict[str, random.Random] = {}
+        self.lock: Lock = Lock()
+        self.loading_locks: Dict[str, Lock] = {study_id: Lock() for study_id in self.studies}
+
+    def worker_of(self, study_id: str) -> int:
+        """Returns the index of the worker process a study is pinned to.
+
+        :param str study_id:
+        :rtype: int
+        """
+        worker_count = 1 if self.worker_ports is None else len(self.worker_ports)
+        worker = self.studies[study_id].worker
+        if worker is None:
+            worker = zlib.crc32(study_id.encode("utf-8"))
+        return worker % worker_count
+
+    @staticmethod
+    def estimate_memory(simprov: SimProv) -> int:
+        """Estimates the number of bytes a loaded study uses from the size of its provenance graph and event log.
+
+        :param SimProv simprov:
+        :rtype: int
+        """
+        graph = simprov.provenance_graph.graph
+        return (graph.number_of_nodes() * NODE_BYTES + graph.number_of_edges() * EDGE_BYTES +
+                len(simprov.event_log) * EVENT_BYTES)
+
+    def acquire(self, study_id: str) -> SimProv:
+        """Returns the instance of a study, loading it if necessary, and counts a running request for it.
+
+        Every call has to be followed by a call of :py:meth:`release`.
+
+        :param str study_id:
+        :rtype: SimProv
+        """
+        with self.lock:
+            instance = self._check_out(study_id)
+        if instance is not None:
+            return instance
+        with self.loading_locks[study_id]:
+            with self.lock:
+                instance = self._check_out(study_id)
+            if instance is not None:
+                return instance
+            study = self.studies[study_id]
+            id_generator = self.id_generators.setdefault(study_id, random.Random("simprov"))
+            id_generator.seed("simprov")
+            with use_id_generator(id_generator):
+                instance = SimProv(study.rule_path, study.specifications_path, study.state_file_path,
+                                   start_api=False, share_modules=True,
+                                   server_options=ServerOptions(async_mode="threading", debug=False,
+                                                                log_requests=False))
+            with self.lock:
+                self.loaded[study_id] = instance
+                self.active_requests[study_id] = 1
+                self._unload_idle_studies()
+        return instance
+
+    def release(self, study_id: str):
+        """Counts a request of a study as finished.
+
+        :param str study_id:
+        """
+        with self.lock:
+            self.active_requests[study_id] -= 1
+            self._unload_idle_studies()
+
+    def unload(self, study_id: str) -> bool:
+        """Unloads a study unless it has running requests.
+
+        :param str study_id:
+        :rtype: bool
+        :return: Whether the study was unloaded.
+        """
+        with self.lock:
+            return self._unload(study_id)
+
+    def _check_out(self, study_id: str) -> SimProv | None:
+        instance = self.loaded.get(study_id, None)
+        if instance is not None:
+            self.loaded.move_to_end(study_id)
+            self.active_requests[study_id] += 1
+        return instance
+
+    def _unload(self, study_id: str) -> bool:
+        if study_id not in self.loaded or self.active_requests[study_id] > 0:
+            return False
+        self.loaded.pop(study_id).close()
+        del self.active_requests[study_id]
+        return True
+
+    def _unload_idle_studies(self):
+        if self.memory_budget <= 0:
+            return
+        memory = {study_id: self.estimate_memory(instance) for (study_id, instance) in self.loaded.items()}
+        for study_id in list(self.loaded):
+            if sum(memory.values()) <= self.memory_budget:
+                return
+            if self._unload(study_id):
+                del memory[study_id]
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO", "")
+        if path.rstrip("/") == "/studies":
+            return self._respond(start_response, "200 OK", self._list_studies())
+        parts = path.split("/", 3)
+        if len(parts) < 3 or parts[1] != "studies":
+            return self._respond(start_response, "404 NOT FOUND", {"error": "Not found"})
+        study_id = parts[2]
+        if study_id not in self.studies:
+            return self._respond(start_response, "404 NOT FOUND", {"error": f"Unknown study {study_id}"})
+        worker = self.worker_of(study_id)
+        if worker != self.worker_index:
+            return self._redirect(environ, start_response, self.worker_ports[worker])
+        instance = self.acquire(study_id)
+        try:
+            environ = dict(environ, SCRIPT_NAME=environ.get("SCRIPT_NAME", "") + f"/studies/{study_id}",
+                           PATH_INFO="/" + (parts[3] if len(parts) > 3 else ""))
+            with use_id_generator(self.id_generators[study_id]):
+                response = instance.rest_api.app(environ, start_response)
+        except BaseException:
+            self.release(study_id)
+            raise
+        return ClosingIterator(response, lambda: self.release(study_id))
+
+    def _list_studies(self) -> List[Dict]:
+        with self.lock:
+            return [{"id": study_id, "worker": self.worker_of(study_id), "loaded": study_id in self.loaded}
+                    for study_id in self.studies]
+
+    @staticmethod
+    def _respond(start_response, status: str, body) -> List[bytes]:
+        data = json.dumps(body).encode("utf-8")
+        start_response(status, [("Content-Type", "application/json"), ("Content-Length", str(len(data)))])
+        return [data]
+
+    @staticmethod
+    def _redirect(environ, start_response, port: int) -> List[bytes]:
+        host = urlsplit("//" + environ.get("HTTP_HOST", environ.get("SERVER_NAME", "localhost"))).hostname
+        location = (f"{environ.get('wsgi.url_scheme', 'http')}://{host}:{port}"
+                    f"{quote(environ.get('SCRIPT_NAME', '') + environ.get('PATH_INFO', ''))}")
+        if environ.get("QUERY_STRING"):
+            location += "?" + environ["QUERY_STRING"]
+        start_response("307 TEMPORARY REDIRECT", [("Location", location), ("Content-Length", "0")])
+        return []
+
+
+def run_host_worker(config_path: str, host: str, ports: List[int], worker_index: int, memory_budget: int):
+    """Runs the host of one worker process until it is stopped.
+
+    :param str config_path: The path of the YAML file with the studies, see :py:func:`load_host_config`.
+    :param str host: The host the server listens on.
+    :param List[int] ports: The ports of all worker processes.
+    :param int worker_index: The index of this worker process.
+    :param int memory_budget: The estimated number of bytes the loaded studies of this worker may use.
+    """
+    from werkzeug.serving import run_simple
+    study_host = StudyHost(load_host_config(config_path), memory_budget, worker_index, ports)
+    run_simple(host, ports[worker_index], study_host, threaded=True)
@@ -0,0 +1,45 @@
+from dataclasses import dataclass
+
+ASYNC_MODES = ("eventlet", "gevent", "threading")
+
+
+@dataclass
+class ServerOptions:
+    """Represents the options of the server running the REST API.
+
+    The defaults are meant for development. See :py:meth:`production` for the options of ``simprov serve``.
+
+    :ivar str host:
+        The host the server listens on.
+    :ivar int port:
+        The port the server listens on.
+    :ivar str async_mode:
+        `eventlet`, `gevent` or `threading`. Chosen by Flask-SocketIO if ``None``.
+    :ivar bool debug:
+        If true the server runs in debug mode.
+    :ivar bool log_requests:
+        If true every request and websocket frame is logged.
+    :ivar int worker_threads:
+        The number of threads long requests, e.g., reductions and exports, are offloaded to. ``0`` disables the
+        offloading.
+    """
+    host: str = "0.0.0.0"
+    port: int = 5000
+    async_mode: str | None = None
+    debug: bool = True
+    log_requests: bool = True
+    worker_threads: int = 0
+
+    @classmethod
+    def production(cls, host: str = "0.0.0.0", port: int = 5000, async_mode: str = "eventlet",
+                   worker_threads: int = 8, log_requests: bool = False) -> 'ServerOptions':
+        """Returns the options for production, i.e., without debug mode and with a worker pool.
+
+        :param str host: The host the server listens on.
+        :param int port: The port the server listens on.
+        :param str async_mode: `eventlet`, `gevent` or `threading`.
+        :param int worker_threads: The number of threads long requests are offloaded to.
+        :param bool log_requests: If true every request and websocket frame is logged.
+        :rtype: ServerOptions
+        """
+        return cls(host, port, async_mode, False, log_requests, worker_threads)
@@ -1,4 +1,6 @@
+from itertools import islice
 from threading import Thread
+from typing import Callable, Iterable, Iterator
 
 from flask import Flask
 from flask_cors import CORS
@@ -7,23 +9,96 @@ from flask_socketio import SocketIO
 from simprov.interface.browser_api_blueprint import BrowserAPI
 from simprov.interface.capturer_api_blueprint import CapturerAPI
 from simprov.interface.debug_api_blueprint import DebugAPI
+from simprov.interface.options import ASYNC_MODES, ServerOptions
 
 
 class RestAPI():
 
-    def __init__(self, simprov) -> None:
+    def __init__(self, simprov, options: ServerOptions = None) -> None:
         super().__init__()
         path = "../../webinterface"
         self.simprov = simprov
+        self.options: ServerOptions = ServerOptions() if options is None else options
         self.app = Flask(__name__, instance_relative_config=True, template_folder=path, static_folder=path,
                          static_url_path="/")
-        self.socketio = SocketIO(self.app,logger=True,engineio_logger=True,cors_allowed_origins="*")
-        CORS(self.app)
+        self.socketio = SocketIO(self.app, logger=self.options.log_requests,
+                                 engineio_logger=self.options.log_requests, cors_allowed_origins="*",
+                                 async_mode=self.options.async_mode)
+        CORS(self.app, expose_headers=["X-Next-Cursor"])
+        self._run_in_worker: Callable = self._build_worker_pool()
         self.__load_blueprints()
 
     def start(self):
-        Thread(target=lambda: self.socketio.run(self.app, host="0.0.0.0", allow_unsafe_werkzeug=True, debug=True,
-                                                use_reloader=False)).start()
+        """Starts the server in a separate thread."""
+        Thread(target=self.serve).start()
+
+    def serve(self):
+        """Runs the server in the current thread until it is stopped.
+
+        Outside of debug mode, the threading mode runs on the threaded WSGI server waitress, which has to be installed
+        separately, instead of the development server of Werkzeug. Websocket clients then fall back to long polling.
+        """
+        if self.socketio.async_mode == "threading" and not self.options.debug:
+            from waitress import serve as serve_threaded
+            serve_threaded(self.app, host=self.options.host, port=self.options.port,
+                           threads=max(self.options.worker_threads, 1))
+            return
+        self.socketio.run(self.app, host=self.options.host, port=self.options.port, debug=self.options.debug,
+                          use_reloader=False, log_output=self.options.log_requests,
+                          allow_unsafe_werkzeug=self.options.debug)
+
+    def _build_worker_pool(self) -> Callable:
+        worker_threads = self.options.worker_threads
+        if worker_threads <= 0 or self.socketio.async_mode == "threading":
+            # Without green threads every request already runs in its own thread.
+            return lambda function: function()
+        if self.socketio.async_mode == "eventlet":
+            from eventlet import tpool
+            tpool.set_num_threads(worker_threads)
+            return tpool.execute
+        from gevent import get_hub
+        threadpool = get_hub().threadpool
+        threadpool.maxsize = worker_threads
+        return threadpool.apply
+
+    def offload(self, function: Callable):
+        """Runs a function in the worker pool and waits for its result without blocking the other requests.
+
+        :param Callable function: The function without arguments.
+        :return: The result of the function.
+        """
+        return self._run_in_worker(function)
+
+    def offload_blocking(self, function: Callable):
+        """Runs a function that blocks its thread, e.g., with :py:func:`time.sleep`, in a real thread and waits for it.
+
+        Unlike :py:meth:`offload`, the function never runs inline on eventlet or gevent, so it does not stall the other
+        requests even if the worker pool is disabled.
+
+        :param Callable function: The function without arguments.
+        :return: The result of the function.
+        """
+        if self.socketio.async_mode == "eventlet":
+            from eventlet import tpool
+            return tpool.execute(function)
+        if self.socketio.async_mode == "gevent":
+            from gevent import get_hub
+            return get_hub().threadpool.apply(function)
+        return function()
+
+    def offload_chunks(self, chunks: Iterable, batch_size: int = 256) -> Iterator:
+        """Generates the chunks of a streamed response in batches in the worker pool.
+
+        :param Iterable chunks: The chunks.
+        :param int batch_size: The number of chunks generated per batch.
+        :rtype: Iterator
+        """
+        iterator = iter(chunks)
+        while True:
+            batch = self.offload(lambda: list(islice(iterator, batch_size)))
+            if not batch:
+                return
+            yield from batch
 
     def __load_blueprints(self):
         self.__load_blueprint(CapturerAPI, prefix="/capturer")
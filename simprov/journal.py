@@ -0,0 +1,147 @@
+import json
+import os
+import traceback
+from pathlib import Path
+from threading import Event, Thread
+from typing import List, Tuple, TYPE_CHECKING
+from uuid import uuid4
+
+if TYPE_CHECKING:
+    from simprov.core import SimProv
+
+
+class EventJournal:
+    """Represents an append-only file of the processed events that read replicas follow.
+
+    Every line is a JSON document. The first line is a header with a token identifying the journal, followed by one
+    event per line. Whenever the writer rebuilds its provenance graph, the journal is rewritten atomically with a new
+    token, so the replicas rebuild their graphs as well.
+
+    :param str path:
+        The path of the journal file.
+    :ivar Path path:
+        The path of the journal file.
+    :ivar str token:
+        The token of the current journal.
+    :ivar int bytes_written:
+        The number of bytes written to all journals so far.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path: Path = Path(path)
+        self.token: str = None
+        self.bytes_written: int = 0
+        self._file = None
+
+    def rewrite(self, events: List[dict]):
+        """Replaces the journal with a new one containing the given events.
+
+        :param List[dict] events: All processed events.
+        """
+        self.close()
+        self.token = uuid4().hex
+        temporary_path = self.path.with_name(self.path.name + ".tmp")
+        with open(temporary_path, "w", encoding="utf-8") as journal_file:
+            journal_file.write(json.dumps({"journal": self.token}) + "\n")
+            for event in events:
+                journal_file.write(json.dumps(event) + "\n")
+            self.bytes_written += journal_file.tell()
+        os.replace(temporary_path, self.path)
+        self._file = open(self.path, "ab")
+
+    def append(self, event: dict):
+        """Appends a processed event to the journal.
+
+        :param dict event: The event.
+        """
+        line = (json.dumps(event) + "\n").encode("utf-8")
+        self._file.write(line)
+        self._file.flush()
+        self.bytes_written += len(line)
+
+    def close(self):
+        """Closes the journal file."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class JournalFollower(Thread):
+    """Tails the event journal of a writer and applies the new events to the provenance graph of a read replica.
+
+    The journal is polled for new complete lines. If its token changed, i.e., the writer rebuilt its graph, the replica
+    rebuilds its graph from the whole journal.
+
+    :param SimProv simprov:
+        The SimProv instance of the replica.
+    :param str path:
+        The path of the journal file.
+    :param float interval:
+        The polling interval in seconds.
+    """
+
+    def __init__(self, simprov: 'SimProv', path: str, interval: float = 0.2) -> None:
+        super().__init__(name="simprov-journal-follower", daemon=True)
+        self.simprov: 'SimProv' = simprov
+        self.path: Path = Path(path)
+        self.interval: float = interval
+        self.stopped: Event = Event()
+        self.token: str = None
+        self.offset: int = 0
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.poll()
+            except Exception:
+                traceback.print_exc()
+
+    def stop(self):
+        """Stops following the journal."""
+        self.stopped.set()
+
+    def poll(self) -> int:
+        """Applies the events appended to the journal since the last poll.
+
+        :rtype: int
+        :return: The number of applied events.
+        """
+        (events, reset) = self._read()
+        if events or reset:
+            self.simprov.apply_journal_events(events, reset)
+        return len(events)
+
+    def _read(self) -> Tuple[List[dict], bool]:
+        try:
+            journal_file = open(self.path, "rb")
+        except FileNotFoundError:
+            return ([], False)
+        with journal_file:
+            header = journal_file.readline()
+            if not header.endswith(b"\n"):
+                return ([], False)
+            token = json.loads(header)["journal"]
+            reset = token != self.token
+            if reset:
+                self.token = token
+                self.offset = journal_file.tell()
+            journal_file.seek(self.offset)
+            data = journal_file.read()
+        # The writer may be in the middle of appending a line.
+        end = data.rfind(b"\n") + 1
+        self.offset += end
+        return ([json.loads(line) for line in data[:end].splitlines() if line], reset)
+
+
+def forward_event(writer_url: str, event: dict):
+    """Sends an event to the capturer API of the writer, e.g., a user edit made on a read replica.
+
+    :param str writer_url: The base URL of the writer, e.g., ``http://localhost:5000``.
+    :param dict event: The event.
+    :raises urllib.error.URLError: If the writer can not be reached or rejects the event.
+    """
+    from urllib.request import Request, urlopen
+    request = Request(writer_url.rstrip("/") + "/capturer/process-event", data=json.dumps(event).encode("utf-8"),
+                      headers={"Content-Type": "application/json"}, method="POST")
+    with urlopen(request, timeout=30):
+        pass
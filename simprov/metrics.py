@@ -0,0 +1,163 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock
+from time import perf_counter
+from typing import Dict, Iterator, List, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from simprov.core import SimProv
+
+# The upper bounds in seconds, from half a millisecond to ten seconds.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PIPELINE_STAGES = ("rule", "normalize", "validate", "chain", "journal", "notify", "persist")
+
+
+class Histogram:
+    """Represents a histogram of durations with fixed buckets.
+
+    Observing a value only increments the count of its bucket, the cumulative counts are computed when rendering.
+
+    :param Tuple[float] buckets:
+        The upper bounds of the buckets in ascending order. A last bucket for larger values is added.
+    :ivar List[int] counts:
+        The number of observed values of every bucket.
+    :ivar float sum:
+        The sum of all observed values.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets: Tuple[float, ...] = buckets
+        self.counts: List[int] = [0] * (len(buckets) + 1)
+        self.sum: float = 0.0
+        self._lock: Lock = Lock()
+
+    def observe(self, value: float):
+        """Adds a value to the histogram.
+
+        :param float value: The value, e.g., a duration in seconds.
+        """
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def cumulative_counts(self) -> List[Tuple[str, int]]:
+        """Returns the number of values less than or equal to every upper bound, including ``+Inf``.
+
+        :rtype: List[Tuple[str,int]]
+        """
+        with self._lock:
+            counts = list(self.counts)
+        bounds = [repr(bucket) for bucket in self.buckets] + ["+Inf"]
+        total = 0
+        cumulative = []
+        for (bound, count) in zip(bounds, counts):
+            total += count
+            cumulative.append((bound, total))
+        return cumulative
+
+
+class PipelineMetrics:
+    """Collects the metrics of the event processing pipeline of a SimProv instance.
+
+    The durations of the pipeline stages (see ``PIPELINE_STAGES``), of whole events and of graph reductions are
+    collected in histograms. :py:meth:`render` exposes them together with the event and error counters, the size of
+    the provenance graph and the bytes written to the journal in the Prometheus text format.
+
+    :ivar Dict[str,Histogram] stage_seconds:
+        The durations of every pipeline stage.
+    :ivar Histogram event_seconds:
+        The durations of processing whole events.
+    :ivar Histogram reduction_seconds:
+        The durations of graph reductions.
+    :ivar int events_processed:
+        The number of processed events.
+    :ivar int events_skipped:
+        The number of events skipped as duplicates.
+    :ivar Dict[str,int] errors:
+        The number of failed events by the type of the raised exception.
+    """
+
+    def __init__(self) -> None:
+        self.stage_seconds: Dict[str, Histogram] = {stage: Histogram() for stage in PIPELINE_STAGES}
+        self.event_seconds: Histogram = Histogram()
+        self.reduction_seconds: Histogram = Histogram()
+        self.events_processed: int = 0
+        self.events_skipped: int = 0
+        self.errors: Dict[str, int] = {}
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        """Measures the duration of a pipeline stage.
+
+        :param str stage: One of ``PIPELINE_STAGES``.
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_seconds[stage].observe(perf_counter() - start)
+
+    def count_error(self, exception: Exception):
+        """Counts a failed event.
+
+        :param Exception exception: The raised exception.
+        """
+        error_type = type(exception).__name__
+        self.errors[error_type] = self.errors.get(error_type, 0) + 1
+
+    def render(self, simprov: 'SimProv') -> str:
+        """Returns the metrics in the Prometheus text format.
+
+        :param SimProv simprov: The instance whose graph size and journal are reported.
+        :rtype: str
+        """
+        lines = []
+        _render_histogram(lines, "simprov_stage_seconds", "Duration of the stages of processing an event.",
+                          [({"stage": stage}, histogram) for (stage, histogram) in self.stage_seconds.items()])
+        _render_histogram(lines, "simprov_event_seconds", "Duration of processing an event.",
+                          [({}, self.event_seconds)])
+        _render_histogram(lines, "simprov_reduction_seconds", "Duration of reducing the provenance graph.",
+                          [({}, self.reduction_seconds)])
+        _render_samples(lines, "simprov_events_processed_total", "counter", "Number of processed events.",
+                        [({}, self.events_processed)])
+        _render_samples(lines, "simprov_events_skipped_total", "counter", "Number of events skipped as duplicates.",
+                        [({}, self.events_skipped)])
+        _render_samples(lines, "simprov_event_errors_total", "counter", "Number of failed events by exception type.",
+                        [({"type": error_type}, count) for (error_type, count) in sorted(self.errors.items())])
+        graph = simprov.provenance_graph.graph
+        _render_samples(lines, "simprov_graph_nodes", "gauge", "Number of nodes of the provenance graph.",
+                        [({}, graph.number_of_nodes())])
+        _render_samples(lines, "simprov_graph_edges", "gauge", "Number of edges of the provenance graph.",
+                        [({}, graph.number_of_edges())])
+        if simprov.journal is not None:
+            _render_samples(lines, "simprov_journal_written_bytes_total", "counter",
+                            "Number of bytes written to the event journal.", [({}, simprov.journal.bytes_written)])
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = [(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+               for (name, value) in labels.items()]
+    return "{" + ",".join(f'{name}="{value}"' for (name, value) in escaped) + "}"
+
+
+def _render_samples(lines: List[str], name: str, metric_type: str, description: str,
+                    samples: List[Tuple[Dict, float]]):
+    lines.append(f"# HELP {name} {description}")
+    lines.append(f"# TYPE {name} {metric_type}")
+    for (labels, value) in samples:
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+
+
+def _render_histogram(lines: List[str], name: str, description: str, histograms: List[Tuple[Dict, Histogram]]):
+    lines.append(f"# HELP {name} {description}")
+    lines.append(f"# TYPE {name} histogram")
+    for (labels, histogram) in histograms:
+        cumulative = histogram.cumulative_counts()
+        for (bound, count) in cumulative:
+            lines.append(f"{name}_bucket{_format_labels({**labels, 'le': bound})} {count}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+        lines.append(f"{name}_count{_format_labels(labels)} {cumulative[-1][1]}")
@@ -0,0 +1,132 @@
+import json
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from threading import Lock, get_ident
+from typing import Dict, List, Tuple
+
+from simprov.exceptions import ProfilerBusyException
+
+PROFILE_MODES = ("cpu", "alloc")
+PROFILE_FORMATS = ("collapsed", "speedscope")
+MAX_PROFILE_SECONDS = 60.0
+SAMPLE_INTERVAL = 0.01
+ALLOCATION_FRAMES = 32
+
+# A stack is a tuple of (name, file, line) frames, the outermost frame first.
+Stack = Tuple[Tuple[str, str, int], ...]
+
+_PROFILE_LOCK = Lock()
+
+
+def sample_stacks(seconds: float, interval: float = SAMPLE_INTERVAL) -> Counter:
+    """Samples the stacks of all other threads of the process in regular intervals.
+
+    The samples are taken in wall-clock time, so threads waiting for I/O or locks are sampled as well. Sampling only
+    reads the current frames, so the profiled threads are not slowed down.
+
+    :param float seconds: The duration of the profile.
+    :param float interval: The seconds between two samples.
+    :rtype: Counter
+    :return: The number of samples of every stack.
+    """
+    own_thread = get_ident()
+    stacks = Counter()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for (thread_id, frame) in sys._current_frames().items():
+            if thread_id == own_thread:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            stacks[tuple(reversed(stack))] += 1
+        time.sleep(interval)
+    return stacks
+
+
+def trace_allocations(seconds: float, frames: int = ALLOCATION_FRAMES) -> Counter:
+    """Traces the memory allocated by all threads of the process with :py:mod:`tracemalloc`.
+
+    :param float seconds: The duration of the profile.
+    :param int frames: The number of frames stored per allocation.
+    :rtype: Counter
+    :return: The bytes allocated during the profile and still alive at its end, for every stack.
+    """
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start(frames)
+    try:
+        time.sleep(seconds)
+        snapshot = tracemalloc.take_snapshot()
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+    stacks = Counter()
+    for statistic in snapshot.statistics("traceback"):
+        stack = tuple((Path(frame.filename).stem, frame.filename, frame.lineno) for frame in statistic.traceback)
+        stacks[stack] += statistic.size
+    return stacks
+
+
+def to_collapsed(stacks: Counter) -> str:
+    """Formats stacks in the collapsed format of flame graph tools, i.e., one ``frame;frame;... weight`` per line.
+
+    :param Counter stacks: The weight of every stack.
+    :rtype: str
+    """
+    return "".join(";".join(f"{name} ({file}:{line})" for (name, file, line) in stack) + f" {weight}\n"
+                   for (stack, weight) in stacks.most_common())
+
+
+def to_speedscope(stacks: Counter, name: str, unit: str) -> str:
+    """Formats stacks as sampled profile in the file format of speedscope.
+
+    :param Counter stacks: The weight of every stack.
+    :param str name: The name of the profile.
+    :param str unit: The unit of the weights, `none` for samples or `bytes`.
+    :rtype: str
+    """
+    frames: List[Dict] = []
+    frame_indices: Dict[Tuple[str, str, int], int] = {}
+    samples = []
+    weights = []
+    for (stack, weight) in stacks.most_common():
+        for frame in stack:
+            if frame not in frame_indices:
+                frame_indices[frame] = len(frames)
+                frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+        samples.append([frame_indices[frame] for frame in stack])
+        weights.append(weight)
+    return json.dumps({"$schema": "https://www.speedscope.app/file-format-schema.json", "name": name,
+                       "exporter": "simprov", "shared": {"frames": frames},
+                       "profiles": [{"type": "sampled", "name": name, "unit": unit, "startValue": 0,
+                                     "endValue": sum(weights), "samples": samples, "weights": weights}]})
+
+
+def run_profile(mode: str, seconds: float, output_format: str) -> str:
+    """Profiles the running process and returns the profile file.
+
+    Only one profile runs at a time and it runs at most ``MAX_PROFILE_SECONDS``.
+
+    :param str mode: `cpu` for sampled stacks or `alloc` for traced allocations.
+    :param float seconds: The duration of the profile.
+    :param str output_format: `collapsed` or `speedscope`.
+    :rtype: str
+    :raises ProfilerBusyException: If another profile is running.
+    """
+    if not _PROFILE_LOCK.acquire(blocking=False):
+        raise ProfilerBusyException("Another profile is running.")
+    try:
+        seconds = min(max(seconds, 0.0), MAX_PROFILE_SECONDS)
+        stacks = sample_stacks(seconds) if mode == "cpu" else trace_allocations(seconds)
+    finally:
+        _PROFILE_LOCK.release()
+    if output_format == "speedscope":
+        return to_speedscope(stacks, f"SimProv {mode} profile", "none" if mode == "cpu" else "bytes")
+    return to_collapsed(stacks)
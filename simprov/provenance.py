@@ -1,17 +1,85 @@
+import copy
+import hashlib
 import random
 import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass, field, asdict
-from typing import List, Tuple, Set, Dict
+from typing import Iterable, List, Tuple, Set, Dict
 from uuid import UUID
 
-from networkx import DiGraph, set_node_attributes, bfs_tree
+from networkx import DiGraph, set_node_attributes, bfs_tree, has_path
 from networkx.algorithms.dag import has_cycle
 
+from simprov.attribute_index import AttributeIndex
+from simprov.history import MISSING, GraphHistory
+from simprov.reachability import ReachabilityIndex
+from simprov.versions import VersionIndex
+
 random.seed("simprov")
+_ID_GENERATOR: ContextVar[random.Random | None] = ContextVar("simprov_id_generator", default=None)
+
+
+def _id_generator():
+    generator = _ID_GENERATOR.get()
+    return random if generator is None else generator
+
+
+def reset_id_generator(existing_ids: Iterable[UUID] = ()):
+    """Resets the generator of node ids.
+
+    Replaying the same events after a reset yields the same node ids as the first processing after startup. If the
+    graph starts with existing nodes, e.g., an imported base graph, the seed is derived from their ids. Otherwise the
+    new ids would repeat the ids of the imported graph, which was built from the same default seed.
+
+    :param Iterable[UUID] existing_ids: The ids of the nodes the graph starts with.
+    """
+    existing_ids = sorted(existing_ids)
+    if not existing_ids:
+        _id_generator().seed("simprov")
+        return
+    digest = hashlib.blake2b(digest_size=16)
+    for node_id in existing_ids:
+        digest.update(node_id.bytes)
+    _id_generator().seed(f"simprov:{digest.hexdigest()}")
+
+
+def id_generator_state() -> tuple:
+    """Returns the state of the generator of node ids, e.g., to restore it after a failure.
+
+    :rtype: tuple
+    """
+    return _id_generator().getstate()
+
+
+def set_id_generator_state(state: tuple):
+    """Restores a state of the generator of node ids returned by :py:func:`id_generator_state`.
+
+    :param tuple state:
+    """
+    _id_generator().setstate(state)
+
+
+@contextmanager
+def use_id_generator(generator: random.Random):
+    """Generates the node ids with the given generator instead of the global one within the context.
+
+    Several provenance graphs built in the same process, e.g., the studies of a :py:class:`.StudyHost`, need their own
+    generators, otherwise resetting the generator for one graph would repeat ids in the others.
+
+    :param random.Random generator: The generator, e.g., ``random.Random("simprov")``.
+    """
+    token = _ID_GENERATOR.set(generator)
+    try:
+        yield generator
+    finally:
+        _ID_GENERATOR.reset(token)
 
 
 def _random_uuid():
-    return uuid.UUID(bytes=bytes(random.getrandbits(8) for _ in range(16)), version=4)
+    getrandbits = _id_generator().getrandbits
+    return uuid.UUID(bytes=bytes(getrandbits(8) for _ in range(16)), version=4)
 
 
 @dataclass
@@ -137,6 +205,13 @@ class Agent:
     def __getitem__(self, key):
         return self.attributes[key]
 
+def _related_nodes(current_nodes: List, neighbors: List, node_class) -> List:
+    # Keeps the order of the current relations and appends the relations that were removed later.
+    related = {node.id: node for node in neighbors if isinstance(node, node_class)}
+    ordered = [related.pop(node.id) for node in current_nodes if node.id in related]
+    return ordered + list(related.values())
+
+
 class ProvenanceGraph:
     """Represents a provenance graph.
 
@@ -151,6 +226,25 @@ class ProvenanceGraph:
         A mapping from the node ids to the corresponding entities and activities.
     :ivar Set user_generated_dependencies:
         A set tracking the dependencies generated by the user.
+    :ivar ReachabilityIndex reachability_index:
+        The optional reachability index. ``None`` if it is not enabled.
+    :ivar VersionIndex entity_versions:
+        The version chains of the entities by primary key.
+    :ivar VersionIndex agent_versions:
+        The version chains of the agents by primary key.
+    :ivar AttributeIndex attribute_index:
+        The indexes of the node types, names and indexed attribute values.
+    :ivar GraphHistory history:
+        The sequence numbers of the events that added the nodes and edges, and the user edits.
+    :ivar int event_sequence:
+        The sequence number of the event that is currently processed, i.e., its index in the event log.
+        ``-1`` before the first event, e.g., while a graph is imported.
+    :ivar List[UUID] node_order:
+        The node ids in the order they were added. Copies share it and read only their first nodes.
+    :ivar Dict[UUID,int] node_positions:
+        The positions of the node ids in the node order.
+    :ivar str node_numbering:
+        Identifies the node order. A rebuilt graph numbers its nodes anew and gets another one.
     """
 
     def __init__(self) -> None:
@@ -163,6 +257,15 @@ class ProvenanceGraph:
         self.hidden_nodes: Set = set()
         self.visibility_affected_nodes = {}
         self.splitted_agents_table:Dict = {}
+        self.reachability_index: ReachabilityIndex | None = None
+        self.entity_versions: VersionIndex = VersionIndex()
+        self.agent_versions: VersionIndex = VersionIndex()
+        self.attribute_index: AttributeIndex = AttributeIndex()
+        self.history: GraphHistory = GraphHistory()
+        self.event_sequence: int = -1
+        self.node_order: List[UUID] = []
+        self.node_positions: Dict[UUID, int] = {}
+        self.node_numbering: str = uuid.uuid4().hex
 
     def chain_provenance_activity(self, activity: Activity):
         """Chains an activity with the provenance graph.
@@ -197,26 +300,228 @@ class ProvenanceGraph:
             The activity.
         """
         self.node_map[activity.id] = activity
-        self.graph.add_node(activity.id, **activity.todict())
+        self._add_node(activity.id, activity.todict())
+        self.attribute_index.add_node(activity.id, "Activity", activity.name)
+        self.history.node_added(activity.id, self.event_sequence)
 
         for used_entity in activity.used_entities:
             if used_entity.id not in self.node_map:
                 self.add_entity(used_entity)
             else:
                 self.last_entities_map[used_entity.primary_key] = used_entity
-            self.graph.add_edge(activity.id, used_entity.id)
+            self._add_edge(activity.id, used_entity.id)
         for generated_entity in activity.generated_entities:
             if generated_entity.id not in self.node_map:
                 self.add_entity(generated_entity)
             else:
                 self.last_entities_map[generated_entity.primary_key] = generated_entity
-            self.graph.add_edge(generated_entity.id, activity.id)
+            self._add_edge(generated_entity.id, activity.id)
         for associated_agent in activity.associated_agents:
             if associated_agent.id not in self.node_map:
                 self.add_agent(associated_agent)
             else:
                 self.last_entities_map[associated_agent.primary_key] = associated_agent
-            self.graph.add_edge(activity.id, associated_agent.id)
+            self._add_edge(activity.id, associated_agent.id)
+
+    def _add_node(self, node_id: UUID, node_data: Dict):
+        if node_id not in self.node_positions:
+            self.node_positions[node_id] = len(self.node_order)
+            self.node_order.append(node_id)
+        self.graph.add_node(node_id, **node_data)
+
+    def _add_edge(self, source_id: UUID, target_id: UUID):
+        self.graph.add_edge(source_id, target_id)
+        self.history.edge_added((source_id, target_id), self.event_sequence)
+        if self.reachability_index is not None:
+            self.reachability_index.edge_added(source_id, target_id)
+
+    def copy(self) -> 'ProvenanceGraph':
+        """Returns a copy that is not affected by later changes of this graph, e.g., as snapshot for readers.
+
+        The graph structure, the node data, the containers, the indexes and the node objects are copied shallowly. The
+        lists and attribute dictionaries of the node objects are shared, because the provenance graph replaces them
+        instead of modifying them. The history and the node order are shared, they only grow and the copy reads them up
+        to its own event sequence and node count.
+
+        :rtype: ProvenanceGraph
+        :return: The copy.
+        """
+        nodes = {node_id: copy.copy(node) for (node_id, node) in self.node_map.items()}
+        for node in nodes.values():
+            if isinstance(node, Activity):
+                node.used_entities = [nodes.get(entity.id, entity) for entity in node.used_entities]
+                node.generated_entities = [nodes.get(entity.id, entity) for entity in node.generated_entities]
+                node.associated_agents = [nodes.get(agent.id, agent) for agent in node.associated_agents]
+        graph_copy = ProvenanceGraph()
+        graph_copy.graph = self.graph.copy()
+        graph_copy.last_entities_map = {key: nodes.get(node.id, node) for (key, node) in self.last_entities_map.items()}
+        graph_copy.last_agents_map = {key: nodes.get(node.id, node) for (key, node) in self.last_agents_map.items()}
+        graph_copy.node_map = nodes
+        graph_copy.user_generated_dependencies = set(self.user_generated_dependencies)
+        graph_copy.hidden_nodes = set(self.hidden_nodes)
+        graph_copy.visibility_affected_nodes = dict(self.visibility_affected_nodes)
+        graph_copy.splitted_agents_table = {node_id: nodes.get(node.id, node) for (node_id, node)
+                                            in self.splitted_agents_table.items()}
+        if self.reachability_index is not None:
+            graph_copy.reachability_index = self.reachability_index.copy(graph_copy.graph)
+        graph_copy.entity_versions = self.entity_versions.copy()
+        graph_copy.agent_versions = self.agent_versions.copy()
+        graph_copy.attribute_index = self.attribute_index.copy()
+        graph_copy.history = self.history
+        graph_copy.event_sequence = self.event_sequence
+        graph_copy.node_order = self.node_order
+        graph_copy.node_positions = self.node_positions
+        graph_copy.node_numbering = self.node_numbering
+        return graph_copy
+
+    def enable_reachability_index(self):
+        """Builds a :py:class:`.ReachabilityIndex` that is updated whenever an edge is added or removed."""
+        self.reachability_index = ReachabilityIndex(self.graph)
+
+    def snapshot(self, sequence: int) -> 'ProvenanceGraph':
+        """Returns the provenance graph as it was after an event was processed.
+
+        Nodes and edges are filtered by the sequence numbers of the events that added them. User edits made after the
+        event are undone, see :py:class:`.GraphHistory`. The node objects are copies with the attribute values and
+        relations of that time, so the snapshot can be exported like the provenance graph itself. Sequence numbers
+        after the event sequence of this graph, e.g., of a copy, return its state.
+
+        :param int sequence:
+            The sequence number of the event, i.e., its index in the event log.
+        :rtype: ProvenanceGraph
+        :return: The snapshot.
+        """
+        # The snapshots of a sequence number number their nodes alike, as this graph only grows.
+        node_numbering = f"{self.node_numbering}@{sequence}"
+        sequence = min(sequence, self.event_sequence)
+        state = self.history.state_at(sequence)
+        edited_attributes = self.history.edited_attributes()
+        snapshot = ProvenanceGraph()
+        snapshot.node_numbering = node_numbering
+        snapshot.event_sequence = sequence
+        node_sequences = self.history.node_sequences
+        for (node_id, node_data) in self.graph.nodes(data=True):
+            if node_sequences.get(node_id, -1) <= sequence:
+                snapshot._add_node(node_id, node_data)
+                if node_id in self.node_map:
+                    snapshot.node_map[node_id] = copy.copy(self.node_map[node_id])
+        for (node_id, attribute) in edited_attributes:
+            if node_id not in snapshot.graph:
+                continue
+            node_data = snapshot.graph.nodes[node_id]
+            node = snapshot.node_map.get(node_id, None)
+            if (node_id, attribute) in state.attribute_values:
+                value = state.attribute_values[(node_id, attribute)]
+                node_data["attributes"] = {**node_data.get("attributes", {}), attribute: value}
+                node_data[attribute] = value
+                if node is not None:
+                    node.attributes = {**node.attributes, attribute: value}
+            else:
+                # The attribute was added by a later edit.
+                node_data["attributes"] = {key: value for (key, value) in node_data.get("attributes", {}).items()
+                                           if key != attribute}
+                node_data.pop(attribute, None)
+                if node is not None:
+                    node.attributes = {key: value for (key, value) in node.attributes.items() if key != attribute}
+        edge_sequences = self.history.edge_sequences
+        for edge in self.graph.edges:
+            if state.edges.get(edge, edge_sequences.get(edge, -1) <= sequence):
+                snapshot.graph.add_edge(*edge)
+        for (edge, exists) in state.edges.items():
+            if exists and edge[0] in snapshot.graph and edge[1] in snapshot.graph:
+                snapshot.graph.add_edge(*edge)
+        for (node_id, node) in snapshot.node_map.items():
+            if isinstance(node, Activity):
+                successors = [snapshot.node_map[successor] for successor in snapshot.graph.successors(node_id)
+                              if successor in snapshot.node_map]
+                predecessors = [snapshot.node_map[predecessor] for predecessor in snapshot.graph.predecessors(node_id)
+                                if predecessor in snapshot.node_map]
+                node.used_entities = _related_nodes(node.used_entities, successors, Entity)
+                node.associated_agents = _related_nodes(node.associated_agents, successors, Agent)
+                node.generated_entities = _related_nodes(node.generated_entities, predecessors, Entity)
+        snapshot.user_generated_dependencies = {edge for edge in self.user_generated_dependencies | state.edges.keys()
+                                                if snapshot.graph.has_edge(*edge)}
+        snapshot.hidden_nodes = {node_id for node_id in state.hidden_nodes if node_id in snapshot.graph}
+        return snapshot
+
+    def configure_attribute_index(self, indexed_attributes: Dict[str, List[str]]):
+        """Sets the indexed attributes and rebuilds the attribute index if they have changed.
+
+        :param Dict[str,List[str]] indexed_attributes:
+            A mapping from entity and agent names to their indexed attributes,
+            see :py:meth:`.SpecificationManager.indexed_attributes`.
+        """
+        attribute_index = AttributeIndex(indexed_attributes)
+        if attribute_index.indexed_attributes == self.attribute_index.indexed_attributes:
+            return
+        for node in self.node_map.values():
+            attribute_index.add_node(node.id, type(node).__name__, node.name, getattr(node, "attributes", None))
+        self.attribute_index = attribute_index
+
+    def query(self, node_type: str = None, name: str = None, equals: Dict[str, object] = None,
+              prefixes: Dict[str, str] = None) -> List[UUID]:
+        """Finds the nodes matching all given filters using the attribute index.
+
+        Attribute filters only match entities and agents whose specifications mark the attribute as indexed.
+
+        :param str, optional node_type:
+            The node type, i.e., "Entity", "Agent" or "Activity".
+        :param str, optional name:
+            The name of the nodes, e.g., "Simulation Model".
+        :param Dict[str,object], optional equals:
+            A mapping from attribute names to the values they have to equal.
+        :param Dict[str,str], optional prefixes:
+            A mapping from attribute names to prefixes their values have to start with, e.g., a directory.
+        :rtype: List[UUID]
+        :return: The ids of the matching nodes.
+        :raises KeyError: If an attribute is not indexed, or not indexed for the given name.
+        """
+        for attribute in {**(equals or {}), **(prefixes or {})}:
+            if name is not None and not self.attribute_index.is_indexed(name, attribute):
+                raise KeyError(f"Attribute \"{attribute}\" of \"{name}\" is not indexed.")
+        candidates = []
+        if node_type is not None:
+            candidates.append(self.attribute_index.types.get(node_type, {}))
+        if name is not None:
+            candidates.append(self.attribute_index.names.get(name, {}))
+        for (attribute, value) in (equals or {}).items():
+            candidates.append(self.attribute_index.equal(attribute, value))
+        for (attribute, prefix) in (prefixes or {}).items():
+            candidates.append(self.attribute_index.prefixed(attribute, prefix))
+        if not candidates:
+            return list(self.node_map)
+        candidates.sort(key=len)
+        return [node_id for node_id in candidates[0] if all(node_id in candidate for candidate in candidates[1:])]
+
+    def version_index(self, node_id: UUID) -> VersionIndex:
+        """Returns the version index containing an entity or agent.
+
+        :param UUID node_id:
+            The id of the entity or agent.
+        :rtype: VersionIndex
+        :return: The version index.
+        :raises KeyError: If the node is neither an indexed entity nor an indexed agent.
+        """
+        for version_index in (self.entity_versions, self.agent_versions):
+            if node_id in version_index:
+                return version_index
+        raise KeyError(node_id)
+
+    def is_derived_from(self, node_id: UUID, ancestor_id: UUID) -> bool:
+        """Checks whether a node was derived from another node, e.g., whether a model version influenced a result.
+
+        Uses the reachability index if it is enabled and traverses the graph otherwise.
+
+        :param UUID node_id:
+            The id of the node.
+        :param UUID ancestor_id:
+            The id of the potential ancestor.
+        :rtype: bool
+        :return: `True` if there is a path from the node to the ancestor, `False` otherwise
+        """
+        if self.reachability_index is not None:
+            return self.reachability_index.reaches(node_id, ancestor_id)
+        return has_path(self.graph, node_id, ancestor_id)
 
     def add_entity(self, entity: Entity):
         """Adds an entitiy to the provenacne graph.
@@ -225,8 +530,11 @@ class ProvenanceGraph:
             The entity.
         """
         self.last_entities_map[entity.primary_key] = entity
+        self.entity_versions.add(entity.primary_key, entity.id, self.event_sequence)
         self.node_map[entity.id] = entity
-        self.graph.add_node(entity.id, **entity.todict())
+        self._add_node(entity.id, entity.todict())
+        self.attribute_index.add_node(entity.id, "Entity", entity.name, entity.attributes)
+        self.history.node_added(entity.id, self.event_sequence)
 
     def add_agent(self, agent: Agent):
         """Adds an agent to the provenacne graph.
@@ -235,8 +543,11 @@ class ProvenanceGraph:
             The entity.
         """
         self.last_agents_map[agent.primary_key] = agent
+        self.agent_versions.add(agent.primary_key, agent.id, self.event_sequence)
         self.node_map[agent.id] = agent
-        self.graph.add_node(agent.id, **agent.todict())
+        self._add_node(agent.id, agent.todict())
+        self.attribute_index.add_node(agent.id, "Agent", agent.name, agent.attributes)
+        self.history.node_added(agent.id, self.event_sequence)
 
     @property
     def entities(self) -> List[Entity]:
@@ -269,7 +580,13 @@ class ProvenanceGraph:
         """
         node: Entity = self.node_map[entity_id]
         for (changed_attribute, value) in changes.items():
-            node.attributes[changed_attribute] = value
+            if self.attribute_index.is_indexed(node.name, changed_attribute):
+                self.attribute_index.remove_value(entity_id, changed_attribute,
+                                                  node.attributes.get(changed_attribute, None))
+                self.attribute_index.add_value(entity_id, changed_attribute, value)
+            self.history.record(self.event_sequence, "attribute", (entity_id, changed_attribute),
+                                node.attributes.get(changed_attribute, MISSING), value)
+            node.attributes = {**node.attributes, changed_attribute: value}
             set_node_attributes(self.graph, {entity_id: value}, changed_attribute)
             self.graph.nodes[entity_id][changed_attribute] = value
 
@@ -288,19 +605,22 @@ class ProvenanceGraph:
             if dependency.get("user-generated", False):
                 self.add_dependency(from_uuid, to_uuid)
                 self.user_generated_dependencies.add((from_uuid, to_uuid))
-                self.graph.add_edge(from_uuid, to_uuid)
+                self.history.record(self.event_sequence, "edge", (from_uuid, to_uuid),
+                                    self.graph.has_edge(from_uuid, to_uuid), True)
+                self._add_edge(from_uuid, to_uuid)
                 if activity_id == from_uuid:
-                    node.user_generated_edges.append(to_uuid)
+                    node.user_generated_edges = node.user_generated_edges + [to_uuid]
                 else:
-                    node.user_generated_edges.append(from_uuid)
+                    node.user_generated_edges = node.user_generated_edges + [from_uuid]
             if dependency.get("user-removed", False):
                 self.remove_dependency(from_uuid, to_uuid)
                 self.user_generated_dependencies.remove((from_uuid, to_uuid))
                 self.graph.remove_edge(from_uuid, to_uuid)
-                if activity_id == from_uuid:
-                    node.user_generated_edges.remove(to_uuid)
-                else:
-                    node.user_generated_edges.remove(from_uuid)
+                self.history.record(self.event_sequence, "edge", (from_uuid, to_uuid), True, False)
+                if self.reachability_index is not None:
+                    self.reachability_index.edge_removed(from_uuid, to_uuid)
+                removed_id = to_uuid if activity_id == from_uuid else from_uuid
+                node.user_generated_edges = [node_id for node_id in node.user_generated_edges if node_id != removed_id]
 
     def add_dependency(self, source_node_id: UUID, target_node_id: UUID):
         """Adds a depdency between two nodes.
@@ -315,10 +635,10 @@ class ProvenanceGraph:
 
         if isinstance(from_node, Activity) and isinstance(to_node, Entity):
             if to_node not in from_node.used_entities:
-                from_node.used_entities.append(to_node)
+                from_node.used_entities = from_node.used_entities + [to_node]
         if isinstance(from_node, Entity) and isinstance(to_node, Activity):
             if from_node not in to_node.generated_entities:
-                to_node.generated_entities.append(from_node)
+                to_node.generated_entities = to_node.generated_entities + [from_node]
 
     def remove_dependency(self, source_node_id: UUID, target_node_id: UUID):
         """Removes a depdency between two nodes.
@@ -332,24 +652,37 @@ class ProvenanceGraph:
         to_node = self.node_map[target_node_id]
 
         if isinstance(from_node, Activity) and isinstance(to_node, Entity):
-            from_node.used_entities.remove(to_node)
+            used_entities = list(from_node.used_entities)
+            used_entities.remove(to_node)
+            from_node.used_entities = used_entities
         if isinstance(from_node, Entity) and isinstance(to_node, Activity):
-            to_node.generated_entities.remove(from_node)
+            generated_entities = list(to_node.generated_entities)
+            generated_entities.remove(from_node)
+            to_node.generated_entities = generated_entities
 
-    def cytoscape_data(self) -> List[Dict]:
+    def cytoscape_data(self, node_ids: Iterable[UUID] = None, edges: Iterable[Tuple[UUID, UUID]] = None,
+                       fields: Iterable[str] = None) -> List[Dict]:
         """Returns the provenance graph for Cytoscape.
 
+        :param Iterable[UUID], optional node_ids:
+            The ids of the nodes to include. All nodes if ``None``.
+        :param Iterable[Tuple[UUID,UUID]], optional edges:
+            The edges to include. All edges if ``None``.
+        :param Iterable[str], optional fields:
+            The node data fields to include, e.g., only the fields needed to display the nodes. All fields if ``None``.
         :rtype: List[Dict]
         :returns: Cytoscape-Representation of the graph.
         """
         elements = []
-        for node in self.graph.nodes:
+        for node in (self.graph.nodes if node_ids is None else node_ids):
             node_data = self.graph.nodes[node]
             node_data["hidden"] = True if node in self.hidden_nodes else False
+            if fields is not None:
+                node_data = {field: node_data[field] for field in fields if field in node_data}
             node_element = {"group": "nodes", "data": node_data}
             elements.append(node_element)
 
-        for (source_id, target_id) in self.graph.edges:
+        for (source_id, target_id) in (self.graph.edges if edges is None else edges):
             was_user_generated = True if (source_id, target_id) in self.user_generated_dependencies else False
             edge_data = {"source": source_id, "target": target_id,
                          "user-generated": was_user_generated}
@@ -357,6 +690,71 @@ class ProvenanceGraph:
             elements.append(edge_element)
         return elements
 
+    def neighborhood(self, node_id: UUID, direction: str = "both", depth: int = None) -> List[UUID]:
+        """Returns the ids of a node and its ancestors and/or descendants.
+
+        Ancestors are the nodes the node was derived from, i.e., the nodes reachable along the edges.
+        Descendants are the nodes that were derived from the node.
+        Only the visited nodes are traversed, so the costs depend on the size of the result and not of the graph.
+
+        :param UUID node_id:
+            The id of the node.
+        :param str direction:
+            `up` for the ancestors, `down` for the descendants, or `both`.
+        :param int, optional depth:
+            The maximal number of edges between the node and the returned nodes. Unlimited if ``None``.
+        :rtype: List[UUID]
+        :return: The node ids in breadth-first order, starting with the node.
+        :raises ValueError: If the direction is unknown.
+        """
+        if direction not in ("up", "down", "both"):
+            raise ValueError(f"Unknown direction \"{direction}\". Use \"up\", \"down\" or \"both\".")
+        node_ids = [node_id]
+        if direction in ("up", "both"):
+            node_ids += self._traverse(node_id, self.graph.successors, depth)[1:]
+        if direction in ("down", "both"):
+            node_ids += self._traverse(node_id, self.graph.predecessors, depth)[1:]
+        return list(dict.fromkeys(node_ids))
+
+    def lineage(self, node_id: UUID, since: UUID = None, depth: int = None) -> List[UUID]:
+        """Returns the ids of a node and its ancestors.
+
+        :param UUID node_id:
+            The id of the node.
+        :param UUID, optional since:
+            The id of an ancestor, e.g., an earlier version of an entity. If given, only the ancestors that were derived
+            from it, and the ancestor itself, are returned.
+        :param int, optional depth:
+            The maximal number of edges between the node and the returned nodes. Unlimited if ``None``.
+        :rtype: List[UUID]
+        :return: The node ids in breadth-first order, starting with the node.
+        :raises ValueError: If `since` is not an ancestor of the node.
+        """
+        ancestors = self._traverse(node_id, self.graph.successors, depth)
+        if since is None:
+            return ancestors
+        ancestor_set = set(ancestors)
+        if since not in ancestor_set:
+            raise ValueError(f"Node {since} is not an ancestor of node {node_id}.")
+        derived_from_since = set(self._traverse(since, lambda node: (predecessor for predecessor in
+                                                                     self.graph.predecessors(node)
+                                                                     if predecessor in ancestor_set)))
+        return [ancestor for ancestor in ancestors if ancestor in derived_from_since]
+
+    @staticmethod
+    def _traverse(node_id: UUID, neighbors, depth: int = None) -> List[UUID]:
+        distances = {node_id: 0}
+        queue = deque([node_id])
+        while queue:
+            node = queue.popleft()
+            if depth is not None and distances[node] >= depth:
+                continue
+            for neighbor in neighbors(node):
+                if neighbor not in distances:
+                    distances[neighbor] = distances[node] + 1
+                    queue.append(neighbor)
+        return list(distances)
+
     def node_data(self, node_id: UUID) -> dict:
         """ Returns the data of a node.
 
@@ -428,16 +826,20 @@ class ProvenanceGraph:
         """
         if hide_node:
             affected_nodes = self._find_nodes_to_hide(node_id)
+            newly_hidden_nodes = {node for node in affected_nodes if node not in self.hidden_nodes}
             for node in affected_nodes:
                 self.hidden_nodes.add(node)
             self.visibility_affected_nodes[node_id] = affected_nodes
+            self.history.record(self.event_sequence, "hide", None, set(), newly_hidden_nodes)
         else:
             affected_nodes = self.visibility_affected_nodes.get(node_id, []) \
                              + list(self.graph.successors(node_id)) \
                              + [node_id] \
                              + list(self.graph.predecessors(node_id))
-            for node in filter(lambda candidate: candidate in self.hidden_nodes, affected_nodes):
+            unhidden_nodes = set(filter(lambda candidate: candidate in self.hidden_nodes, affected_nodes))
+            for node in unhidden_nodes:
                 self.hidden_nodes.remove(node)
+            self.history.record(self.event_sequence, "hide", None, unhidden_nodes, set())
             if node_id in self.visibility_affected_nodes:
                 del self.visibility_affected_nodes[node_id]
 
@@ -0,0 +1,138 @@
+from collections import deque
+from typing import Dict, Iterable, List
+from uuid import UUID
+
+from networkx import DiGraph, NetworkXUnfeasible, topological_sort
+
+
+class ReachabilityIndex:
+    """Represents an index answering whether a node of a provenance graph was derived from another node.
+
+    For every node the set of nodes reachable along the edges, i.e., its ancestors, is stored as a bitset.
+    Every node is assigned a bit the first time it is connected to another node. Reachability queries test a single bit.
+    When an edge is added, the bitsets of the source and its descendants are extended. When an edge is removed, only
+    these bitsets are recomputed.
+    The bitsets need up to one bit per pair of nodes, so the index is intended for graphs of up to some ten thousand
+    nodes.
+
+    :ivar DiGraph graph:
+        The indexed graph. The index must be notified about every added and removed edge.
+    :ivar Dict[UUID,int] positions:
+        The bit position of every indexed node.
+    :ivar Dict[UUID,int] ancestor_bits:
+        The bitset of the ancestors of every indexed node.
+    """
+
+    def __init__(self, graph: DiGraph) -> None:
+        self.graph: DiGraph = graph
+        self.positions: Dict[UUID, int] = {}
+        self.ancestor_bits: Dict[UUID, int] = {}
+        self.rebuild()
+
+    def copy(self, graph: DiGraph) -> 'ReachabilityIndex':
+        """Returns a copy of the index for a copy of the indexed graph.
+
+        :param DiGraph graph: The copy of the indexed graph.
+        :rtype: ReachabilityIndex
+        """
+        index_copy = ReachabilityIndex.__new__(ReachabilityIndex)
+        index_copy.graph = graph
+        index_copy.positions = dict(self.positions)
+        index_copy.ancestor_bits = dict(self.ancestor_bits)
+        return index_copy
+
+    def rebuild(self):
+        """Rebuilds the index from the graph."""
+        self.positions = {}
+        self.ancestor_bits = {}
+        for (source_id, target_id) in self.graph.edges:
+            self._bit(source_id)
+            self._bit(target_id)
+        self._recompute(list(self.positions))
+
+    def _bit(self, node_id: UUID) -> int:
+        position = self.positions.get(node_id)
+        if position is None:
+            position = self.positions[node_id] = len(self.positions)
+            self.ancestor_bits[node_id] = 0
+        return 1 << position
+
+    def _descendants_and_self(self, node_id: UUID) -> List[UUID]:
+        return [node_id, *self.descendants(node_id)]
+
+    def _recompute(self, node_ids: List[UUID]):
+        # Ancestors have to be computed before their descendants. Nodes whose successors are not recomputed keep
+        # valid bitsets. If a cycle prevents a topological order, the bitsets are iterated until they are stable.
+        subgraph = self.graph.subgraph(node_ids)
+        try:
+            order = list(reversed(list(topological_sort(subgraph))))
+            single_pass = True
+        except NetworkXUnfeasible:
+            order = node_ids
+            single_pass = False
+        for node_id in order:
+            self.ancestor_bits[node_id] = 0
+        changed = True
+        while changed:
+            changed = False
+            for node_id in order:
+                bits = 0
+                for successor in self.graph.successors(node_id):
+                    bits |= self._bit(successor) | self.ancestor_bits[successor]
+                if bits != self.ancestor_bits[node_id]:
+                    self.ancestor_bits[node_id] = bits
+                    changed = not single_pass
+
+    def edge_added(self, source_id: UUID, target_id: UUID):
+        """Updates the index after an edge was added to the graph.
+
+        :param UUID source_id: The source of the edge.
+        :param UUID target_id: The target of the edge.
+        """
+        self._bit(source_id)
+        target_bits = self._bit(target_id)
+        target_bits |= self.ancestor_bits[target_id]
+        if self.ancestor_bits[source_id] & target_bits == target_bits:
+            return
+        for node_id in self._descendants_and_self(source_id):
+            self._bit(node_id)
+            self.ancestor_bits[node_id] |= target_bits
+
+    def edge_removed(self, source_id: UUID, target_id: UUID):
+        """Updates the index after an edge was removed from the graph.
+
+        :param UUID source_id: The source of the edge.
+        :param UUID target_id: The target of the edge.
+        """
+        self._recompute(self._descendants_and_self(source_id))
+
+    def reaches(self, node_id: UUID, ancestor_id: UUID) -> bool:
+        """Checks whether a node was derived from another node, i.e., whether there is a path between them.
+
+        :param UUID node_id: The id of the node.
+        :param UUID ancestor_id: The id of the potential ancestor.
+        :rtype: bool
+        :return: `True` if the node is reachable, `False` otherwise
+        """
+        if node_id == ancestor_id:
+            return True
+        position = self.positions.get(ancestor_id)
+        return position is not None and bool(self.ancestor_bits.get(node_id, 0) >> position & 1)
+
+    def descendants(self, node_id: UUID) -> Iterable[UUID]:
+        """Generates the nodes derived from a node.
+
+        Only the descendants and the edges between them are visited.
+
+        :param UUID node_id: The id of the node.
+        :rtype: Iterable[UUID]
+        :return: The ids of the descendants in breadth-first order.
+        """
+        visited = {node_id}
+        queue = deque([node_id])
+        while queue:
+            for predecessor in self.graph.predecessors(queue.popleft()):
+                if predecessor not in visited:
+                    visited.add(predecessor)
+                    queue.append(predecessor)
+                    yield predecessor
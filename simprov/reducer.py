@@ -1,12 +1,11 @@
 from collections import defaultdict
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from pathlib import Path
 from typing import List
 from uuid import uuid4, UUID
 
 import networkx
 from networkx import DiGraph, set_node_attributes, bfs_tree
-from pygraphviz import AGraph
 
 from simprov import Entity
 from simprov.provenance import ProvenanceGraph, Activity
@@ -73,6 +72,7 @@ class GraphReducer:
         from networkx import draw_networkx_nodes, draw_networkx_edges, draw_networkx
         from networkx.drawing.nx_agraph import graphviz_layout
         import matplotlib.pyplot as plt
+        from pygraphviz import AGraph
 
         dot_graph = AGraph(directed=True)
         dot_graph.graph_attr["rankdir"] = "RL"
@@ -172,8 +172,8 @@ class GraphReducer:
         for node in [node for node in reduced_graph.nodes if reduced_graph.nodes[node]["type"] == "Activity"]:
             node_data = reduced_graph.nodes[node]
             node_activity = node_data["name"]
-            activity = Activity(node_activity)
-            activity.id = node_data["context_id"]
+            # The id is passed, so reading a reduced graph draws no ids from the generator of node ids.
+            activity = Activity(node_activity, id=node_data["context_id"])
             if hide_nodes and activity.id in self.provenance_graph.hidden_nodes:
                 continue
             for pred in reduced_graph.predecessors(node):
@@ -186,7 +186,9 @@ class GraphReducer:
                 if isinstance(succ_node, Entity):
                     activity.used_entities.append(succ_node)
                 else:
-                    succ_node.id = succ
+                    # Split agents are copies, the agents of the input graph are shared with other readers.
+                    if succ_node.id != succ:
+                        succ_node = replace(succ_node, id=succ)
                     activity.associated_agents.append(succ_node)
             reduced_provenance_graph.add_activity(activity)
         return reduced_provenance_graph
@@ -0,0 +1,150 @@
+import traceback
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from threading import Event, Thread
+from typing import Dict, Set, TYPE_CHECKING
+
+from simprov.rule_engine import RuleEngine
+from simprov.specifications import SpecificationManager
+
+if TYPE_CHECKING:
+    from simprov.core import SimProv
+
+
+@dataclass
+class ReloadChanges:
+    """Represents the differences between the loaded and the reloaded rules and specifications.
+
+    :ivar Set[str] changed_event_types:
+        The event types whose rules were added, removed or changed.
+    :ivar Set[str] changed_entity_names:
+        The entity names whose specifications were added, removed or changed apart from their style.
+    :ivar Set[str] changed_activity_names:
+        The activity names whose specifications were added, removed or changed.
+    :ivar Set[str] changed_agent_names:
+        The agent names whose specifications were added, removed or changed apart from their style.
+    :ivar Set[str] restyled_entity_names:
+        The entity names whose specifications only differ in their style.
+    :ivar Set[str] restyled_agent_names:
+        The agent names whose specifications only differ in their style.
+    """
+    changed_event_types: Set[str] = field(default_factory=set)
+    changed_entity_names: Set[str] = field(default_factory=set)
+    changed_activity_names: Set[str] = field(default_factory=set)
+    changed_agent_names: Set[str] = field(default_factory=set)
+    restyled_entity_names: Set[str] = field(default_factory=set)
+    restyled_agent_names: Set[str] = field(default_factory=set)
+
+    @property
+    def is_empty(self) -> bool:
+        """`True` if nothing has changed."""
+        return not (self.changed_event_types or self.changed_entity_names or self.changed_activity_names
+                    or self.changed_agent_names or self.restyled_entity_names or self.restyled_agent_names)
+
+    @property
+    def requires_reprocessing(self) -> bool:
+        """`True` if the changes may change the activities extracted from already processed events."""
+        return bool(self.changed_event_types or self.changed_entity_names or self.changed_activity_names
+                    or self.changed_agent_names)
+
+
+def diff_rules(old_engine: RuleEngine, new_engine: RuleEngine) -> Set[str]:
+    """Computes the event types whose rules differ between two rule engines.
+
+    :param RuleEngine old_engine:
+        The currently used rule engine.
+    :param RuleEngine new_engine:
+        The reloaded rule engine.
+    :rtype: Set[str]
+    :return: The event types of added, removed and changed rules.
+    """
+    changed_event_types = set()
+    for event_type in old_engine.rule_table.keys() | new_engine.rule_table.keys():
+        old_rule = old_engine.rule_table.get(event_type, None)
+        new_rule = new_engine.rule_table.get(event_type, None)
+        if old_rule is None or new_rule is None or old_rule.fingerprint != new_rule.fingerprint \
+                or old_rule.memoize != new_rule.memoize:
+            changed_event_types.add(event_type)
+    return changed_event_types
+
+
+def _without_index(spec):
+    # The indexed attributes only affect the attribute index, which is rebuilt separately.
+    if spec is None or not hasattr(spec, "indexed_attributes"):
+        return spec
+    return replace(spec, indexed_attributes=[])
+
+
+def _diff_specification_maps(old_map: Dict, new_map: Dict, changed: Set[str], restyled: Set[str] = None):
+    for name in old_map.keys() | new_map.keys():
+        old_spec = _without_index(old_map.get(name, None))
+        new_spec = _without_index(new_map.get(name, None))
+        if old_spec == new_spec:
+            continue
+        if restyled is not None and old_spec is not None and new_spec is not None \
+                and replace(old_spec, style_info={}) == replace(new_spec, style_info={}):
+            restyled.add(name)
+        else:
+            changed.add(name)
+
+
+def diff_reload(old_engine: RuleEngine, old_manager: SpecificationManager, new_engine: RuleEngine,
+                new_manager: SpecificationManager) -> ReloadChanges:
+    """Computes the differences between the loaded and the reloaded rules and specifications.
+
+    :rtype: ReloadChanges
+    :return: The changes.
+    """
+    changes = ReloadChanges()
+    changes.changed_event_types = diff_rules(old_engine, new_engine)
+    _diff_specification_maps(old_manager.entity_specifications, new_manager.entity_specifications,
+                             changes.changed_entity_names, changes.restyled_entity_names)
+    _diff_specification_maps(old_manager.agent_specifications, new_manager.agent_specifications,
+                             changes.changed_agent_names, changes.restyled_agent_names)
+    _diff_specification_maps(old_manager.activity_specifications, new_manager.activity_specifications,
+                             changes.changed_activity_names)
+    return changes
+
+
+class ReloadWatcher(Thread):
+    """Watches the rule and specification files and reloads them when they are modified.
+
+    The files are polled for a changed modification time. Failed reloads are reported and the previously loaded rules
+    and specifications stay in place.
+
+    :param SimProv simprov:
+        The SimProv instance to reload.
+    :param float interval:
+        The polling interval in seconds.
+    """
+
+    def __init__(self, simprov: 'SimProv', interval: float = 1.0) -> None:
+        super().__init__(name="simprov-reload-watcher", daemon=True)
+        self.simprov: 'SimProv' = simprov
+        self.interval: float = interval
+        self.stopped: Event = Event()
+        self.modification_times = self._modification_times()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            modification_times = self._modification_times()
+            if modification_times == self.modification_times:
+                continue
+            self.modification_times = modification_times
+            try:
+                self.simprov.reload_rules_and_specifications()
+            except Exception:
+                traceback.print_exc()
+
+    def stop(self):
+        """Stops watching the files."""
+        self.stopped.set()
+
+    def _modification_times(self):
+        times = []
+        for path in (self.simprov.rule_path, self.simprov.specifications_path):
+            try:
+                times.append(Path(path).stat().st_mtime_ns)
+            except OSError:
+                times.append(None)
+        return tuple(times)
@@ -1,12 +1,20 @@
-from dataclasses import dataclass
+import hashlib
+from dataclasses import dataclass, field
 from importlib.util import spec_from_file_location, module_from_spec
 from pathlib import Path
-from typing import Callable, Dict, Union
+from threading import RLock
+from types import CodeType, FunctionType
+from typing import Callable, Dict, Union, TYPE_CHECKING
 
 from simprov import Activity
 from simprov.exceptions import InvalidRuleSpecificationException, InvalidRuleResultException, NoRuleFoundException
 
+if TYPE_CHECKING:
+    from simprov.specifications import SpecificationManager
+
 ENGINE = None
+_LOADING_LOCK = RLock()
+_SHARED_RULE_TABLES: Dict[str, Dict[str, 'Rule']] = {}
 
 
 @dataclass
@@ -17,20 +25,30 @@ class Rule:
         The name of the event for which the rule should be executed.
     :ivar Callable func:
         The function that extracts the activity.
+    :ivar bool memoize:
+        If `True` repeated content-identical events of the rule may be skipped, see :py:class:`.EventDeduplicator`.
+    :ivar str fingerprint:
+        A hash of the code of the rule and the module functions it calls. It is set when the rules are loaded and is
+        used to detect changed rules on reload.
     """
     event_type: str
     func: Callable
+    memoize: bool = True
+    fingerprint: str = field(default=None, compare=False)
 
 
-def rule(event_type:str):
+def rule(event_type:str, memoize: bool = True):
     """
     The decorator that shall be used to mark a python function as a rule for SimProv
 
     :param str event_type:
         The name of the event
+    :param bool memoize:
+        Set to `False` if the rule does not only depend on the event, e.g., because it reads files. Its repeated events
+        are then never skipped by the deduplication.
     """
     def _inner(func):
-        rule = Rule(event_type, func)
+        rule = Rule(event_type, func, memoize)
         ENGINE.register_rule(rule)
         return func
 
@@ -42,16 +60,21 @@ class RuleEngine:
 
     :param Union[str, Path], optional rule_path:
         When provided the rules are loaded from the file.
+    :param SpecificationManager, optional specification_manager:
+        When provided declarative rules are validated against the specifications while loading.
+    :param bool shared:
+        If true Python rule files are executed only once per content and process, see :py:meth:`load_rules`.
 
     :ivar Dict[str,Rule] rule_table:
         A lookup table from an event type to its corresponding rule
     """
 
-    def __init__(self, rule_path: Union[str, Path] = None):
+    def __init__(self, rule_path: Union[str, Path] = None, specification_manager: 'SpecificationManager' = None,
+                 shared: bool = False):
         super().__init__()
         self.rule_table: Dict[str, Rule] = {}
         if rule_path:
-            self.load_rules(rule_path)
+            self.load_rules(rule_path, specification_manager, shared)
 
     def register_rule(self, rule: Rule):
         """ Registers a new rule.
@@ -65,22 +88,51 @@ class RuleEngine:
             raise InvalidRuleSpecificationException(f"Rule for event type \"{rule.event_type}\" already exists.")
         self.rule_table[rule.event_type] = rule
 
-    def load_rules(self, file_path: Union[str, Path]):
+    def load_rules(self, file_path: Union[str, Path], specification_manager: 'SpecificationManager' = None,
+                   shared: bool = False):
         """ Loads all rules from a given file.
 
+        Python files are executed and their functions decorated with :py:func:`rule` are registered.
+        YAML files contain declarative rules that are compiled into rule functions
+        (see :py:func:`~simprov.declarative_rules.load_declarative_rules`).
+
+        The rules are collected in a staging table that replaces the rule table only if the whole file could be
+        loaded. Loading is serialized, so rules of concurrent loads never end up in the wrong engine.
+
         :param Union[str, Path] file_path:
             The file path.
+        :param SpecificationManager, optional specification_manager:
+            When provided declarative rules are validated against the specifications.
+        :param bool shared:
+            If true a Python file is executed only once per content and process, and all engines loading a file with
+            the same content share its rules, e.g., the studies of a :py:class:`.StudyHost`.
         """
+        staging_engine = RuleEngine()
+        if Path(file_path).suffix in (".yaml", ".yml"):
+            from simprov.declarative_rules import load_declarative_rules
+            for declarative_rule in load_declarative_rules(file_path, specification_manager):
+                staging_engine.register_rule(declarative_rule)
+        elif shared:
+            staging_engine.rule_table = dict(_shared_rule_table(file_path))
+        else:
+            staging_engine._execute_rule_module(file_path)
+        for loaded_rule in staging_engine.rule_table.values():
+            loaded_rule.fingerprint = _rule_fingerprint(loaded_rule.func)
+        self.rule_table = staging_engine.rule_table
+
+    def _execute_rule_module(self, file_path: Union[str, Path]):
         global ENGINE
-        ENGINE = self
-        self.rule_table.clear()
-        spec = spec_from_file_location("my.rules", file_path)
-        module = module_from_spec(spec)
-        spec.loader.exec_module(module)
-        ENGINE = None
+        with _LOADING_LOCK:
+            ENGINE = self
+            try:
+                spec = spec_from_file_location("my.rules", file_path)
+                module = module_from_spec(spec)
+                spec.loader.exec_module(module)
+            finally:
+                ENGINE = None
 
     def execute_rule(self, event: Dict) -> Activity:
-        """Executes the rule that corresponds to the event type to extract the activity..
+        """Executes the rule that corresponds to the event type to extract the activity.
 
         :param Dict event:
             The event.
@@ -94,7 +146,46 @@ class RuleEngine:
         processing_rule = self.rule_table.get(event["type"], None)
         if processing_rule is None:
             raise NoRuleFoundException(f"Can't find rule for event: {event}")
+        return self._run_rule(processing_rule, event)
+
+    @staticmethod
+    def _run_rule(processing_rule: Rule, event: Dict) -> Activity:
         rule_result = processing_rule.func(event)
         if not isinstance(rule_result, Activity):
             raise InvalidRuleResultException(f"Rule has to return an activity")
         return rule_result
+
+
+def _shared_rule_table(file_path: Union[str, Path]) -> Dict[str, Rule]:
+    digest = hashlib.blake2b(Path(file_path).read_bytes(), digest_size=16).hexdigest()
+    with _LOADING_LOCK:
+        rule_table = _SHARED_RULE_TABLES.get(digest, None)
+        if rule_table is None:
+            engine = RuleEngine()
+            engine._execute_rule_module(file_path)
+            rule_table = _SHARED_RULE_TABLES[digest] = engine.rule_table
+    return rule_table
+
+
+def _rule_fingerprint(func: Callable) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    _update_code_digest(digest, func.__code__, func.__globals__, set())
+    return digest.hexdigest()
+
+
+def _update_code_digest(digest, code: CodeType, module_globals: Dict, seen: set):
+    if code in seen:
+        return
+    seen.add(code)
+    digest.update(code.co_code)
+    digest.update(repr((code.co_names, code.co_varnames, code.co_freevars)).encode("utf-8"))
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            _update_code_digest(digest, const, module_globals, seen)
+        else:
+            digest.update(repr(const).encode("utf-8"))
+    for name in code.co_names:
+        helper = module_globals.get(name, None)
+        if isinstance(helper, FunctionType) and helper.__globals__ is module_globals:
+            _update_code_digest(digest, helper.__code__, module_globals, seen)
+
@@ -1,8 +1,10 @@
+import hashlib
 from collections import Counter
+from copy import deepcopy
 from dataclasses import dataclass, field
 from enum import Enum
 from pathlib import Path
-from typing import Dict, Union
+from typing import Dict, List, Union
 from warnings import warn
 
 from simprov import Entity, Activity, Agent
@@ -12,6 +14,9 @@ from simprov.exceptions import InvalidEntitySpecificationException, EntitySpecif
     InvalidSpecificationException, AgentSpecificationNotFoundException
 
 
+_SHARED_YAML_CONTENTS: Dict[str, object] = {}
+
+
 def _read_yaml_file(file_path):
     import yaml
     with open(file_path, "r") as file_handler:
@@ -19,6 +24,13 @@ def _read_yaml_file(file_path):
         return yaml_content
 
 
+def _read_shared_yaml_file(file_path):
+    digest = hashlib.blake2b(Path(file_path).read_bytes(), digest_size=16).hexdigest()
+    if digest not in _SHARED_YAML_CONTENTS:
+        _SHARED_YAML_CONTENTS[digest] = _read_yaml_file(file_path)
+    return deepcopy(_SHARED_YAML_CONTENTS[digest])
+
+
 @dataclass
 class EntitySpecification:
     """Represents a specification of an entity.
@@ -39,12 +51,16 @@ class EntitySpecification:
     :ivar Dict style_info:
         Holds the style information extracted from the specification file.
         It can be used to store information about how an entity should be rendered in the webview.
+
+    :ivar List[str] indexed_attributes:
+        A list of attributes for which the provenance graph maintains value indexes.
     """
     name: str
     required_attributes: list = field(default_factory=list)
     attributes: list = field(default_factory=list)
     primary_key_attributes: list = field(default_factory=list)
     style_info: dict = field(default_factory=dict)
+    indexed_attributes: list = field(default_factory=list)
 
 
 @dataclass
@@ -67,12 +83,16 @@ class AgentSpecification:
     :ivar Dict style_info:
         Holds the style information extracted from the specification file.
         It can be used to store information about how an agent should be rendered in the webview.
+
+    :ivar List[str] indexed_attributes:
+        A list of attributes for which the provenance graph maintains value indexes.
     """
     name: str
     required_attributes: list = field(default_factory=list)
     attributes: list = field(default_factory=list)
     primary_key_attributes: list = field(default_factory=list)
     style_info: dict = field(default_factory=dict)
+    indexed_attributes: list = field(default_factory=list)
 
 
 class OccurenceModifier(Enum):
@@ -123,13 +143,13 @@ class SpecificationManager:
         A mapping from activity names to their corresponding specifications.
    """
 
-    def __init__(self, specification_path: Union[str, Path] = None):
+    def __init__(self, specification_path: Union[str, Path] = None, shared: bool = False):
         super().__init__()
         self.entity_specifications: Dict[str, EntitySpecification] = {}
         self.activity_specifications: Dict[str, ActivitySpecification] = {}
         self.agent_specifications: Dict[str, AgentSpecification] = {}
         if specification_path:
-            self.load_specification_file(specification_path)
+            self.load_specification_file(specification_path, shared)
 
     def get_entity_specification(self, entity_name: str) -> EntitySpecification:
         """ Gets the entity specification for an entity name.
@@ -332,16 +352,18 @@ class SpecificationManager:
         provenance_pattern = self._build_activity_specification(specification)
         self.activity_specifications[provenance_pattern.name] = provenance_pattern
 
-    def load_specification_file(self, file_path: Union[str, Path]):
+    def load_specification_file(self, file_path: Union[str, Path], shared: bool = False):
         """ Loads the specifications from a given file.
 
         :param  Union[str, Path] file_path:
             The file path.
+        :param bool shared:
+            If true a file is parsed only once per content and process.
         :raises InvalidSpecificationException:
             If an entry in the specification file is neither an entity nor an activity specification.
         """
         assert(Path(file_path).exists())
-        yaml_content = _read_yaml_file(file_path)
+        yaml_content = _read_shared_yaml_file(file_path) if shared else _read_yaml_file(file_path)
         backlog = []
         # Parse Activity Specifications
         for thing in yaml_content.items():
@@ -463,6 +485,7 @@ class SpecificationManager:
         agent_specification = AgentSpecification(name, required_attributes, attributes,
                                                  primary_key_attributes)
         agent_specification.style_info = entity_mapping.get("style", {})
+        agent_specification.indexed_attributes = self._parse_indexed_attributes(name, entity_mapping, attributes)
         return agent_specification
 
     def _build_entitiy_specification(self, raw_entity_specification) -> EntitySpecification:
@@ -494,8 +517,26 @@ class SpecificationManager:
         entity_specification = EntitySpecification(name, required_attributes, attributes,
                                                    primary_key_attributes)
         entity_specification.style_info = entity_mapping.get("style", {})
+        entity_specification.indexed_attributes = self._parse_indexed_attributes(name, entity_mapping, attributes)
         return entity_specification
 
+    def _parse_indexed_attributes(self, name, entity_mapping, attributes):
+        indexed_attributes = entity_mapping.get("index", []) or []
+        unknown_attributes = [attribute for attribute in indexed_attributes if attribute not in attributes]
+        if unknown_attributes:
+            raise InvalidEntitySpecificationException(
+                f"Specification \"{name}\" indexes unknown attributes {unknown_attributes}.")
+        return list(indexed_attributes)
+
+    def indexed_attributes(self) -> Dict[str, List[str]]:
+        """Gets the indexed attributes of all entities and agents.
+
+        :rtype: Dict[str, List[str]]
+        :return: A mapping from entity and agent names to their indexed attributes.
+        """
+        specifications = list(self.entity_specifications.values()) + list(self.agent_specifications.values())
+        return {spec.name: spec.indexed_attributes for spec in specifications if spec.indexed_attributes}
+
     def is_editable(self, entity_name: str, attribute_name: str) -> bool:
         """Checks whether an attribute of an entity is editable by the user.
 
@@ -0,0 +1,178 @@
+import json
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Deque, Dict, Iterator, List, Tuple
+
+_CURRENT_SPAN: ContextVar[Tuple['Span', List['Span']] | None] = ContextVar("simprov_current_span", default=None)
+
+
+@dataclass
+class Span:
+    """Represents a timed operation of a trace, e.g., a stage of processing an event.
+
+    :ivar str name:
+        The name of the operation.
+    :ivar str trace_id:
+        The id of the trace as 32 hex digits.
+    :ivar str span_id:
+        The id of the span as 16 hex digits.
+    :ivar str parent_id:
+        The id of the enclosing span. ``None`` for the root span of a trace.
+    :ivar int start_ns:
+        The start as nanoseconds since the epoch.
+    :ivar int end_ns:
+        The end as nanoseconds since the epoch. ``0`` while the span is running.
+    :ivar Dict[str,object] attributes:
+        Additional information, e.g., the event type.
+    :ivar str error:
+        The exception that ended the span. ``None`` if it ended without an exception.
+    """
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    start_ns: int
+    end_ns: int = 0
+    attributes: Dict[str, object] = field(default_factory=dict)
+    error: str | None = None
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict:
+        return {"name": self.name, "spanId": self.span_id, "parentId": self.parent_id, "start": self.start_ns,
+                "durationMs": self.duration_ms, "attributes": self.attributes, "error": self.error}
+
+
+class OTLPFileExporter:
+    """Appends finished traces to a file in the JSON encoding of the OpenTelemetry protocol (OTLP).
+
+    Every line is an ``ExportTraceServiceRequest`` with the spans of one trace, as read by the file receiver of the
+    OpenTelemetry Collector.
+
+    :param str path:
+        The path of the file.
+    :param str service_name:
+        The ``service.name`` resource attribute.
+    """
+
+    def __init__(self, path: str, service_name: str = "simprov") -> None:
+        self.path: str = path
+        self.service_name: str = service_name
+        self._lock: Lock = Lock()
+
+    def export(self, spans: List[Span]):
+        """Appends the spans of a trace to the file.
+
+        :param List[Span] spans: The spans of the trace.
+        """
+        request = {"resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", self.service_name)]},
+            "scopeSpans": [{"scope": {"name": "simprov"}, "spans": [_otlp_span(span) for span in spans]}]}]}
+        line = json.dumps(request) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as trace_file:
+            trace_file.write(line)
+
+
+def _otlp_attribute(key: str, value) -> Dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def _otlp_span(span: Span) -> Dict:
+    otlp_span = {"traceId": span.trace_id, "spanId": span.span_id, "name": span.name, "kind": 1,
+                 "startTimeUnixNano": str(span.start_ns), "endTimeUnixNano": str(span.end_ns),
+                 "attributes": [_otlp_attribute(key, value) for (key, value) in span.attributes.items()],
+                 "status": {"code": 1} if span.error is None else {"code": 2, "message": span.error}}
+    if span.parent_id is not None:
+        otlp_span["parentSpanId"] = span.parent_id
+    return otlp_span
+
+
+class Tracer:
+    """Records traces, i.e., trees of spans, in a ring buffer and passes them to an optional exporter.
+
+    A trace starts with a root span, see :py:meth:`span`. Spans started while another span is running in the same
+    context become its children. The ids are generated by a private generator, so tracing never changes the node ids.
+
+    :param int capacity:
+        The number of most recent traces kept in the ring buffer.
+    :param OTLPFileExporter, optional exporter:
+        The exporter finished traces are passed to.
+    :ivar Deque[List[Span]] traces:
+        The most recent traces, each as the list of its spans with the root span first.
+    """
+
+    def __init__(self, capacity: int = 1024, exporter: OTLPFileExporter = None) -> None:
+        self.traces: Deque[List[Span]] = deque(maxlen=capacity)
+        self.exporter: OTLPFileExporter = exporter
+        self._ids: random.Random = random.Random()
+        self._clock_offset: int = time.time_ns() - time.perf_counter_ns()
+
+    def _now(self) -> int:
+        return time.perf_counter_ns() + self._clock_offset
+
+    @contextmanager
+    def span(self, name: str, attributes: Dict[str, object] = None, root: bool = False) -> Iterator[Span | None]:
+        """Records a span for the enclosed operation.
+
+        :param str name: The name of the operation.
+        :param Dict[str,object], optional attributes: Additional information.
+        :param bool root: If true a new trace is started unless a span is running. Otherwise, nothing is recorded
+            outside a trace.
+        :return: The span, or ``None`` if nothing is recorded.
+        """
+        current = _CURRENT_SPAN.get()
+        if current is None and not root:
+            yield None
+            return
+        if current is None:
+            (trace_id, parent_id, spans) = (f"{self._ids.getrandbits(128):032x}", None, [])
+        else:
+            (parent, spans) = current
+            (trace_id, parent_id) = (parent.trace_id, parent.span_id)
+        span = Span(name, trace_id, f"{self._ids.getrandbits(64):016x}", parent_id, self._now(),
+                    attributes=dict(attributes or {}))
+        spans.append(span)
+        token = _CURRENT_SPAN.set((span, spans))
+        try:
+            yield span
+        except BaseException as ex:
+            span.error = f"{type(ex).__name__}: {ex}"
+            raise
+        finally:
+            span.end_ns = self._now()
+            _CURRENT_SPAN.reset(token)
+            if current is None:
+                self.traces.append(spans)
+                if self.exporter is not None:
+                    self.exporter.export(spans)
+
+    def recent_traces(self, limit: int = 100, min_duration_ms: float = 0.0) -> List[Dict]:
+        """Returns the most recent traces, optionally only those that took at least a given time.
+
+        :param int limit: The maximum number of traces.
+        :param float min_duration_ms: The minimum duration of the root span in milliseconds.
+        :rtype: List[Dict]
+        :return: The traces, the most recent first, each with its trace id, duration and spans.
+        """
+        traces = []
+        for spans in reversed(list(self.traces)):
+            if len(traces) >= limit:
+                break
+            if spans[0].duration_ms < min_duration_ms:
+                continue
+            traces.append({"traceId": spans[0].trace_id, "name": spans[0].name,
+                           "durationMs": spans[0].duration_ms, "spans": [span.to_dict() for span in spans]})
+        return traces
@@ -0,0 +1,104 @@
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import Dict, Hashable, List, Optional
+from uuid import UUID
+
+
+@dataclass
+class VersionChain:
+    """Represents all versions of an entity or agent, i.e., all nodes with the same primary key.
+
+    :ivar List[UUID] node_ids:
+        The ids of the versions in the order they were added to the provenance graph.
+    :ivar List[int] sequences:
+        The sequence numbers of the events that added the versions.
+    """
+    node_ids: List[UUID] = field(default_factory=list)
+    sequences: List[int] = field(default_factory=list)
+
+
+class VersionIndex:
+    """Represents an index of the version chains of entities or agents by their primary key.
+
+    :ivar Dict[Hashable,VersionChain] chains:
+        The version chain of every primary key.
+    :ivar Dict[UUID,Hashable] node_keys:
+        The primary key of every indexed node.
+    :ivar Dict[UUID,int] positions:
+        The position of every indexed node in its version chain.
+    """
+
+    def __init__(self) -> None:
+        self.chains: Dict[Hashable, VersionChain] = {}
+        self.node_keys: Dict[UUID, Hashable] = {}
+        self.positions: Dict[UUID, int] = {}
+
+    def copy(self) -> 'VersionIndex':
+        """Returns a copy that is not affected by later additions to this index.
+
+        :rtype: VersionIndex
+        """
+        index_copy = VersionIndex()
+        index_copy.chains = {primary_key: VersionChain(list(chain.node_ids), list(chain.sequences))
+                             for (primary_key, chain) in self.chains.items()}
+        index_copy.node_keys = dict(self.node_keys)
+        index_copy.positions = dict(self.positions)
+        return index_copy
+
+    def __contains__(self, node_id: UUID) -> bool:
+        return node_id in self.node_keys
+
+    def add(self, primary_key: Hashable, node_id: UUID, sequence: int):
+        """Appends a new version to the version chain of a primary key.
+
+        :param Hashable primary_key: The primary key.
+        :param UUID node_id: The id of the version.
+        :param int sequence: The sequence number of the event that added the version.
+        """
+        chain = self.chains.setdefault(primary_key, VersionChain())
+        self.node_keys[node_id] = primary_key
+        self.positions[node_id] = len(chain.node_ids)
+        chain.node_ids.append(node_id)
+        chain.sequences.append(sequence)
+
+    def versions(self, node_id: UUID) -> List[UUID]:
+        """Returns all versions of a node.
+
+        :param UUID node_id: The id of any version.
+        :rtype: List[UUID]
+        :return: The ids of the versions in the order they were added.
+        """
+        return list(self.chains[self.node_keys[node_id]].node_ids)
+
+    def version_at(self, node_id: UUID, sequence: int) -> Optional[UUID]:
+        """Returns the version of a node that was the latest after an event was processed.
+
+        :param UUID node_id: The id of any version.
+        :param int sequence: The sequence number of the event.
+        :rtype: Optional[UUID]
+        :return: The id of the version. ``None`` if the first version was added by a later event.
+        """
+        chain = self.chains[self.node_keys[node_id]]
+        position = bisect_right(chain.sequences, sequence)
+        return chain.node_ids[position - 1] if position else None
+
+    def previous_version(self, node_id: UUID) -> Optional[UUID]:
+        """Returns the version preceding a version.
+
+        :param UUID node_id: The id of the version.
+        :rtype: Optional[UUID]
+        :return: The id of the previous version. ``None`` if it is the first version.
+        """
+        position = self.positions[node_id]
+        return self.chains[self.node_keys[node_id]].node_ids[position - 1] if position else None
+
+    def next_version(self, node_id: UUID) -> Optional[UUID]:
+        """Returns the version succeeding a version.
+
+        :param UUID node_id: The id of the version.
+        :rtype: Optional[UUID]
+        :return: The id of the next version. ``None`` if it is the latest version.
+        """
+        node_ids = self.chains[self.node_keys[node_id]].node_ids
+        position = self.positions[node_id] + 1
+        return node_ids[position] if position < len(node_ids) else None
@@ -57,3 +57,9 @@ def complex_event():
     path = Path(__file__) / "../resources/complex-event.json"
     event_from_json = json.load(open(path.resolve()))
     return event_from_json
+
+
+@pytest.fixture()
+def declarative_rules_path():
+    path = Path(__file__) / "../resources/declarative-rules.yaml"
+    return path.resolve()
@@ -0,0 +1,80 @@
+import io
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from simprov import batch
+from simprov.batch import build, iter_events, load_study
+from simprov.core import SimProv
+from simprov.export import to_prov_json
+from simprov.provenance import reset_id_generator
+
+EVENTS = [{"type": "Model Specified", "filePath": f"/tmp/model-{index % 3}.mlr", "newlySpecified": index < 3}
+          for index in range(8)]
+
+
+def test_events_are_streamed(monkeypatch):
+    monkeypatch.setattr(batch, "READ_CHUNK_SIZE", 7)
+    assert list(iter_events(io.StringIO(json.dumps(EVENTS, indent=3)))) == EVENTS
+    journal = json.dumps({"journal": "token"}) + "\n" + "".join(json.dumps(event) + "\n" for event in EVENTS)
+    assert list(iter_events(io.StringIO(journal))) == EVENTS
+
+
+def test_build(real_rules_path, specs_path, tmp_path):
+    events_path = tmp_path / "events.json"
+    events_path.write_text(json.dumps(EVENTS + [{"type": "Unknown"}]))
+    reset_id_generator()
+    report = build(events_path, str(real_rules_path), str(specs_path), tmp_path / "graph.json", keep_going=True)
+    assert (report.events, report.failed_events) == (len(EVENTS), 1)
+    reset_id_generator()
+    simprov = SimProv(real_rules_path, specs_path, None, start_api=False)
+    for event in EVENTS:
+        simprov.process_event(event)
+    assert (tmp_path / "graph.json").read_text() == to_prov_json(simprov.provenance_graph)
+    assert report.nodes == simprov.provenance_graph.graph.number_of_nodes()
+
+
+def test_load_study_does_not_write_the_state_file(real_rules_path, specs_path, tmp_path):
+    state_path = tmp_path / "state.pickle"
+    reset_id_generator()
+    simprov = SimProv(real_rules_path, specs_path, str(state_path), start_api=False)
+    for event in EVENTS:
+        simprov.process_event(event)
+    modified = state_path.stat().st_mtime_ns
+    loaded = load_study(str(real_rules_path), str(specs_path), str(state_path))
+    assert state_path.stat().st_mtime_ns == modified
+    assert loaded.state_file_path is None and loaded.rest_api is None
+    assert set(loaded.provenance_graph.node_map) == set(simprov.provenance_graph.node_map)
+
+
+def test_build_command_does_not_import_flask(real_rules_path, specs_path, tmp_path):
+    events_path = tmp_path / "events.json"
+    events_path.write_text(json.dumps(EVENTS))
+    script = ("import sys\n"
+              "from simprov.command_line import main\n"
+              f"sys.argv = ['simprov', 'build', {str(events_path)!r}, '--rules', {str(real_rules_path)!r}, "
+              f"'--specs', {str(specs_path)!r}, '--out', {str(tmp_path / 'graph.dot')!r}]\n"
+              "main()\n"
+              "assert not [module for module in sys.modules if module.split('.')[0] in ('flask', 'flask_socketio')]\n")
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True,
+                            cwd=Path(__file__).parent.parent)
+    assert result.returncode == 0, result.stderr
+    assert "events/s" in result.stdout
+    assert (tmp_path / "graph.dot").read_text().startswith("strict digraph")
+
+
+def test_help_does_not_import_the_graph_and_server_libraries():
+    script = ("import sys\n"
+              "from simprov.command_line import main\n"
+              "sys.argv = ['simprov', '--help']\n"
+              "try:\n"
+              "    main()\n"
+              "except SystemExit:\n"
+              "    pass\n"
+              "heavy = ('flask', 'flask_socketio', 'eventlet', 'networkx', 'prov', 'yaml')\n"
+              "assert not [module for module in sys.modules if module.split('.')[0] in heavy]\n")
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True,
+                            cwd=Path(__file__).parent.parent)
+    assert result.returncode == 0, result.stderr
+    assert "simprov build" in result.stdout
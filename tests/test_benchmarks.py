@@ -0,0 +1,19 @@
+from benchmarks.generator import StudyShape, generate_events
+from benchmarks.run import compare, run
+
+
+def test_benchmark_run_on_a_small_study():
+    shape = StudyShape(models=2, depth=2, fan_out=2, agents=2)
+    assert len(list(generate_events(shape))) == shape.event_count
+    results = run(shape, repeat=1)
+    assert results["ingestion"]["events"] == shape.event_count
+    assert results["ingestion"]["stage_seconds"]["rule"] > 0
+    assert results["deduplication"]["skipped"] >= shape.event_count
+    assert len(results["reduction_seconds"]) == 8
+    assert {"prov_json", "dot"} <= results["export_seconds"].keys()
+    assert compare(results, results, 0.2) == []
+    faster_baseline = {**results, "export_seconds": {"dot": results["export_seconds"]["dot"] / 2},
+                       "ingestion": {**results["ingestion"],
+                                     "events_per_second": results["ingestion"]["events_per_second"] * 2}}
+    assert {metric for (metric, _, _) in compare(results, faster_baseline, 0.2)} == {"export_seconds.dot",
+                                                                                     "ingestion.events_per_second"}
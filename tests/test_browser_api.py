@@ -0,0 +1,287 @@
+import gzip
+import json
+from threading import Event, Thread, get_ident
+
+import pytest
+
+from simprov.core import SimProv
+from simprov.export import to_prov_json, to_dot
+from simprov.interface.encoding import graph_page
+from simprov.interface.restapi import ServerOptions
+
+
+@pytest.fixture()
+def simprov_instance(real_rules_path, specs_path, tmp_path):
+    simprov = SimProv(real_rules_path, specs_path, str(tmp_path / "state.pickle"), start_api=False)
+    simprov.process_event({"type": "Model Specified", "filePath": "/tmp/model.mlr", "newlySpecified": True})
+    simprov.process_event({"type": "Model Specified", "filePath": "/tmp/model.mlr", "newlySpecified": False})
+    return simprov
+
+
+@pytest.fixture()
+def client(simprov_instance):
+    return simprov_instance.rest_api.app.test_client()
+
+
+def test_downloads_are_streamed(simprov_instance, client):
+    response = client.get("/graph-events", headers={"Accept-Encoding": "identity"})
+    assert response.is_streamed
+    assert response.get_data(as_text=True) == json.dumps(simprov_instance.event_log)
+    assert "attachment" in response.headers["Content-Disposition"]
+    response = client.get("/graph-json", headers={"Accept-Encoding": "identity"})
+    assert response.get_data(as_text=True) == to_prov_json(simprov_instance.provenance_graph)
+    response = client.get("/graph-dot", headers={"Accept-Encoding": "identity"})
+    assert response.get_data(as_text=True) == to_dot(simprov_instance.provenance_graph)
+
+
+def test_downloads_are_compressed(simprov_instance, client):
+    response = client.get("/graph-json", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(response.get_data()).decode("utf-8") == to_prov_json(simprov_instance.provenance_graph)
+
+
+def test_downloads_of_unchanged_graph_are_not_modified(simprov_instance, client):
+    etag = client.get("/graph-json").headers["ETag"]
+    assert client.get("/graph-json", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/graph-json?hideNodes=true", headers={"If-None-Match": etag}).status_code == 200
+    simprov_instance.process_event({"type": "Model Specified", "filePath": "/tmp/model.mlr",
+                                    "newlySpecified": False})
+    assert client.get("/graph-json", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_download_etags_match_the_served_version(simprov_instance, client):
+    old_etag = client.get("/graph-json").headers["ETag"]
+    simprov_instance.process_event({"type": "Model Specified", "filePath": "/tmp/model.mlr", "newlySpecified": False})
+    (locked, release) = (Event(), Event())
+
+    def change():
+        with simprov_instance._writing():
+            locked.set()
+            release.wait()
+
+    writer = Thread(target=change)
+    writer.start()
+    locked.wait()
+    # While the graph is being changed, the previous snapshot is served under its own ETag.
+    response = client.get("/graph-json", headers={"If-None-Match": old_etag})
+    release.set()
+    writer.join()
+    assert response.status_code == 304
+    response = client.get("/graph-json", headers={"If-None-Match": old_etag, "Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert response.get_data(as_text=True) == to_prov_json(simprov_instance.provenance_graph)
+    (graph_version, event_log) = simprov_instance.read_event_log()
+    assert graph_version == simprov_instance.graph_version and event_log == simprov_instance.event_log
+
+
+def test_provenance_data_is_paginated(simprov_instance, client):
+    full_data = client.get("/provenance-data").get_json()
+    nodes, edges, cursor = [], [], None
+    while True:
+        response = client.get("/provenance-data", query_string={"limit": 1, **({"cursor": cursor} if cursor else {})})
+        page = response.get_json()
+        assert len([element for element in page if element["group"] == "nodes"]) == 1
+        nodes += [element for element in page if element["group"] == "nodes"]
+        edges += [element for element in page if element["group"] == "edges"]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert nodes == [element for element in full_data if element["group"] == "nodes"]
+    assert sorted(map(str, edges)) == sorted(str(element) for element in full_data if element["group"] == "edges")
+    assert client.get("/provenance-data?limit=0").status_code == 400
+
+
+def test_pages_of_snapshots_end_with_their_nodes(simprov_instance):
+    snapshot = simprov_instance.read_snapshot()
+    simprov_instance.process_event({"type": "Model Specified", "filePath": "/tmp/other.mlr", "newlySpecified": True})
+    assert len(simprov_instance.provenance_graph.graph) > len(snapshot.graph)
+    (node_ids, edges, cursor) = graph_page(snapshot, None, 1)
+    while cursor is not None:
+        (page_node_ids, page_edges, cursor) = graph_page(snapshot, cursor, 1)
+        node_ids += page_node_ids
+        edges += page_edges
+    assert node_ids == list(snapshot.graph.nodes)
+    assert sorted(map(str, edges)) == sorted(map(str, snapshot.graph.edges))
+
+
+def test_cursors_of_rebuilt_graphs_are_rejected(simprov_instance, client):
+    cursor = client.get("/provenance-data?limit=1").headers["X-Next-Cursor"]
+    simprov_instance.process_event(dict(simprov_instance.event_log[-1]))
+    assert client.get("/provenance-data", query_string={"limit": 1, "cursor": cursor}).status_code == 200
+    with simprov_instance._writing():
+        simprov_instance._rebuild_from_event_log()
+    response = client.get("/provenance-data", query_string={"limit": 1, "cursor": cursor})
+    assert response.status_code == 400
+    assert "another version" in response.get_json()["error"]
+    assert client.get("/provenance-data?limit=1&cursor=1").status_code == 400
+
+
+def test_provenance_data_slim_and_compact(simprov_instance, client):
+    slim_data = client.get("/provenance-data?slim=true").get_json()
+    for element in slim_data:
+        if element["group"] == "nodes":
+            assert set(element["data"]) == {"id", "name", "type", "hidden"}
+    msgpack = pytest.importorskip("msgpack")
+    response = client.get("/provenance-data", headers={"Accept": "application/msgpack"})
+    assert response.mimetype == "application/msgpack"
+    data = msgpack.unpackb(response.get_data())
+    strings = data["strings"]
+    graph = simprov_instance.provenance_graph
+    assert [strings[node[0]] for node in data["nodes"]] == [str(node_id) for node_id in graph.graph.nodes]
+    assert {(strings[source], strings[target]) for (source, target, _) in data["edges"]} == \
+           {(str(source), str(target)) for (source, target) in graph.graph.edges}
+    activity = graph.activities[-1]
+    activity_node = next(node for node in data["nodes"] if strings[node[0]] == str(activity.id))
+    assert [strings[reference] for reference in activity_node[4]["used_entities"]] == \
+           [str(entity.id) for entity in activity.used_entities]
+    response = client.get("/provenance-data?slim=true", headers={"Accept": "application/vnd.simprov.compact+json"})
+    assert all(len(node) == 4 for node in response.get_json()["nodes"])
+
+
+def test_neighborhood_and_lineage_queries(simprov_instance, client):
+    graph = simprov_instance.provenance_graph
+    latest_model = graph.activities[-1].generated_entities[0].id
+    data = client.get(f"/provenance-data?root={latest_model}&direction=up&depth=2").get_json()
+    node_ids = [element["data"]["id"] for element in data if element["group"] == "nodes"]
+    assert node_ids == [str(node_id) for node_id in graph.neighborhood(latest_model, "up", 2)]
+    edges = {(element["data"]["source"], element["data"]["target"]) for element in data if element["group"] == "edges"}
+    assert edges == {(str(source), str(target)) for (source, target) in graph.graph.edges
+                     if str(source) in node_ids and str(target) in node_ids}
+    data = client.get(f"/lineage/{latest_model}").get_json()
+    assert [element["data"]["id"] for element in data if element["group"] == "nodes"] == \
+           [str(node_id) for node_id in graph.lineage(latest_model)]
+    assert client.get(f"/provenance-data?root={latest_model}&direction=sideways").status_code == 400
+    assert client.get("/lineage/00000000-0000-0000-0000-000000000000").status_code == 404
+
+
+def test_versions(simprov_instance, client):
+    graph = simprov_instance.provenance_graph
+    (first_model, latest_model) = [activity.generated_entities[0].id for activity in graph.activities]
+    result = client.get(f"/versions/{latest_model}?event=0").get_json()
+    assert result == {"versions": [{"id": str(first_model), "sequence": 0}, {"id": str(latest_model), "sequence": 1}],
+                      "previous": str(first_model), "next": None, "at": str(first_model)}
+    assert client.get(f"/versions/{graph.activities[0].id}").status_code == 404
+
+
+def test_query(simprov_instance, client):
+    graph = simprov_instance.provenance_graph
+    model_ids = [str(entity.id) for entity in graph.entities]
+    assert client.get("/query", query_string={"eq.File Path": "/tmp/model.mlr"}).get_json() == {"result": model_ids}
+    assert client.get("/query", query_string={"type": "Entity", "prefix.File Path": "/tmp/"}).get_json() == \
+           {"result": model_ids}
+    assert client.get("/query", query_string={"prefix.File Path": "/var/"}).get_json() == {"result": []}
+    assert client.get("/query", query_string={"eq.Content": "x"}).status_code == 400
+
+
+def test_provenance_data_as_of(simprov_instance, client):
+    graph = simprov_instance.provenance_graph
+    data = client.get("/provenance-data?asOf=0").get_json()
+    assert {element["data"]["id"] for element in data if element["group"] == "nodes"} == \
+           {str(graph.activities[0].id), str(graph.activities[0].generated_entities[0].id)}
+    assert client.get("/provenance-data?asOf=1").get_json() == client.get("/provenance-data").get_json()
+    assert client.get("/provenance-data?asOf=0&showReducedGraph=true").status_code == 200
+
+
+def test_diff(simprov_instance, client):
+    graph = simprov_instance.provenance_graph
+    records = [json.loads(line) for line in client.get("/diff?from=0").get_data(as_text=True).splitlines()]
+    assert {record["new_id"] for record in records if record["kind"] == "node"} == \
+           {str(node_id) for node_id in graph.graph.nodes if graph.history.node_sequences[node_id] == 1}
+    assert client.get("/diff?from=1").get_data() == b""
+    assert client.get("/diff").status_code == 400
+    response = client.post("/diff", data=to_prov_json(graph))
+    assert response.mimetype == "application/x-ndjson" and response.get_data() == b""
+
+
+def test_production_server_offloads_long_requests(real_rules_path, specs_path, tmp_path, client):
+    options = ServerOptions.production(worker_threads=2)
+    production = SimProv(real_rules_path, specs_path, str(tmp_path / "state.pickle"), start_api=False,
+                         server_options=options)
+    assert production.rest_api.socketio.async_mode == "eventlet"
+    assert production.rest_api.socketio.server_options["logger"] is False
+    production_client = production.rest_api.app.test_client()
+    for path in ("/provenance-data?showReducedGraph=true", "/graph-json", "/diff?from=0"):
+        response = production_client.get(path, headers={"Accept-Encoding": "identity"})
+        assert len(response.get_data()) == len(client.get(path, headers={"Accept-Encoding": "identity"}).get_data())
+
+
+def test_production_server_choices(real_rules_path, specs_path, tmp_path, monkeypatch):
+    from simprov.command_line import serve, serve_parser
+    from simprov.interface.restapi import RestAPI
+
+    served = []
+    monkeypatch.setattr(RestAPI, "serve", lambda rest_api: served.append(rest_api))
+    arguments = ["--state-file", str(tmp_path / "state.pickle"), str(specs_path), str(real_rules_path)]
+    serve(serve_parser.parse_args(arguments))
+    serve(serve_parser.parse_args(["--watch"] + arguments))
+    served[1].simprov.close()
+    assert [rest_api.socketio.async_mode for rest_api in served] == ["eventlet", "threading"]
+
+    monkeypatch.undo()
+    runs = []
+    monkeypatch.setattr(served[0].socketio, "run", lambda app, **kwargs: runs.append(kwargs))
+    served[0].serve()
+    assert runs[0]["allow_unsafe_werkzeug"] is False
+
+
+def test_metrics(simprov_instance, client):
+    with pytest.raises(KeyError):
+        simprov_instance.process_event({"newlySpecified": True})
+    client.get("/provenance-data?showReducedGraph=true")
+    lines = client.get("/debug/metrics").get_data(as_text=True).splitlines()
+    assert 'simprov_stage_seconds_count{stage="rule"} 2' in lines
+    assert 'simprov_stage_seconds_bucket{stage="chain",le="+Inf"} 2' in lines
+    assert "simprov_events_processed_total 2" in lines
+    assert 'simprov_event_errors_total{type="KeyError"} 1' in lines
+    assert f"simprov_graph_nodes {simprov_instance.provenance_graph.graph.number_of_nodes()}" in lines
+    assert "simprov_reduction_seconds_count 1" in lines
+
+
+def test_profile(client):
+    from simprov import profiling
+
+    response = client.get("/debug/profile?seconds=0.05&mode=cpu")
+    assert response.status_code == 200
+    assert "profile-cpu.collapsed.txt" in response.headers["Content-Disposition"]
+    response = client.get("/debug/profile?seconds=0.05&mode=alloc&format=speedscope")
+    profile = json.loads(response.get_data())
+    assert profile["profiles"][0]["unit"] == "bytes"
+    assert len(profile["profiles"][0]["samples"]) == len(profile["profiles"][0]["weights"])
+    assert client.get("/debug/profile?mode=wall").status_code == 400
+    with profiling._PROFILE_LOCK:
+        assert client.get("/debug/profile?seconds=0").status_code == 409
+
+
+def test_profile_runs_in_a_real_thread(real_rules_path, specs_path, tmp_path, monkeypatch):
+    from simprov.interface import debug_api_blueprint
+
+    threads = []
+    monkeypatch.setattr(debug_api_blueprint, "run_profile", lambda *args: threads.append(get_ident()) or "")
+    options = ServerOptions.production(worker_threads=0)
+    production = SimProv(real_rules_path, specs_path, str(tmp_path / "state.pickle"), start_api=False,
+                         server_options=options)
+    assert production.rest_api.app.test_client().get("/debug/profile?seconds=0.05").status_code == 200
+    assert threads and threads[0] != get_ident()
+
+
+def test_traces(real_rules_path, specs_path, tmp_path):
+    trace_path = tmp_path / "traces.jsonl"
+    simprov = SimProv(real_rules_path, specs_path, str(tmp_path / "state.pickle"), start_api=False,
+                      trace_path=str(trace_path))
+    simprov.process_event({"type": "Model Specified", "filePath": "/tmp/model.mlr", "newlySpecified": True})
+    with pytest.raises(KeyError):
+        simprov.process_event({"newlySpecified": True})
+    traces = simprov.rest_api.app.test_client().get("/debug/traces").get_json()
+    assert [trace["name"] for trace in traces] == ["process_event", "process_event"]
+    assert traces[0]["spans"][0]["error"] == "KeyError: 'type'"
+    spans = traces[1]["spans"]
+    assert [span["name"] for span in spans] == ["process_event", "rule", "normalize", "validate", "chain", "notify",
+                                                "persist"]
+    assert {span["parentId"] for span in spans[1:]} == {spans[0]["spanId"]}
+    assert spans[0]["attributes"] == {"simprov.event.type": "Model Specified", "simprov.event.sequence": 0}
+    assert "simprov.rule" in spans[1]["attributes"]
+    assert simprov.rest_api.app.test_client().get("/debug/traces?minDuration=100000").get_json() == []
+    exported = [json.loads(line) for line in trace_path.read_text().splitlines()]
+    otlp_spans = exported[0]["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert [span["spanId"] for span in otlp_spans] == [span["spanId"] for span in spans]
+    assert exported[1]["resourceSpans"][0]["scopeSpans"][0]["spans"][0]["status"]["code"] == 2
@@ -0,0 +1,61 @@
+import json
+import sys
+from io import StringIO
+
+from simprov.command_line import main
+from simprov.core import SimProv
+from simprov.diff import iter_diff, write_diff
+from simprov.export import to_prov_json
+from simprov.importer import load_prov_json
+
+EVENTS = [("/tmp/model.mlr", True), ("/tmp/model.mlr", False), ("/tmp/other.mlr", True)]
+
+
+def _study(real_rules_path, specs_path, path, events):
+    simprov = SimProv(real_rules_path, specs_path, str(path), start_api=False)
+    for (file_path, newly_specified) in events:
+        simprov.process_event({"type": "Model Specified", "filePath": file_path, "newlySpecified": newly_specified},
+                              False)
+    return simprov
+
+
+def test_diff_matches_nodes_of_different_studies(real_rules_path, specs_path, tmp_path):
+    old = _study(real_rules_path, specs_path, tmp_path / "old.pickle", EVENTS)
+    same = _study(real_rules_path, specs_path, tmp_path / "same.pickle", EVENTS)
+    assert list(iter_diff(old.provenance_graph, same.provenance_graph)) == []
+    imported = load_prov_json(StringIO(to_prov_json(old.provenance_graph)), old.specification_manager)
+    assert list(iter_diff(old.provenance_graph, imported)) == []
+
+    new = _study(real_rules_path, specs_path, tmp_path / "new.pickle", EVENTS + [("/tmp/model.mlr", False)])
+    latest_model = new.provenance_graph.last_entities_map[("/tmp/model.mlr",)]
+    new.process_event({"type": "Update Entity", "node_id": str(latest_model.id), "changes": {"Content": "edited"}},
+                      False)
+    records = list(iter_diff(old.provenance_graph, new.provenance_graph))
+    assert {(record["op"], record["kind"]) for record in records} == {("added", "node"), ("added", "edge")}
+    assert {record["name"] for record in records if record["kind"] == "node"} == \
+           {"Simulation Model", "Specifying Simulation Model"}
+
+    old_model = old.provenance_graph.last_entities_map[("/tmp/model.mlr",)]
+    old.process_event({"type": "Update Entity", "node_id": str(old_model.id), "changes": {"Content": "edited"}},
+                      False)
+    (record,) = iter_diff(same.provenance_graph, old.provenance_graph)
+    assert record["op"] == "changed" and record["new_id"] == str(old_model.id)
+    assert record["attributes"]["Content"][1] == "edited"
+
+    stream = StringIO()
+    assert write_diff(old.provenance_graph, same.provenance_graph, stream) == 1
+    assert json.loads(stream.getvalue())["attributes"]["Content"][0] == "edited"
+
+
+def test_diff_command_only_reads_the_studies(real_rules_path, specs_path, tmp_path, monkeypatch, capsys):
+    old = _study(real_rules_path, specs_path, tmp_path / "old.pickle", EVENTS)
+    old.write_study_state()
+    (tmp_path / "new.json").write_text(to_prov_json(
+        _study(real_rules_path, specs_path, tmp_path / "new.pickle", EVENTS[:2]).provenance_graph))
+    modified = (tmp_path / "old.pickle").stat().st_mtime_ns
+    monkeypatch.setattr(sys, "argv", ["simprov", "diff", str(tmp_path / "old.pickle"), str(tmp_path / "new.json"),
+                                      "--rules", str(real_rules_path), "--specs", str(specs_path)])
+    main()
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert {(record["op"], record["kind"]) for record in records} == {("removed", "node"), ("removed", "edge")}
+    assert (tmp_path / "old.pickle").stat().st_mtime_ns == modified
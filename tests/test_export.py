@@ -0,0 +1,103 @@
+from io import StringIO
+
+import pytest
+from prov.serializers.provjson import ProvJSONSerializer
+
+from simprov import Activity, Entity
+from simprov.core import SimProv
+from simprov import importer
+from simprov.export import _dot_id, to_prov_json, to_prov_document, to_dot, write_columnar
+from simprov.importer import load_prov_json
+from simprov.provenance import reset_id_generator
+
+
+def _serialize_with_prov(provenance_graph):
+    stream = StringIO()
+    ProvJSONSerializer(to_prov_document(provenance_graph)).serialize(stream)
+    return stream.getvalue()
+
+
+def test_prov_json_matches_prov_serializer(real_rules_path, specs_path, tmp_path):
+    simprov = SimProv(real_rules_path, specs_path, str(tmp_path / "state.pickle"), start_api=False)
+    assert to_prov_json(simprov.provenance_graph) == _serialize_with_prov(simprov.provenance_graph)
+    for (path, newly_specified) in [("/tmp/model.mlr", True), ("/tmp/model.mlr", False),
+                                    ("/tmp/experiment.py", True), ("/tmp/model.mlr", False)]:
+        simprov.process_event({"type": "Model Specified", "filePath": path, "newlySpecified": newly_specified},
+                              False)
+    usage_only = Activity("Specifying Simulation Model")
+    usage_only.used_entities.append(Entity("Simulation Model", ("/tmp/ü.mlr",), {"File Path": "/tmp/ü.mlr",
+                                                                                  "Content": 3.5}))
+    simprov.provenance_graph.add_activity(usage_only)
+    assert to_prov_json(simprov.provenance_graph) == _serialize_with_prov(simprov.provenance_graph)
+
+
+def test_prov_json_import_restores_graph(real_rules_path, specs_path, tmp_path, monkeypatch):
+    monkeypatch.setattr(importer, "_CHUNK_SIZE", 7)
+    reset_id_generator()
+    simprov = SimProv(real_rules_path, specs_path, str(tmp_path / "state.pickle"), start_api=False)
+    for (path, newly_specified) in [("/tmp/model.mlr", True), ("/tmp/model.mlr", False),
+                                    ("/tmp/other model.mlr", True)]:
+        simprov.process_event({"type": "Model Specified", "filePath": path, "newlySpecified": newly_specified},
+                              False)
+    prov_json = to_prov_json(simprov.provenance_graph)
+    imported_graph = load_prov_json(StringIO(prov_json), simprov.specification_manager)
+    assert to_prov_json(imported_graph) == prov_json
+    assert set(imported_graph.graph.edges) == set(simprov.provenance_graph.graph.edges)
+    assert {key: entity.id for (key, entity) in imported_graph.last_entities_map.items()} == \
+           {key: entity.id for (key, entity) in simprov.provenance_graph.last_entities_map.items()}
+
+    base_graph_path = tmp_path / "study.json"
+    base_graph_path.write_text(prov_json)
+    # A fresh process starts with the same default seed the imported graph was built from.
+    reset_id_generator()
+    reopened = SimProv(real_rules_path, specs_path, str(tmp_path / "reopened.pickle"), start_api=False,
+                       base_graph_path=str(base_graph_path))
+    latest_model = reopened.provenance_graph.last_entities_map[("/tmp/model.mlr",)]
+    reopened.process_event({"type": "Model Specified", "filePath": "/tmp/model.mlr", "newlySpecified": False},
+                           False)
+    new_activity = reopened.provenance_graph.node_map[reopened.event_activities[0]]
+    assert [entity.id for entity in new_activity.used_entities] == [latest_model.id]
+    assert len(reopened.provenance_graph.node_map) == len(imported_graph.node_map) + 2
+    node_ids = set(reopened.provenance_graph.node_map)
+    reopened._rebuild_from_event_log()
+    assert set(reopened.provenance_graph.node_map) == node_ids
+
+
+def test_dot_contains_all_nodes_and_styles(real_rules_path, real_specs_path, tmp_path):
+    simprov = SimProv(real_rules_path, real_specs_path, str(tmp_path / "state.pickle"), start_api=False)
+    simprov.process_event({"type": "Model Specified", "filePath": "/tmp/model.mlr", "newlySpecified": True}, False)
+    simprov.process_event({"type": "Model Specified", "filePath": "/tmp/model.mlr", "newlySpecified": False}, False)
+    dot = to_dot(simprov.provenance_graph)
+    assert dot.startswith("strict digraph G {")
+    for node_id in simprov.provenance_graph.graph.nodes:
+        assert dot.count(f'\t"{node_id}"\t[') == 1
+    for (source_id, target_id) in simprov.provenance_graph.graph.edges:
+        assert f'"{source_id}" -> "{target_id}";' in dot
+    assert dot.count('fillcolor="#bdd7ee"') == 2
+
+
+def test_dot_ids_are_escaped():
+    assert _dot_id('C:\\models\\') == '"C:\\\\models\\\\"'
+    assert _dot_id('say "hi"\nbye') == '"say \\"hi\\"\\nbye"'
+
+
+def test_columnar_export_is_incremental(real_rules_path, specs_path, tmp_path):
+    dataset = pytest.importorskip("pyarrow.dataset")
+    simprov = SimProv(real_rules_path, specs_path, str(tmp_path / "state.pickle"), start_api=False)
+    simprov.process_event({"type": "Model Specified", "filePath": "/tmp/model.mlr", "newlySpecified": True}, False)
+    export_path = tmp_path / "export"
+    graph = simprov.provenance_graph.graph
+    for file_format in ["parquet", "arrow"]:
+        assert write_columnar(simprov.provenance_graph, export_path / file_format, file_format) == 2
+    simprov.process_event({"type": "Model Specified", "filePath": "/tmp/model.mlr", "newlySpecified": False}, False)
+    for file_format in ["parquet", "arrow"]:
+        directory = export_path / file_format
+        assert write_columnar(simprov.provenance_graph, directory, file_format, incremental=True) == 2
+        dataset_format = "ipc" if file_format == "arrow" else file_format
+        nodes = dataset.dataset(directory / "nodes", format=dataset_format).to_table()
+        edges = dataset.dataset(directory / "edges", format=dataset_format).to_table()
+        attributes = dataset.dataset(directory / "attributes", format=dataset_format).to_table()
+        assert sorted(nodes.column("id").to_pylist()) == sorted(str(node) for node in graph.nodes)
+        assert sorted(zip(edges.column("source").to_pylist(), edges.column("target").to_pylist())) == \
+               sorted((str(source), str(target)) for (source, target) in graph.edges)
+        assert attributes.num_rows == 2 * len(simprov.provenance_graph.entities)
@@ -0,0 +1,71 @@
+import json
+
+from werkzeug.test import Client
+
+from simprov.core import SimProv
+from simprov.interface.host import StudyConfig, StudyHost, load_host_config
+from simprov.provenance import reset_id_generator
+
+MODEL_EVENT = {"type": "Model Specified", "filePath": "/tmp/model.mlr", "newlySpecified": True}
+
+
+def _studies(real_rules_path, specs_path, tmp_path):
+    return [StudyConfig(study_id, str(real_rules_path), str(specs_path), str(tmp_path / f"{study_id}.pickle"))
+            for study_id in ("a", "b")]
+
+
+def _process_event(client, study_id, event):
+    response = client.post(f"/studies/{study_id}/capturer/process-event", json=event)
+    response.close()
+    assert response.status_code == 204
+
+
+def test_studies_are_isolated(real_rules_path, specs_path, tmp_path):
+    study_host = StudyHost(_studies(real_rules_path, specs_path, tmp_path))
+    client = Client(study_host)
+    _process_event(client, "a", MODEL_EVENT)
+    _process_event(client, "b", {**MODEL_EVENT, "filePath": "/tmp/other.mlr"})
+    _process_event(client, "a", {**MODEL_EVENT, "newlySpecified": False})
+    assert study_host.active_requests == {"a": 0, "b": 0}
+    (study_a, study_b) = (study_host.loaded["a"], study_host.loaded["b"])
+    assert study_a.rule_engine.rule_table == study_b.rule_engine.rule_table
+    assert len(study_b.event_log) == 1
+
+    # Loading study b must not make study a repeat node ids.
+    reset_id_generator()
+    standalone = SimProv(real_rules_path, specs_path, None, start_api=False)
+    standalone.process_event(MODEL_EVENT)
+    standalone.process_event({**MODEL_EVENT, "newlySpecified": False})
+    assert set(study_a.provenance_graph.graph.nodes) == set(standalone.provenance_graph.graph.nodes)
+
+    response = client.get("/studies")
+    assert json.loads(response.get_data()) == [{"id": "a", "worker": 0, "loaded": True},
+                                               {"id": "b", "worker": 0, "loaded": True}]
+    assert client.get("/studies/c/graph-events").status_code == 404
+
+
+def test_idle_studies_are_unloaded_over_the_memory_budget(real_rules_path, specs_path, tmp_path):
+    study_host = StudyHost(_studies(real_rules_path, specs_path, tmp_path))
+    client = Client(study_host)
+    _process_event(client, "a", MODEL_EVENT)
+    nodes = set(study_host.loaded["a"].provenance_graph.graph.nodes)
+    study_host.memory_budget = StudyHost.estimate_memory(study_host.loaded["a"])
+    _process_event(client, "b", MODEL_EVENT)
+    assert list(study_host.loaded) == ["b"]
+    response = client.get("/studies/a/graph-events", headers={"Accept-Encoding": "identity"})
+    assert json.loads(response.get_data()) == [MODEL_EVENT]
+    response.close()
+    assert set(study_host.loaded["a"].provenance_graph.graph.nodes) == nodes
+    assert list(study_host.loaded) == ["a"]
+
+
+def test_studies_are_pinned_to_workers(real_rules_path, specs_path, tmp_path):
+    config_path = tmp_path / "studies.yaml"
+    config_path.write_text(f"studies:\n"
+                           f"  a:\n    rules: {real_rules_path}\n    specifications: {specs_path}\n    worker: 1\n")
+    studies = load_host_config(str(config_path))
+    assert studies == [StudyConfig("a", str(real_rules_path), str(specs_path), str(tmp_path / "a.pickle"), 1)]
+    response = Client(StudyHost(studies, worker_ports=[5000, 5001])).get("/studies/a/graph-events?cursor=1")
+    assert response.status_code == 307
+    assert response.headers["Location"] == "http://localhost:5001/studies/a/graph-events?cursor=1"
+    assert StudyHost(studies, worker_index=1, worker_ports=[5000, 5001]).worker_of("a") == 1
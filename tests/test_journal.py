@@ -0,0 +1,103 @@
+import random
+from contextlib import contextmanager
+
+import pytest
+
+from simprov import core
+from simprov.command_line import serve, serve_parser
+from simprov.core import SimProv
+from simprov.provenance import reset_id_generator
+
+
+@contextmanager
+def _process(states, name):
+    # The writer and the replica run in separate processes with their own id generators.
+    random.setstate(states[name])
+    yield
+    states[name] = random.getstate()
+
+
+def _assert_same_graph(writer, replica):
+    assert set(replica.provenance_graph.graph.nodes) == set(writer.provenance_graph.graph.nodes)
+    assert set(replica.provenance_graph.graph.edges) == set(writer.provenance_graph.graph.edges)
+    for (node_id, node_data) in writer.provenance_graph.graph.nodes(data=True):
+        assert replica.provenance_graph.graph.nodes[node_id].get("Content") == node_data.get("Content")
+
+
+def test_replica_follows_the_journal_of_the_writer(real_rules_path, specs_path, tmp_path, monkeypatch):
+    reset_id_generator()
+    states = {"writer": random.getstate(), "replica": random.getstate()}
+    journal_path = str(tmp_path / "journal.jsonl")
+    with _process(states, "writer"):
+        writer = SimProv(real_rules_path, specs_path, str(tmp_path / "state.pickle"), start_api=False,
+                         journal_path=journal_path)
+        writer.process_event({"type": "Model Specified", "filePath": "/tmp/model.mlr", "newlySpecified": True})
+        writer.process_event({"type": "Model Specified", "filePath": "/tmp/model.mlr", "newlySpecified": False})
+    with _process(states, "replica"):
+        replica = SimProv(real_rules_path, specs_path, start_api=False, replica_of=journal_path,
+                          writer_url="http://writer")
+        replica.journal_follower.stop()
+        _assert_same_graph(writer, replica)
+
+    def forward_event(writer_url, event):
+        with _process(states, "writer"):
+            writer.process_event(event)
+
+    monkeypatch.setattr(core, "forward_event", forward_event)
+    with _process(states, "writer"):
+        writer.process_event({"type": "Model Specified", "filePath": "/tmp/other.mlr", "newlySpecified": True})
+    with _process(states, "replica"):
+        assert replica.journal_follower.poll() == 1
+        model = replica.provenance_graph.last_entities_map[("/tmp/model.mlr",)]
+        response = replica.rest_api.app.test_client().post("/update-entity", json={"id": str(model.id),
+                                                                                   "changes": {"Content": "v2"}})
+        assert response.status_code == 204
+        assert replica.provenance_graph.graph.nodes[model.id].get("Content") is None
+        assert replica.journal_follower.poll() == 1
+        _assert_same_graph(writer, replica)
+
+    with _process(states, "writer"):
+        writer._rebuild_from_event_log()
+    with _process(states, "replica"):
+        assert replica.journal_follower.poll() == len(writer.event_log)
+        _assert_same_graph(writer, replica)
+    writer.journal.close()
+
+
+def test_replica_without_writer_rejects_events(real_rules_path, specs_path, tmp_path):
+    journal_path = str(tmp_path / "journal.jsonl")
+    writer = SimProv(real_rules_path, specs_path, str(tmp_path / "state.pickle"), start_api=False,
+                     journal_path=journal_path)
+    writer.process_event({"type": "Model Specified", "filePath": "/tmp/model.mlr", "newlySpecified": True})
+    replica = SimProv(real_rules_path, specs_path, start_api=False, replica_of=journal_path)
+    replica.journal_follower.stop()
+    model = replica.provenance_graph.last_entities_map[("/tmp/model.mlr",)]
+    client = replica.rest_api.app.test_client()
+    assert client.post("/update-entity", json={"id": str(model.id), "changes": {"Content": "v2"}}).status_code == 409
+    assert client.post("/hide-node", json={"id": str(model.id), "changes": True}).status_code == 409
+    assert client.post("/capturer/process-event", json={"type": "Model Specified", "filePath": "/tmp/model.mlr",
+                                                        "newlySpecified": False}).status_code == 409
+    assert replica.event_log == writer.event_log and len(replica.provenance_graph.graph) == 2
+    writer.journal.close()
+
+    with pytest.raises(SystemExit):
+        serve(serve_parser.parse_args(["--replica-of", journal_path, str(specs_path), str(real_rules_path)]))
+
+
+def test_failed_events_do_not_shift_the_node_ids_of_replicas(real_rules_path, specs_path, tmp_path):
+    reset_id_generator()
+    states = {"writer": random.getstate(), "replica": random.getstate()}
+    journal_path = str(tmp_path / "journal.jsonl")
+    with _process(states, "writer"):
+        writer = SimProv(real_rules_path, specs_path, str(tmp_path / "state.pickle"), start_api=False,
+                         journal_path=journal_path)
+        writer.process_event({"type": "Model Specified", "filePath": "/tmp/model.mlr", "newlySpecified": True})
+        with pytest.raises(KeyError):
+            writer.process_event({"type": "Model Specified", "filePath": "/tmp/model.mlr"})
+        writer.process_event({"type": "Model Specified", "filePath": "/tmp/model.mlr", "newlySpecified": False})
+    with _process(states, "replica"):
+        replica = SimProv(real_rules_path, specs_path, start_api=False, replica_of=journal_path,
+                          writer_url="http://writer")
+        replica.journal_follower.stop()
+        _assert_same_graph(writer, replica)
+    writer.journal.close()
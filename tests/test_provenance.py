@@ -1,6 +1,14 @@
+from threading import Event, Thread
+
+import pytest
+
+from benchmarks.generator import StudyShape, generate_events
+from benchmarks.run import RULES_PATH, SPECIFICATIONS_PATH
 from simprov.core import SimProv
+from simprov.export import to_prov_json
+from simprov.reducer import GraphReducer
 
-from simprov.provenance import Activity, Entity
+from simprov.provenance import Activity, Entity, id_generator_state
 
 
 def build_specifying_simulation_experiment_activity(was_created=True):
@@ -121,3 +129,220 @@ def test_provenance_graph_chaining_complex(real_rules_path, specs_path):
     for recent_entity in recent_entities:
         assert simprov.provenance_graph.last_entities_map[recent_entity.primary_key] == recent_entity
     simprov.delete_study_state()
+
+
+def test_repeated_event_deduplication(real_rules_path, specs_path):
+    simprov = SimProv(real_rules_path, specs_path, start_api=False, deduplication_window=60)
+    created = {"type": "Model Specified", "filePath": "/tmp/model.mlr", "newlySpecified": True}
+    changed = {"type": "Model Specified", "filePath": "/tmp/model.mlr", "newlySpecified": False}
+    simprov.process_event(created, False)
+    simprov.process_event(changed, False)
+    simprov.process_event(dict(changed), False)
+    assert len(simprov.event_log) == 2
+    assert len(simprov.provenance_graph.activities) == 2
+    simprov.process_event(created, False)
+    simprov.process_event(changed, False)
+    assert len(simprov.event_log) == 4
+    assert len(simprov.provenance_graph.activities) == 4
+    simprov.delete_study_state()
+
+
+def test_deduplication_skips_no_events_of_rules_that_opt_out(declarative_rules_path, specs_path):
+    simprov = SimProv(declarative_rules_path, specs_path, start_api=False, deduplication_window=60)
+    simprov.process_event({"type": "Model Specified", "filePath": "/tmp/model.mlr", "newlySpecified": True}, False)
+    for _ in range(2):
+        simprov.process_event({"type": "Simulator Used", "filePath": "/tmp/model.mlr", "version": "1.0"}, False)
+    assert len(simprov.event_log) == 3
+    simprov.delete_study_state()
+
+
+def test_neighborhood_and_lineage(real_rules_path, specs_path):
+    simprov = SimProv(real_rules_path, specs_path, start_api=False)
+    simprov.process_event({"type": "Model Specified", "filePath": "/tmp/model.mlr", "newlySpecified": True}, False)
+    for _ in range(2):
+        simprov.process_event({"type": "Model Specified", "filePath": "/tmp/model.mlr", "newlySpecified": False},
+                              False)
+    graph = simprov.provenance_graph
+    (a1, a2, a3) = graph.activities
+    (m1, m2, m3) = [activity.generated_entities[0].id for activity in (a1, a2, a3)]
+    assert graph.neighborhood(m2, "up", 1) == [m2, a2.id]
+    assert graph.neighborhood(m2, "down") == [m2, a3.id, m3]
+    assert set(graph.neighborhood(m2)) == {m1, a1.id, m2, a2.id, a3.id, m3}
+    assert graph.lineage(m3) == [m3, a3.id, m2, a2.id, m1, a1.id]
+    assert graph.lineage(m3, since=m2) == [m3, a3.id, m2]
+    with pytest.raises(ValueError):
+        graph.lineage(m2, since=m3)
+    with pytest.raises(ValueError):
+        graph.neighborhood(m2, "sideways")
+    simprov.delete_study_state()
+
+
+def test_version_chains(real_rules_path, specs_path):
+    simprov = SimProv(real_rules_path, specs_path, start_api=False)
+    simprov.process_event({"type": "Model Specified", "filePath": "/tmp/model.mlr", "newlySpecified": True}, False)
+    simprov.process_event({"type": "Model Specified", "filePath": "/tmp/other.mlr", "newlySpecified": True}, False)
+    simprov.process_event({"type": "Model Specified", "filePath": "/tmp/model.mlr", "newlySpecified": False}, False)
+    graph = simprov.provenance_graph
+    (m1, other, m2) = [activity.generated_entities[0].id for activity in graph.activities]
+    versions = graph.version_index(m2)
+    assert versions is graph.entity_versions
+    assert versions.versions(m1) == [m1, m2]
+    assert versions.versions(other) == [other]
+    assert versions.chains[("/tmp/model.mlr",)].sequences == [0, 2]
+    assert [versions.version_at(m1, sequence) for sequence in (-1, 0, 1, 2)] == [None, m1, m1, m2]
+    assert (versions.previous_version(m1), versions.next_version(m1)) == (None, m2)
+    assert (versions.previous_version(m2), versions.next_version(m2)) == (m1, None)
+    simprov.delete_study_state()
+
+
+def test_attribute_index_queries(real_rules_path, specs_path):
+    simprov = SimProv(real_rules_path, specs_path, start_api=False)
+    for path in ["/tmp/a/model.mlr", "/tmp/b/model.mlr", "/tmp/a/other.mlr"]:
+        simprov.process_event({"type": "Model Specified", "filePath": path, "newlySpecified": True}, False)
+    graph = simprov.provenance_graph
+    (a_model, b_model, a_other) = [activity.generated_entities[0].id for activity in graph.activities]
+    assert graph.query(equals={"File Path": "/tmp/b/model.mlr"}) == [b_model]
+    assert set(graph.query(name="Simulation Model", prefixes={"File Path": "/tmp/a/"})) == {a_model, a_other}
+    assert graph.query(node_type="Activity") == [activity.id for activity in graph.activities]
+    graph.update_entity_attributes(a_other, {"File Path": "/tmp/b/other.mlr"})
+    assert graph.query(prefixes={"File Path": "/tmp/a/"}) == [a_model]
+    assert set(graph.query(prefixes={"File Path": "/tmp/b/"})) == {b_model, a_other}
+    with pytest.raises(KeyError):
+        graph.query(equals={"Content": None})
+    simprov.delete_study_state()
+
+
+def test_snapshots(real_rules_path, specs_path):
+    simprov = SimProv(real_rules_path, specs_path, start_api=False)
+    graph = simprov.provenance_graph
+    graph.history.checkpoint_interval = 2
+    simprov.process_event({"type": "Model Specified", "filePath": "/tmp/model.mlr", "newlySpecified": True}, False)
+    simprov.process_event({"type": "Model Specified", "filePath": "/tmp/other.mlr", "newlySpecified": True}, False)
+    (first_activity, other_activity) = graph.activities
+    (model, other) = [activity.generated_entities[0].id for activity in graph.activities]
+    dependency = {"source": str(other_activity.id), "target": str(model)}
+    simprov.process_event({"type": "Update Entity", "node_id": str(model), "changes": {"Content": "v2"}}, False)
+    simprov.process_event({"type": "Update Dependencies", "node_id": str(other_activity.id),
+                           "changes": [{**dependency, "user-generated": True}]}, False)
+    simprov.process_event({"type": "Hide Node", "node_id": str(other), "change": True}, False)
+    simprov.process_event({"type": "Update Dependencies", "node_id": str(other_activity.id),
+                           "changes": [{**dependency, "user-removed": True}]}, False)
+    simprov.process_event({"type": "Update Entity", "node_id": str(model), "changes": {"Content": "v3"}}, False)
+    assert len(graph.history.checkpoints) == 2
+
+    assert set(graph.snapshot(0).graph.nodes) == {first_activity.id, model}
+    assert set(graph.snapshot(1).graph.nodes) == set(graph.graph.nodes)
+    assert graph.snapshot(1).graph.nodes[model]["attributes"]["Content"] is None
+    assert graph.snapshot(2).graph.nodes[model]["attributes"]["Content"] == "v2"
+    assert graph.snapshot(6).graph.nodes[model]["attributes"]["Content"] == "v3"
+    assert not graph.snapshot(2).graph.has_edge(other_activity.id, model)
+    for sequence in (3, 4):
+        assert graph.snapshot(sequence).graph.has_edge(other_activity.id, model)
+        assert (other_activity.id, model) in graph.snapshot(sequence).user_generated_dependencies
+    assert not graph.snapshot(5).graph.has_edge(other_activity.id, model)
+    assert graph.snapshot(3).hidden_nodes == set()
+    assert other in graph.snapshot(4).hidden_nodes
+    assert set(graph.snapshot(6).graph.edges) == set(graph.graph.edges)
+
+    simprov.process_event({"type": "Update Entity", "node_id": str(model), "changes": {"Note": "new"}}, False)
+    assert graph.history.state_at(6).attribute_values == {(model, "Content"): "v3"}
+    assert "Note" not in graph.snapshot(6).graph.nodes[model]
+    assert "Note" not in graph.snapshot(6).node_map[model].attributes
+    assert graph.snapshot(7).node_map[model].attributes["Note"] == "new"
+    assert graph.snapshot(1).node_map[model].attributes["Content"] is None
+    assert graph.node_map[model].attributes["Content"] == "v3"
+    snapshot = graph.snapshot(3)
+    assert snapshot.node_map[other_activity.id].used_entities == [snapshot.node_map[model]]
+    assert snapshot.node_map[model].attributes["Content"] == "v2"
+    assert graph.snapshot(5).node_map[other_activity.id].used_entities == []
+    prov_json = to_prov_json(graph.snapshot(1))
+    assert "v3" not in prov_json and str(model) in prov_json
+    simprov.delete_study_state()
+
+
+def test_read_snapshots_are_isolated_from_the_writer(real_rules_path, specs_path):
+    simprov = SimProv(real_rules_path, specs_path, start_api=False)
+    simprov.process_event({"type": "Model Specified", "filePath": "/tmp/model.mlr", "newlySpecified": True}, False)
+    snapshot = simprov.read_snapshot()
+    assert simprov.read_snapshot() is snapshot
+    model = snapshot.last_entities_map[("/tmp/model.mlr",)]
+    simprov.process_event({"type": "Update Entity", "node_id": str(model.id), "changes": {"Content": "v2"}}, False)
+    simprov.process_event({"type": "Model Specified", "filePath": "/tmp/model.mlr", "newlySpecified": False}, False)
+    assert len(snapshot.graph) == 2 and snapshot.graph.nodes[model.id].get("Content") is None
+    assert snapshot.node_data(model.id)["attributes"]["Content"] is None
+    assert snapshot.query(name="Simulation Model") == [model.id]
+    assert snapshot.entity_versions.versions(model.id) == [model.id]
+    assert len(simprov.provenance_graph.entity_versions.versions(model.id)) == 2
+    assert simprov.read_snapshot() is not snapshot and len(simprov.read_snapshot().graph) == 4
+
+    errors = []
+    stop = Event()
+
+    def read():
+        while not stop.is_set():
+            try:
+                graph = simprov.read_snapshot()
+                graph.cytoscape_data()
+                GraphReducer(graph).reduce(True, True)
+            except Exception as ex:
+                errors.append(ex)
+
+    reader = Thread(target=read)
+    reader.start()
+    for index in range(30):
+        simprov.process_event({"type": "Model Specified", "filePath": f"/tmp/model-{index % 3}.mlr",
+                               "newlySpecified": index < 3}, False)
+    stop.set()
+    reader.join()
+    assert errors == []
+    simprov.delete_study_state()
+
+
+def test_read_snapshots_are_copied_without_the_write_lock(real_rules_path, specs_path):
+    simprov = SimProv(real_rules_path, specs_path, start_api=False)
+    simprov.process_event({"type": "Model Specified", "filePath": "/tmp/model.mlr", "newlySpecified": True}, False)
+    snapshot = simprov.read_snapshot()
+    simprov.process_event({"type": "Model Specified", "filePath": "/tmp/model.mlr", "newlySpecified": False}, False)
+    (locked, release) = (Event(), Event())
+
+    def write():
+        with simprov.write_lock:
+            locked.set()
+            release.wait()
+
+    writer = Thread(target=write)
+    writer.start()
+    locked.wait()
+    assert len(simprov.read_snapshot().graph) == 4
+    release.set()
+    writer.join()
+
+    simprov.process_event({"type": "Model Specified", "filePath": "/tmp/model.mlr", "newlySpecified": False}, False)
+    (locked, release) = (Event(), Event())
+
+    def change():
+        with simprov._writing():
+            locked.set()
+            release.wait()
+
+    writer = Thread(target=change)
+    writer.start()
+    locked.wait()
+    # The graph is being changed, so the last published snapshot is returned.
+    assert len(simprov.read_snapshot().graph) == 4 and simprov.read_snapshot() is not snapshot
+    release.set()
+    writer.join()
+    assert len(simprov.read_snapshot().graph) == 6
+    simprov.delete_study_state()
+
+
+def test_reduction_does_not_change_the_reduced_graph():
+    simprov = SimProv(str(RULES_PATH), str(SPECIFICATIONS_PATH), None, start_api=False, headless=True)
+    for event in generate_events(StudyShape(models=2, depth=2, fan_out=2, agents=2)):
+        simprov.process_event(event, False)
+    graph = simprov.provenance_graph
+    state = id_generator_state()
+    reduced_graph = GraphReducer(graph).reduce(True, True, True)
+    assert any(activity.associated_agents for activity in reduced_graph.activities)
+    assert all(node.id == node_id for (node_id, node) in graph.node_map.items())
+    assert id_generator_state() == state
@@ -0,0 +1,40 @@
+from itertools import product
+
+from networkx import has_path
+
+from simprov.core import SimProv
+
+
+def _assert_index_matches_graph(provenance_graph):
+    for (node_id, ancestor_id) in product(provenance_graph.graph.nodes, repeat=2):
+        assert provenance_graph.reachability_index.reaches(node_id, ancestor_id) == \
+               has_path(provenance_graph.graph, node_id, ancestor_id)
+
+
+def test_reachability_index_is_updated_incrementally(real_rules_path, specs_path, tmp_path):
+    simprov = SimProv(real_rules_path, specs_path, str(tmp_path / "state.pickle"), start_api=False,
+                      reachability_index=True)
+    for (path, newly_specified) in [("/tmp/model.mlr", True), ("/tmp/model.mlr", False),
+                                    ("/tmp/other.mlr", True), ("/tmp/model.mlr", False),
+                                    ("/tmp/other.mlr", False)]:
+        simprov.process_event({"type": "Model Specified", "filePath": path, "newlySpecified": newly_specified},
+                              False)
+    provenance_graph = simprov.provenance_graph
+    _assert_index_matches_graph(provenance_graph)
+
+    latest_model = provenance_graph.last_entities_map[("/tmp/model.mlr",)]
+    other_activity = provenance_graph.activities[-1]
+    assert not provenance_graph.is_derived_from(other_activity.id, latest_model.id)
+    dependency = {"source": str(other_activity.id), "target": str(latest_model.id), "user-generated": True}
+    simprov.process_event({"type": "Update Dependencies", "node_id": str(other_activity.id),
+                           "changes": [dependency]}, False)
+    assert provenance_graph.is_derived_from(other_activity.id, latest_model.id)
+    _assert_index_matches_graph(provenance_graph)
+
+    dependency = {"source": str(other_activity.id), "target": str(latest_model.id), "user-removed": True}
+    simprov.process_event({"type": "Update Dependencies", "node_id": str(other_activity.id),
+                           "changes": [dependency]}, False)
+    assert not provenance_graph.is_derived_from(other_activity.id, latest_model.id)
+    _assert_index_matches_graph(provenance_graph)
+    assert set(provenance_graph.reachability_index.descendants(provenance_graph.activities[0].id)) == \
+           set(provenance_graph.neighborhood(provenance_graph.activities[0].id, "down")[1:])
@@ -0,0 +1,83 @@
+import shutil
+
+import pytest
+
+from simprov.core import SimProv
+from simprov.provenance import id_generator_state
+
+
+def _study(tmp_path, real_rules_path, specs_path):
+    rules_path = tmp_path / "rules.py"
+    spec_path = tmp_path / "specs.yaml"
+    shutil.copy(real_rules_path, rules_path)
+    shutil.copy(specs_path, spec_path)
+    simprov = SimProv(str(rules_path), str(spec_path), str(tmp_path / "state.pickle"), start_api=False)
+    simprov.process_event({"type": "Model Specified", "filePath": "/tmp/model.mlr", "newlySpecified": True})
+    simprov.process_event({"type": "Model Specified", "filePath": "/tmp/model.mlr", "newlySpecified": False})
+    return simprov, rules_path, spec_path
+
+
+def test_reload_without_changes_keeps_graph(tmp_path, real_rules_path, specs_path):
+    simprov, _, _ = _study(tmp_path, real_rules_path, specs_path)
+    graph = simprov.provenance_graph
+    changes = simprov.reload_rules_and_specifications()
+    assert changes.is_empty
+    assert simprov.provenance_graph is graph
+
+
+def test_reload_of_unaffected_rule_does_not_reprocess(tmp_path, real_rules_path, specs_path):
+    simprov, rules_path, _ = _study(tmp_path, real_rules_path, specs_path)
+    graph = simprov.provenance_graph
+    rules_path.write_text(rules_path.read_text().replace('Entity("Research Question")', 'Entity("Assumption")'))
+    changes = simprov.reload_rules_and_specifications()
+    assert changes.changed_event_types == {"Research Question Specified"}
+    assert simprov.provenance_graph is graph
+
+
+def test_reload_of_affected_rule_rebuilds_graph(tmp_path, real_rules_path, specs_path):
+    simprov, rules_path, _ = _study(tmp_path, real_rules_path, specs_path)
+    rules_path.write_text(rules_path.read_text().replace(
+        'out_question.attributes["File Path"] = event["filePath"]',
+        'out_question.attributes["File Path"] = event["filePath"]\n    out_question.attributes["Content"] = "reloaded"'))
+    changes = simprov.reload_rules_and_specifications()
+    assert "Model Specified" in changes.changed_event_types
+    assert len(simprov.event_log) == 2
+    assert len(simprov.provenance_graph.activities) == 2
+    latest = simprov.provenance_graph.last_entities_map[("/tmp/model.mlr",)]
+    assert latest.attributes["Content"] == "reloaded"
+
+
+def test_reload_of_style_patches_nodes(tmp_path, real_rules_path, specs_path):
+    simprov, _, spec_path = _study(tmp_path, real_rules_path, specs_path)
+    graph = simprov.provenance_graph
+    spec_path.write_text(spec_path.read_text().replace(
+        "Simulation Model:\n  attributes:\n    - File Path$\n    - Content\n",
+        "Simulation Model:\n  attributes:\n    - File Path$\n    - Content\n  style:\n    background-color: red\n"))
+    changes = simprov.reload_rules_and_specifications()
+    assert changes.restyled_entity_names == {"Simulation Model"}
+    assert not changes.requires_reprocessing
+    assert simprov.provenance_graph is graph
+    for entity in graph.entities:
+        assert entity.meta_information == {"background-color": "red"}
+
+
+def test_failed_rebuild_restores_graph_and_node_ids(tmp_path, real_rules_path, specs_path):
+    simprov, rules_path, spec_path = _study(tmp_path, real_rules_path, specs_path)
+    graph = simprov.provenance_graph
+    state = id_generator_state()
+    styles = {entity.id: entity.meta_information for entity in graph.entities}
+    rules_path.write_text(rules_path.read_text().replace(
+        'out_question.attributes["File Path"] = event["filePath"]',
+        'out_question.attributes["File Path"] = event["filePath"][1000]'))
+    spec_path.write_text(spec_path.read_text().replace(
+        "Simulation Model:\n  attributes:\n    - File Path$\n    - Content\n",
+        "Simulation Model:\n  attributes:\n    - File Path$\n    - Content\n  style:\n    background-color: red\n"))
+    with pytest.raises(IndexError):
+        simprov.reload_rules_and_specifications()
+    assert simprov.provenance_graph is graph
+    assert id_generator_state() == state
+    assert {entity.id: entity.meta_information for entity in graph.entities} == styles
+    assert all(graph.graph.nodes[entity.id]["meta_information"] == styles[entity.id] for entity in graph.entities)
+    node_count = len(graph.node_map)
+    simprov.process_event({"type": "Model Specified", "filePath": "/tmp/other.mlr", "newlySpecified": True})
+    assert len(graph.node_map) == node_count + 2
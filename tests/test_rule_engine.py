@@ -1,9 +1,13 @@
+from datetime import date
+from math import inf
+
 import pytest
 
 # from simprov import engine
 # from simprov.api import start_simprov
 from simprov.rule_engine import InvalidRuleSpecificationException, NoRuleFoundException, InvalidRuleResultException, \
     RuleEngine
+from simprov.specifications import SpecificationManager
 
 
 def test_rule_loading_invalid_rules(error_rules_path):
@@ -40,3 +44,81 @@ def test_rule_evaluation_invalid_result(real_rules_path):
 #     engine.load_rules(real_rules_path)
 #     result = engine.process_event(complex_event)
 #     # TODO: Asserts
+
+
+def test_declarative_rule_loading(declarative_rules_path, specs_path):
+    engine = RuleEngine(declarative_rules_path, specification_manager=SpecificationManager(specs_path))
+    assert engine.rule_table.keys() == {"Model Specified", "Experiment Specified", "Simulator Used"}
+    assert not engine.rule_table["Simulator Used"].memoize
+
+
+def test_declarative_rule_evaluation(declarative_rules_path):
+    engine = RuleEngine(declarative_rules_path)
+    event = {"type": "Experiment Specified", "filePath": "/tmp/experiment.py", "newlySpecified": False,
+             "content": {"text": "experiment"}}
+    activity = engine.execute_rule(event)
+    assert activity.name == "Specifying Simulation Experiment"
+    assert [entity.attributes for entity in activity.generated_entities] == [
+        {"File Path": "/tmp/experiment.py", "Content": "experiment"}]
+    assert [entity.attributes for entity in activity.used_entities] == [{"File Path": "/tmp/experiment.py"}]
+    event["newlySpecified"] = True
+    assert engine.execute_rule(event).used_entities == []
+    activity = engine.execute_rule({"type": "Simulator Used", "filePath": "/tmp/model.mlr", "version": "1.0"})
+    assert activity.associated_agents[0].attributes == {"Version": "1.0"}
+    assert activity.generated_entities[0].attributes["Content"] == "simulated"
+
+
+def test_declarative_rule_constants_without_python_literal(tmp_path):
+    rules_path = tmp_path / "rules.yaml"
+    rules_path.write_text("Model Specified:\n"
+                          "  activity: Specifying Simulation Model\n"
+                          "  generation:\n"
+                          "    - entity: Simulation Model\n"
+                          "      attributes:\n"
+                          "        Released: {value: 2020-01-31}\n"
+                          "        Tolerance: {value: .inf}\n"
+                          "        File Path: filePath\n")
+    activity = RuleEngine(rules_path).execute_rule({"type": "Model Specified", "filePath": "/tmp/model.mlr"})
+    assert activity.generated_entities[0].attributes == {"Released": date(2020, 1, 31), "Tolerance": inf,
+                                                         "File Path": "/tmp/model.mlr"}
+
+
+def test_declarative_rule_validation(tmp_path, specs_path):
+    manager = SpecificationManager(specs_path)
+    rules_path = tmp_path / "rules.yaml"
+    rules_path.write_text("Model Specified:\n"
+                          "  activity: Specifying Simulation Model\n"
+                          "  generation:\n"
+                          "    - entity: Simulation Model\n"
+                          "      attributes:\n"
+                          "        Content: content\n")
+    with pytest.raises(InvalidRuleSpecificationException):
+        RuleEngine(rules_path, specification_manager=manager)
+    rules_path.write_text("Model Specified:\n"
+                          "  activity: Specifying Simulation Model\n"
+                          "  generation:\n"
+                          "    - entity: Data\n"
+                          "      attributes:\n"
+                          "        File Path: filePath\n")
+    with pytest.raises(InvalidRuleSpecificationException):
+        RuleEngine(rules_path, specification_manager=manager)
+
+
+def test_declarative_rule_compilation_errors(tmp_path):
+    rules_path = tmp_path / "rules.yaml"
+    rules_path.write_text("Model Specified:\n"
+                          "  activity: Specifying Simulation Model\n"
+                          "  usage:\n"
+                          "    - entity: Simulation Model\n"
+                          "      when: newlySpecified\n"
+                          "      unless: newlySpecified\n")
+    with pytest.raises(InvalidRuleSpecificationException):
+        RuleEngine(rules_path)
+    rules_path.write_text("Model Specified:\n"
+                          "  activity: Specifying Simulation Model\n"
+                          "  generation:\n"
+                          "    - entity: Simulation Model\n"
+                          "      attributes: filePath\n")
+    with pytest.raises(InvalidRuleSpecificationException):
+        RuleEngine(rules_path)
+